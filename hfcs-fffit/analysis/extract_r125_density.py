@@ -3,6 +3,7 @@ import sys
 
 from fffit.signac import save_signac_results
 from utils.r125 import R125Constants
+from utils.results_store import append_results, read_results_csv
 
 
 def main():
@@ -19,11 +20,14 @@ def main():
     project_path = run_path + itername
     csv_name = "csv/" + itername + "-results.csv"
 
-    property_names = ["density"]
+    property_names = ["density", "density_unc"]
     project = signac.get_project(project_path)
 
     save_signac_results(project, R125.param_names, property_names, csv_name)
 
+    # Add the new results to the columnar store read by the analysis scripts
+    append_results(read_results_csv(csv_name), R125, "density", iternum)
+
 
 if __name__ == "__main__":
     main()
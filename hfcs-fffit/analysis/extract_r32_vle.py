@@ -3,6 +3,7 @@ import sys
 
 from fffit.signac import save_signac_results
 from utils.r32 import R32Constants
+from utils.results_store import append_results, read_results_csv
 
 
 def main():
@@ -26,12 +27,21 @@ def main():
         "Pvap",
         "liq_enthalpy",
         "vap_enthalpy",
+        "liq_density_unc",
+        "vap_density_unc",
+        "Hvap_unc",
+        "Pvap_unc",
+        "liq_enthalpy_unc",
+        "vap_enthalpy_unc",
     ]
 
     project = signac.get_project(project_path)
 
     save_signac_results(project, R32.param_names, property_names, csv_name)
 
+    # Add the new results to the columnar store read by the analysis scripts
+    append_results(read_results_csv(csv_name), R32, "vle", iternum)
+
 
 if __name__ == "__main__":
     main()
@@ -34,7 +34,7 @@ def main():
     results = values_real_to_scaled(df[["mape_liq_density", "mape_vap_density", "mape_Pvap", "mape_Hvap"]].values, result_bounds)
     data_f = dff[list(R125.param_names)].values
     results_f = values_real_to_scaled(dff[["mape_liq_density", "mape_vap_density", "mape_Pvap", "mape_Hvap"]].values, result_bounds)
-    param_bounds = R125.param_bounds
+    param_bounds = R125.param_bounds.copy()
     param_bounds[:5] = param_bounds[:5] * NM_TO_ANGSTROM
     param_bounds[5:] = param_bounds[5:] * KJMOL_TO_K
 
@@ -7,7 +7,6 @@ import matplotlib.pyplot as plt
 import seaborn
 
 
-from fffit.models import run_gpflow_scipy
 from fffit.utils import (
     shuffle_and_split,
     values_real_to_scaled,
@@ -20,6 +19,8 @@ sys.path.append("../")
 
 from utils.r32 import R32Constants
 from utils.id_new_samples import prepare_df_vle
+from utils.model_registry import load_or_fit_gpr
+from utils.prediction_cache import cached_predict_f
 
 R32 = R32Constants()
 
@@ -28,6 +29,7 @@ matplotlib.rc("font", serif="Arial")
 
 iternum = 3
 gp_shuffle_seed = 7579596
+model_registry = "../.gp_registry"
 
 csv_path = "/scratch365/rdefever/hfcs-fffit/hfcs-fffit/analysis/csv/"
 in_csv_names = ["r32-vle-iter" + str(i) + "-results.csv" for i in range(1, iternum+1)]
@@ -58,15 +60,19 @@ def main():
     )
 
     # Fit model
-    model = run_gpflow_scipy(
+    model = load_or_fit_gpr(
         x_train,
         y_train,
         gpflow.kernels.RBF(lengthscales=np.ones(R32.n_params + 1)),
+        R32,
+        property_name,
+        seed=gp_shuffle_seed,
+        registry_dir=model_registry,
     )
 
     # Use model to predict results
-    gp_mu_train, gp_var_train = model.predict_f(x_train)
-    gp_mu_test, gp_var_test = model.predict_f(x_test)
+    gp_mu_train, gp_var_train = cached_predict_f(model, x_train)
+    gp_mu_test, gp_var_test = cached_predict_f(model, x_test)
 
     # Convert results to physical values
     y_train_physical = values_scaled_to_real(y_train, property_bounds)
@@ -141,15 +147,19 @@ def main():
     )
 
     # Fit model
-    model = run_gpflow_scipy(
+    model = load_or_fit_gpr(
         x_train,
         y_train,
         gpflow.kernels.RBF(lengthscales=np.ones(R32.n_params + 1)),
+        R32,
+        property_name,
+        seed=gp_shuffle_seed,
+        registry_dir=model_registry,
     )
 
     # Use model to predict results
-    gp_mu_train, gp_var_train = model.predict_f(x_train)
-    gp_mu_test, gp_var_test = model.predict_f(x_test)
+    gp_mu_train, gp_var_train = cached_predict_f(model, x_train)
+    gp_mu_test, gp_var_test = cached_predict_f(model, x_test)
 
     # Convert results to physical values
     y_train_physical = values_scaled_to_real(y_train, property_bounds)
@@ -20,12 +20,12 @@ from fffit.plot import (
     plot_model_vs_test,
 )
 
-from fffit.models import run_gpflow_scipy
-
 sys.path.append("../")
 
 from utils.r32 import R32Constants
 from utils.id_new_samples import prepare_df_vle
+from utils.model_registry import load_or_fit_gpr
+from utils.prediction_cache import CachedModel
 
 R32 = R32Constants()
 
@@ -36,6 +36,7 @@ pdf = PdfPages('pdfs/fig_gp_examples.pdf')
 
 iternum = 2
 gp_shuffle_seed = 8278573
+model_registry = "../.gp_registry"
 
 ##############################################################################
 ##############################################################################
@@ -58,22 +59,35 @@ x_train, y_train, x_test, y_test = shuffle_and_split(
 
 # Fit model
 models = {}
-models["RBF"] = run_gpflow_scipy(
+models["RBF"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.RBF(lengthscales=np.ones(R32.n_params + 1)),
+    R32,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
-models["Matern32"] = run_gpflow_scipy(
+models["Matern32"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.Matern32(lengthscales=np.ones(R32.n_params + 1)),
+    R32,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
 
-models["Matern52"] = run_gpflow_scipy(
+models["Matern52"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.Matern52(lengthscales=np.ones(R32.n_params + 1)),
+    R32,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
+models = {name: CachedModel(model) for name, model in models.items()}
 
 # Plot model performance on train and test points
 pdf.savefig(plot_model_performance(models, x_train, y_train, R32.liq_density_bounds))
@@ -143,22 +157,35 @@ x_train, y_train, x_test, y_test = shuffle_and_split(
 
 # Fit model
 models = {}
-models["RBF"] = run_gpflow_scipy(
+models["RBF"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.RBF(lengthscales=np.ones(R32.n_params + 1)),
+    R32,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
-models["Matern32"] = run_gpflow_scipy(
+models["Matern32"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.Matern32(lengthscales=np.ones(R32.n_params + 1)),
+    R32,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
 
-models["Matern52"] = run_gpflow_scipy(
+models["Matern52"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.Matern52(lengthscales=np.ones(R32.n_params + 1)),
+    R32,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
+models = {name: CachedModel(model) for name, model in models.items()}
 
 # Plot model performance on train and test points
 pdf.savefig(plot_model_performance(models, x_train, y_train, R32.vap_density_bounds))
@@ -229,22 +256,35 @@ x_train, y_train, x_test, y_test = shuffle_and_split(
 
 # Fit model
 models = {}
-models["RBF"] = run_gpflow_scipy(
+models["RBF"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.RBF(lengthscales=np.ones(R32.n_params + 1)),
+    R32,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
-models["Matern32"] = run_gpflow_scipy(
+models["Matern32"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.Matern32(lengthscales=np.ones(R32.n_params + 1)),
+    R32,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
 
-models["Matern52"] = run_gpflow_scipy(
+models["Matern52"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.Matern52(lengthscales=np.ones(R32.n_params + 1)),
+    R32,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
+models = {name: CachedModel(model) for name, model in models.items()}
 
 # Plot model performance on train and test points
 pdf.savefig(plot_model_performance(models, x_train, y_train, R32.Pvap_bounds))
@@ -316,22 +356,35 @@ x_train, y_train, x_test, y_test = shuffle_and_split(
 
 # Fit model
 models = {}
-models["RBF"] = run_gpflow_scipy(
+models["RBF"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.RBF(lengthscales=np.ones(R32.n_params + 1)),
+    R32,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
-models["Matern32"] = run_gpflow_scipy(
+models["Matern32"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.Matern32(lengthscales=np.ones(R32.n_params + 1)),
+    R32,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
 
-models["Matern52"] = run_gpflow_scipy(
+models["Matern52"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.Matern52(lengthscales=np.ones(R32.n_params + 1)),
+    R32,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
+models = {name: CachedModel(model) for name, model in models.items()}
 
 # Plot model performance on train and test points
 pdf.savefig(plot_model_performance(models, x_train, y_train, R32.Hvap_bounds))
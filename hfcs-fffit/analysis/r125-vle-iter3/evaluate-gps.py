@@ -20,12 +20,11 @@ from fffit.plot import (
     plot_model_vs_test,
 )
 
-from fffit.models import run_gpflow_scipy
-
 sys.path.append("../")
 
 from utils.r125 import R125Constants
 from utils.id_new_samples import prepare_df_vle
+from utils.model_registry import load_or_fit_gpr
 
 R125 = R125Constants()
 
@@ -36,6 +35,7 @@ pdf = PdfPages('figs/gp_models_eval.pdf')
 
 iternum = 3
 gp_shuffle_seed = 5548528
+model_registry = "../.gp_registry"
 
 ##############################################################################
 ##############################################################################
@@ -58,21 +58,33 @@ x_train, y_train, x_test, y_test = shuffle_and_split(
 
 # Fit model
 models = {}
-models["RBF"] = run_gpflow_scipy(
+models["RBF"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.RBF(lengthscales=np.ones(R125.n_params + 1)),
+    R125,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
-models["Matern32"] = run_gpflow_scipy(
+models["Matern32"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.Matern32(lengthscales=np.ones(R125.n_params + 1)),
+    R125,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
 
-models["Matern52"] = run_gpflow_scipy(
+models["Matern52"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.Matern52(lengthscales=np.ones(R125.n_params + 1)),
+    R125,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
 
 # Plot model performance on train and test points
@@ -143,21 +155,33 @@ x_train, y_train, x_test, y_test = shuffle_and_split(
 
 # Fit model
 models = {}
-models["RBF"] = run_gpflow_scipy(
+models["RBF"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.RBF(lengthscales=np.ones(R125.n_params + 1)),
+    R125,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
-models["Matern32"] = run_gpflow_scipy(
+models["Matern32"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.Matern32(lengthscales=np.ones(R125.n_params + 1)),
+    R125,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
 
-models["Matern52"] = run_gpflow_scipy(
+models["Matern52"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.Matern52(lengthscales=np.ones(R125.n_params + 1)),
+    R125,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
 
 # Plot model performance on train and test points
@@ -229,21 +253,33 @@ x_train, y_train, x_test, y_test = shuffle_and_split(
 
 # Fit model
 models = {}
-models["RBF"] = run_gpflow_scipy(
+models["RBF"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.RBF(lengthscales=np.ones(R125.n_params + 1)),
+    R125,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
-models["Matern32"] = run_gpflow_scipy(
+models["Matern32"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.Matern32(lengthscales=np.ones(R125.n_params + 1)),
+    R125,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
 
-models["Matern52"] = run_gpflow_scipy(
+models["Matern52"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.Matern52(lengthscales=np.ones(R125.n_params + 1)),
+    R125,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
 
 # Plot model performance on train and test points
@@ -316,21 +352,33 @@ x_train, y_train, x_test, y_test = shuffle_and_split(
 
 # Fit model
 models = {}
-models["RBF"] = run_gpflow_scipy(
+models["RBF"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.RBF(lengthscales=np.ones(R125.n_params + 1)),
+    R125,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
-models["Matern32"] = run_gpflow_scipy(
+models["Matern32"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.Matern32(lengthscales=np.ones(R125.n_params + 1)),
+    R125,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
 
-models["Matern52"] = run_gpflow_scipy(
+models["Matern52"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.Matern52(lengthscales=np.ones(R125.n_params + 1)),
+    R125,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
 
 # Plot model performance on train and test points
@@ -16,7 +16,7 @@ from utils.id_new_samples import prepare_df_vle
 from utils.analyze_samples import prepare_df_vle_errors
 from utils.plot import plot_property, render_mpl_table
 
-from fffit.pareto import find_pareto_set, is_pareto_efficient
+from utils.pareto import find_pareto_set, is_pareto_efficient
 
 R125 = R125Constants()
 
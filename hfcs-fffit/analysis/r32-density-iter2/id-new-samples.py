@@ -26,10 +26,11 @@ from fffit.models import run_gpflow_scipy
 sys.path.append("../")
 
 from utils.r32 import R32Constants
+from utils.samples import load_samples
 from utils.id_new_samples import (
     prepare_df_density,
-    classify_samples,
-    rank_samples,
+    iter_sample_chunks,
+    screen_phase_samples,
 )
 
 R32 = R32Constants()
@@ -91,12 +92,19 @@ model = run_gpflow_scipy(
 
 ### Step 3: Find new parameters for MD simulations
 
-# SVM to classify hypercube regions as liquid or vapor
-latin_hypercube = np.loadtxt("LHS_1e6x6.csv", delimiter=",")
-liquid_samples, vapor_samples = classify_samples(latin_hypercube, classifier)
-# Find the lowest MSE points from the GP in both sets
-ranked_liquid_samples = rank_samples(liquid_samples, model, R32, "sim_liq_density")
-ranked_vapor_samples = rank_samples(vapor_samples, model, R32, "sim_liq_density")
+latin_hypercube = load_samples("LHS_1e6x6.csv")
+
+# SVM to classify hypercube regions as liquid or vapor and
+# find the lowest MSE points from the GP in both sets
+ranked_liquid_samples, ranked_vapor_samples = screen_phase_samples(
+    iter_sample_chunks(latin_hypercube),
+    classifier,
+    model,
+    R32,
+    "sim_liq_density",
+    max_mse=625.0,
+    n_best=100,
+)
 
 # Make a set of the lowest MSE parameter sets
 top_liquid_samples = ranked_liquid_samples[
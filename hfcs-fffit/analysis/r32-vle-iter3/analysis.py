@@ -12,7 +12,7 @@ from fffit.utils import (
 sys.path.append("../")
 
 from utils.r32 import R32Constants
-from utils.id_new_samples import prepare_df_vle
+from utils.prepared_data import load_prepared_vle
 from utils.analyze_samples import prepare_df_vle_errors
 from utils.plot import plot_property, render_mpl_table
 
@@ -29,18 +29,16 @@ iternum = 3
 ##############################################################################
 
 csv_path = "/scratch365/rdefever/hfcs-fffit/hfcs-fffit/analysis/csv/"
-in_csv_names = [
-    "r32-vle-iter" + str(i) + "-results.csv" for i in range(iternum, iternum + 1)
-]
 out_csv_name = "r32-vle-iter" + str(iternum + 1) + "-params.csv"
 
 # Read files
-df_csvs = [
-    pd.read_csv(csv_path + in_csv_name, index_col=0)
-    for in_csv_name in in_csv_names
-]
-df_csv = pd.concat(df_csvs)
-df_all = prepare_df_vle(df_csv, R32)
+df_all = load_prepared_vle(
+    R32,
+    range(iternum, iternum + 1),
+    store_dir="../results",
+    csv_dir=csv_path,
+    cache_dir="../.prepared_cache",
+)
 
 
 def main():
@@ -20,12 +20,12 @@ from fffit.plot import (
     plot_model_vs_test,
 )
 
-from fffit.models import run_gpflow_scipy
-
 sys.path.append("../")
 
 from utils.r32 import R32Constants
-from utils.id_new_samples import prepare_df_vle
+from utils.prepared_data import load_prepared_vle
+from utils.model_registry import load_or_fit_gpr
+from utils.gp_models import fit_gp, compare_gp_models
 
 R32 = R32Constants()
 
@@ -36,18 +36,25 @@ pdf = PdfPages('figs/gp_models_eval.pdf')
 
 iternum = 3
 gp_shuffle_seed = 7579596
+model_registry = "../.gp_registry"
+results_store = "../results"
+prepared_cache = "../.prepared_cache"
+n_inducing = 200
 
 ##############################################################################
 ##############################################################################
 
 csv_path = "/scratch365/rdefever/hfcs-fffit/hfcs-fffit/analysis/csv/"
-in_csv_names = ["r32-vle-iter" + str(i) + "-results.csv" for i in range(1, iternum+1)]
 out_csv_name = "r32-vle-iter" + str(iternum + 1) + "-params.csv"
 
 # Read files
-df_csvs = [pd.read_csv(csv_path + in_csv_name, index_col=0) for in_csv_name in in_csv_names]
-df_csv = pd.concat(df_csvs)
-df_all = prepare_df_vle(df_csv, R32)
+df_all = load_prepared_vle(
+    R32,
+    range(1, iternum + 1),
+    store_dir=results_store,
+    csv_dir=csv_path,
+    cache_dir=prepared_cache,
+)
 
 ### Fit GP Model to liquid density
 param_names = list(R32.param_names) + ["temperature"]
@@ -58,26 +65,58 @@ x_train, y_train, x_test, y_test = shuffle_and_split(
 
 # Fit model
 models = {}
-models["RBF"] = run_gpflow_scipy(
+models["RBF"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.RBF(lengthscales=np.ones(R32.n_params + 1)),
+    R32,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
-models["Matern32"] = run_gpflow_scipy(
+models["Matern32"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.Matern32(lengthscales=np.ones(R32.n_params + 1)),
+    R32,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
 
-models["Matern52"] = run_gpflow_scipy(
+models["Matern52"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.Matern52(lengthscales=np.ones(R32.n_params + 1)),
+    R32,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
+)
+
+# Only compared with the exact models, not plotted
+sparse_models = {}
+sparse_models["RBF-SGPR"] = fit_gp(
+    x_train,
+    y_train,
+    gpflow.kernels.RBF(lengthscales=np.ones(R32.n_params + 1)),
+    method="sgpr",
+    n_inducing=n_inducing,
+    seed=gp_shuffle_seed,
 )
 
 # Plot model performance on train and test points
 pdf.savefig(plot_model_performance(models, x_train, y_train, R32.liq_density_bounds))
 pdf.savefig(plot_model_performance(models, x_test, y_test, R32.liq_density_bounds))
+print(
+    compare_gp_models(
+        {**models, **sparse_models},
+        x_test,
+        y_test,
+        R32.liq_density_bounds,
+        reference="RBF",
+    )
+)
 
 # Plot temperature slices
 figs = plot_slices_temperature(
@@ -143,26 +182,58 @@ x_train, y_train, x_test, y_test = shuffle_and_split(
 
 # Fit model
 models = {}
-models["RBF"] = run_gpflow_scipy(
+models["RBF"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.RBF(lengthscales=np.ones(R32.n_params + 1)),
+    R32,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
-models["Matern32"] = run_gpflow_scipy(
+models["Matern32"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.Matern32(lengthscales=np.ones(R32.n_params + 1)),
+    R32,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
 
-models["Matern52"] = run_gpflow_scipy(
+models["Matern52"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.Matern52(lengthscales=np.ones(R32.n_params + 1)),
+    R32,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
+)
+
+# Only compared with the exact models, not plotted
+sparse_models = {}
+sparse_models["RBF-SGPR"] = fit_gp(
+    x_train,
+    y_train,
+    gpflow.kernels.RBF(lengthscales=np.ones(R32.n_params + 1)),
+    method="sgpr",
+    n_inducing=n_inducing,
+    seed=gp_shuffle_seed,
 )
 
 # Plot model performance on train and test points
 pdf.savefig(plot_model_performance(models, x_train, y_train, R32.vap_density_bounds))
 pdf.savefig(plot_model_performance(models, x_test, y_test, R32.vap_density_bounds))
+print(
+    compare_gp_models(
+        {**models, **sparse_models},
+        x_test,
+        y_test,
+        R32.vap_density_bounds,
+        reference="RBF",
+    )
+)
 
 # Plot temperature slices
 figs = plot_slices_temperature(
@@ -229,26 +300,58 @@ x_train, y_train, x_test, y_test = shuffle_and_split(
 
 # Fit model
 models = {}
-models["RBF"] = run_gpflow_scipy(
+models["RBF"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.RBF(lengthscales=np.ones(R32.n_params + 1)),
+    R32,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
-models["Matern32"] = run_gpflow_scipy(
+models["Matern32"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.Matern32(lengthscales=np.ones(R32.n_params + 1)),
+    R32,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
 
-models["Matern52"] = run_gpflow_scipy(
+models["Matern52"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.Matern52(lengthscales=np.ones(R32.n_params + 1)),
+    R32,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
+)
+
+# Only compared with the exact models, not plotted
+sparse_models = {}
+sparse_models["RBF-SGPR"] = fit_gp(
+    x_train,
+    y_train,
+    gpflow.kernels.RBF(lengthscales=np.ones(R32.n_params + 1)),
+    method="sgpr",
+    n_inducing=n_inducing,
+    seed=gp_shuffle_seed,
 )
 
 # Plot model performance on train and test points
 pdf.savefig(plot_model_performance(models, x_train, y_train, R32.Pvap_bounds))
 pdf.savefig(plot_model_performance(models, x_test, y_test, R32.Pvap_bounds))
+print(
+    compare_gp_models(
+        {**models, **sparse_models},
+        x_test,
+        y_test,
+        R32.Pvap_bounds,
+        reference="RBF",
+    )
+)
 
 # Plot temperature slices
 figs = plot_slices_temperature(
@@ -316,26 +419,58 @@ x_train, y_train, x_test, y_test = shuffle_and_split(
 
 # Fit model
 models = {}
-models["RBF"] = run_gpflow_scipy(
+models["RBF"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.RBF(lengthscales=np.ones(R32.n_params + 1)),
+    R32,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
-models["Matern32"] = run_gpflow_scipy(
+models["Matern32"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.Matern32(lengthscales=np.ones(R32.n_params + 1)),
+    R32,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
 
-models["Matern52"] = run_gpflow_scipy(
+models["Matern52"] = load_or_fit_gpr(
     x_train,
     y_train,
     gpflow.kernels.Matern52(lengthscales=np.ones(R32.n_params + 1)),
+    R32,
+    property_name,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
+)
+
+# Only compared with the exact models, not plotted
+sparse_models = {}
+sparse_models["RBF-SGPR"] = fit_gp(
+    x_train,
+    y_train,
+    gpflow.kernels.RBF(lengthscales=np.ones(R32.n_params + 1)),
+    method="sgpr",
+    n_inducing=n_inducing,
+    seed=gp_shuffle_seed,
 )
 
 # Plot model performance on train and test points
 pdf.savefig(plot_model_performance(models, x_train, y_train, R32.Hvap_bounds))
 pdf.savefig(plot_model_performance(models, x_test, y_test, R32.Hvap_bounds))
+print(
+    compare_gp_models(
+        {**models, **sparse_models},
+        x_test,
+        y_test,
+        R32.Hvap_bounds,
+        reference="RBF",
+    )
+)
 
 # Plot temperature slices
 figs = plot_slices_temperature(
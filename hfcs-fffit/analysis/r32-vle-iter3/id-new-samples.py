@@ -11,16 +11,21 @@ from fffit.utils import (
 )
 
 
-from fffit.models import run_gpflow_scipy
-from fffit.pareto import find_pareto_set, is_pareto_efficient
-
 sys.path.append("../")
 
 from utils.r32 import R32Constants
+from utils.samples import load_samples
+from utils.prepared_data import load_prepared_density, load_prepared_vle
+from utils.gp_models import (
+    fit_gp_models,
+    split_multioutput,
+    split_with_noise,
+)
+from utils.pareto import find_pareto_set, is_pareto_efficient
 from utils.id_new_samples import (
-    prepare_df_density,
-    prepare_df_vle,
-    rank_samples,
+    iter_sample_chunks,
+    cascade_screen_samples,
+    select_spaced_points,
 )
 
 R32 = R32Constants()
@@ -36,35 +41,55 @@ gp_shuffle_seed = 8278573
 
 md_gp_shuffle_seed = 1
 distance_seed = 10
+# Set to e.g. "../.gp_hyperparameters" to store the GP hyperparameters
+# per iteration and start from those of the previous iteration
+hyperparameter_store = None
+hyperparameter_iteration = 3
+model_registry = "../.gp_registry"
+results_store = "../results"
+prepared_cache = "../.prepared_cache"
+# Optimizations per GP model; more than 1 adds random restarts
+gp_restarts = 1
+# GP method of the VLE models: "exact", or "sgpr"/"svgp" for sparse
+# models with vle_inducing inducing points
+vle_method = "exact"
+vle_inducing = 500
+# VLE models: "independent" (one GP per property), "multioutput" (one
+# shared-kernel GP for all properties), or "heteroscedastic" (one GP per
+# property with the simulation uncertainties as per-point noise;
+# requires the *_unc columns in the results CSVs)
+vle_model = "independent"
 liquid_density_threshold = 500  # kg/m^3
 
+valid_vle_models = ["independent", "multioutput", "heteroscedastic"]
+if vle_model not in valid_vle_models:
+    raise ValueError(
+        "Invalid vle_model {}. Supported models are "
+        "{}".format(vle_model, valid_vle_models)
+    )
+
 
 # Read VLE files
 csv_path = "/scratch365/rdefever/hfcs-fffit/hfcs-fffit/analysis/csv/"
-in_csv_names = [
-    "r32-vle-iter" + str(i) + "-results.csv" for i in range(1, iternum + 1)
-]
 out_csv_name = "r32-vle-iter" + str(iternum + 1) + "-params.csv"
-df_csvs = [
-    pd.read_csv(csv_path + in_csv_name, index_col=0)
-    for in_csv_name in in_csv_names
-]
-df_csv = pd.concat(df_csvs)
-df_vle = prepare_df_vle(df_csv, R32)
+# Only iterations that are new or changed are prepared again
+df_vle = load_prepared_vle(
+    R32,
+    range(1, iternum + 1),
+    store_dir=results_store,
+    csv_dir=csv_path,
+    cache_dir=prepared_cache,
+)
 
 # Read liquid density files
 max_density_iter = 4
-in_csv_names = [
-    "r32-density-iter" + str(i) + "-results.csv"
-    for i in range(1, max_density_iter + 1)
-]
-df_csvs = [
-    pd.read_csv(csv_path + in_csv_name, index_col=0)
-    for in_csv_name in in_csv_names
-]
-df_csv = pd.concat(df_csvs)
-df_all, df_liquid, df_vapor = prepare_df_density(
-    df_csv, R32, liquid_density_threshold
+df_all, df_liquid, df_vapor = load_prepared_density(
+    R32,
+    range(1, max_density_iter + 1),
+    liquid_density_threshold,
+    store_dir=results_store,
+    csv_dir=csv_path,
+    cache_dir=prepared_cache,
 )
 
 ### Fit GP models to VLE data
@@ -72,19 +97,50 @@ df_all, df_liquid, df_vapor = prepare_df_density(
 param_names = list(R32.param_names) + ["temperature"]
 property_names = ["sim_liq_density", "sim_vap_density", "sim_Pvap", "sim_Hvap"]
 
-vle_models = {}
-for property_name in property_names:
-    # Get train/test
-    x_train, y_train, x_test, y_test = shuffle_and_split(
-        df_vle, param_names, property_name, shuffle_seed=gp_shuffle_seed
-    )
-
-    # Fit model
-    vle_models[property_name] = run_gpflow_scipy(
-        x_train,
-        y_train,
-        gpflow.kernels.RBF(lengthscales=np.ones(R32.n_params + 1)),
+fits = {}
+if vle_model == "multioutput":
+    # Get train/test with one column per property
+    x_train, y_train, x_test, y_test = split_multioutput(
+        df_vle, param_names, property_names, shuffle_seed=gp_shuffle_seed
     )
+    fits["vle"] = {
+        "x_train": x_train,
+        "y_train": y_train,
+        "kernel": "RBF",
+    }
+elif vle_model == "heteroscedastic":
+    for property_name in property_names:
+        # Get train/test with the noise variance of each point
+        (
+            x_train,
+            y_train,
+            noise_train,
+            x_test,
+            y_test,
+            noise_test,
+        ) = split_with_noise(
+            df_vle, param_names, property_name, shuffle_seed=gp_shuffle_seed
+        )
+        fits[property_name] = {
+            "x_train": x_train,
+            "y_train": y_train,
+            "noise_variance": noise_train,
+            "kernel": "RBF",
+        }
+else:
+    for property_name in property_names:
+        # Get train/test
+        x_train, y_train, x_test, y_test = shuffle_and_split(
+            df_vle, param_names, property_name, shuffle_seed=gp_shuffle_seed
+        )
+        fits[property_name] = {
+            "x_train": x_train,
+            "y_train": y_train,
+            "kernel": "RBF",
+        }
+for fit in fits.values():
+    fit["method"] = vle_method
+    fit["n_inducing"] = vle_inducing
 
 
 ### Fit GP models to liquid density data
@@ -94,12 +150,23 @@ x_train, y_train, x_test, y_test = shuffle_and_split(
     df_liquid, param_names, property_name, shuffle_seed=md_gp_shuffle_seed
 )
 
-# Fit model
-md_model = run_gpflow_scipy(
-    x_train,
-    y_train,
-    gpflow.kernels.RBF(lengthscales=np.ones(R32.n_params + 1)),
+fits[property_name] = {
+    "x_train": x_train,
+    "y_train": y_train,
+    "kernel": "RBF",
+}
+
+# Fit all models concurrently
+vle_models = fit_gp_models(
+    fits,
+    R32,
+    store_dir=hyperparameter_store,
+    iteration=hyperparameter_iteration,
+    n_restarts=gp_restarts,
+    seed=gp_shuffle_seed,
+    registry_dir=model_registry,
 )
+md_model = vle_models.pop(property_name)
 
 
 # Get difference between GROMACS/Cassandra density
@@ -125,46 +192,51 @@ print(
 
 ### Step 3: Find new parameters for simulations
 max_mse = 625  # kg^2/m^6
-latin_hypercube = np.loadtxt("LHS_1e6x6.csv", delimiter=",")
-ranked_samples = rank_samples(
-    latin_hypercube, md_model, R32, "sim_liq_density", property_offset=22.8
-)
-viable_samples = ranked_samples[ranked_samples["mse"] < max_mse].drop(
-    columns="mse"
+latin_hypercube = load_samples("LHS_1e6x6.csv")
+# Screen for liquid density with the GROMACS model, then evaluate the
+# VLE models only for the samples that survive
+stages = [
+    {
+        "name": "md_liq_density",
+        "gp_model": md_model,
+        "property_name": "sim_liq_density",
+        "property_offset": 22.8,
+        "max_mse": max_mse,
+    }
+]
+if vle_model == "multioutput":
+    # All VLE properties from one cross-covariance per block
+    stages.append(
+        {
+            "name": [name.replace("sim_", "") for name in property_names],
+            "gp_model": vle_models["vle"],
+            "property_name": property_names,
+        }
+    )
+else:
+    for property_name, model in vle_models.items():
+        stages.append(
+            {
+                "name": property_name.replace("sim_", ""),
+                "gp_model": model,
+                "property_name": property_name,
+            }
+        )
+vle_mses = cascade_screen_samples(
+    iter_sample_chunks(latin_hypercube), stages, R32
 )
-viable_samples = viable_samples.values
+vle_mses = vle_mses.drop(columns="mse_md_liq_density")
 print(
     "There are:",
-    viable_samples.shape[0],
+    vle_mses.shape[0],
     "viable parameter sets which are within 25 kg/m$^2$ of GROMACS liquid densities",
 )
 
-# Calculate other properties
-vle_predicted_mses = {}
-for property_name, model in vle_models.items():
-    vle_predicted_mses[property_name] = rank_samples(
-        viable_samples, model, R32, property_name
-    )
-
-
-# Merge into single DF
-vle_mses = vle_predicted_mses["sim_liq_density"].merge(
-    vle_predicted_mses["sim_vap_density"], on=R32.param_names
-)
-vle_mses = vle_mses.rename(
-    {"mse_x": "mse_liq_density", "mse_y": "mse_vap_density"}, axis="columns"
-)
-vle_mses = vle_mses.merge(vle_predicted_mses["sim_Pvap"], on=R32.param_names)
-vle_mses = vle_mses.merge(vle_predicted_mses["sim_Hvap"], on=R32.param_names)
-vle_mses = vle_mses.rename(
-    {"mse_x": "mse_Pvap", "mse_y": "mse_Hvap"}, axis="columns"
-)
-
 # Find pareto efficient points
 result, pareto_points, dominated_points = find_pareto_set(
     vle_mses.drop(columns=list(R32.param_names)).values, is_pareto_efficient
 )
-vle_mses = vle_mses.join(pd.DataFrame(result, columns=["is_pareto"]))
+vle_mses["is_pareto"] = result
 
 
 # Plot pareto points vs. MSEs
@@ -183,39 +255,23 @@ g.savefig("figs/R32-pareto-params.pdf")
 # Find new points for next iteration
 pareto_points = vle_mses[vle_mses["is_pareto"] == True]
 print(f"A total of {len(pareto_points)} pareto efficient points were found.")
-new_points = pareto_points.sort_values("mse_liq_density").iloc[[0]]
-new_points = new_points.append(
-    pareto_points.sort_values("mse_vap_density").iloc[[0]]
+new_points = pd.concat(
+    [
+        pareto_points.sort_values(mse_name).iloc[[0]]
+        for mse_name in [
+            "mse_liq_density",
+            "mse_vap_density",
+            "mse_Hvap",
+            "mse_Pvap",
+        ]
+    ]
 )
-new_points = new_points.append(pareto_points.sort_values("mse_Hvap").iloc[[0]])
-new_points = new_points.append(pareto_points.sort_values("mse_Pvap").iloc[[0]])
-pareto_points.drop(index=new_points.index, inplace=True)
 
 # Search to ID well spaced points
 distance = 0.43
-discarded_points = pd.DataFrame(columns=pareto_points.columns)
-
-np.random.seed(distance_seed)
-
-while len(pareto_points > 0):
-    # Shuffle the pareto points
-    pareto_points = pareto_points.sample(frac=1)
-    new_points = new_points.append(pareto_points.iloc[[0]])
-    # Remove anything within distance
-    l1_norm = np.sum(
-        np.abs(
-            pareto_points[list(R32.param_names)].values
-            - new_points[list(R32.param_names)].iloc[[-1]].values
-        ),
-        axis=1,
-    )
-    points_to_remove = np.where(l1_norm < distance)[0]
-    discarded_points = discarded_points.append(
-        pareto_points.iloc[points_to_remove]
-    )
-    pareto_points.drop(
-        index=pareto_points.index[points_to_remove], inplace=True
-    )
+new_points = select_spaced_points(
+    pareto_points, new_points, R32.param_names, distance, seed=distance_seed
+)
 print(
     f"After removing similar points, we are left with {len(new_points)} pareto efficient points."
 )
@@ -226,7 +282,7 @@ g = seaborn.pairplot(new_points, vars=list(R32.param_names))
 g.set(xlim=(-0.1, 1.1), ylim=(-0.1, 1.1))
 g.savefig("figs/R32-new-points.pdf")
 
-# Save to CSV
+# Save to CSV. The index is the row of each point in the Latin hypercube
 new_points.drop(
     columns=[
         "mse_liq_density",
@@ -1,6 +1,5 @@
 import numpy as np
 import pandas as pd
-from scipy.stats import linregress
 
 from fffit.utils import values_scaled_to_real
 
@@ -8,6 +7,10 @@ def prepare_df_density_errors(df, molecule):
     """Create a dataframe with mean square error (mse) and mean absolute
     percent error (mape) for each unique parameter set.
 
+    The results are arranged in (n_paramsets, n_temps) arrays, so df
+    may contain at most one row per parameter set and temperature.
+    Missing temperatures are left out of the errors.
+
     Parameters
     ----------
     df : pandas.Dataframe
@@ -21,50 +24,37 @@ def prepare_df_density_errors(df, molecule):
         dataframe with one row per parameter set and including
         the MSE and MAPE for liq_density
     """
-    new_data = []
-    for group, values in df.groupby(list(molecule.param_names)):
-
-        # Temperatures
-        temps = values_scaled_to_real(
-            values["temperature"], molecule.temperature_bounds
-        )
-
-        # Liquid density
-        sim_liq_density = values_scaled_to_real(
-            values["md_density"], molecule.liq_density_bounds
-        )
-        expt_liq_density = values_scaled_to_real(
-            values["expt_density"], molecule.liq_density_bounds
-        )
-        mse_liq_density = np.mean((sim_liq_density - expt_liq_density) ** 2)
-        mape_liq_density = (
-            np.mean(
-                np.abs((sim_liq_density - expt_liq_density) / expt_liq_density)
-            )
-            * 100.0
-        )
-        properties = {
-            f"sim_liq_density_{float(temp):.0f}K": float(liq_density)
-            for temp, liq_density in zip(temps, sim_liq_density)
-        }
-
-        new_quantities = {
-            **properties,
-            "mse_liq_density": mse_liq_density,
-            "mape_liq_density": mape_liq_density,
-        }
-
-        new_data.append(list(group) + list(new_quantities.values()))
-
-    columns = list(molecule.param_names) + list(new_quantities.keys())
-    new_df = pd.DataFrame(new_data, columns=columns)
+    params, temps, properties = _paramset_arrays(
+        df,
+        molecule,
+        {
+            "md_density": molecule.liq_density_bounds,
+            "expt_density": molecule.liq_density_bounds,
+        },
+    )
+    sim_liq_density = properties["md_density"]
+    expt_liq_density = properties["expt_density"]
+
+    data = dict(zip(molecule.param_names, params.T))
+    data.update(
+        _temperature_columns("sim_liq_density", temps, sim_liq_density)
+    )
+    data["mse_liq_density"], data["mape_liq_density"] = _mse_mape(
+        sim_liq_density, expt_liq_density
+    )
+    new_df = pd.DataFrame(data)
 
     return new_df
 
 def prepare_df_vle_errors(df, molecule):
     """Create a dataframe with mean square error (mse) and mean absolute
     percent error (mape) for each unique parameter set. The critical
-    temperature and density are also evaluated.
+    temperature and density are also evaluated, for all parameter sets
+    at once, from batched least squares fits.
+
+    The results are arranged in (n_paramsets, n_temps) arrays, so df
+    may contain at most one row per parameter set and temperature.
+    Missing temperatures are left out of the errors and the fits.
 
     Parameters
     ----------
@@ -80,127 +70,165 @@ def prepare_df_vle_errors(df, molecule):
         the MSE and MAPE for liq_density, vap_density, pvap, hvap,
         critical temperature, critical density
     """
-    new_data = []
-    for group, values in df.groupby(list(molecule.param_names)):
-
-        # Temperatures
-        temps = values_scaled_to_real(
-            values["temperature"], molecule.temperature_bounds
-        )
-
-        # Liquid density
-        sim_liq_density = values_scaled_to_real(
-            values["sim_liq_density"], molecule.liq_density_bounds
-        )
-        expt_liq_density = values_scaled_to_real(
-            values["expt_liq_density"], molecule.liq_density_bounds
-        )
-        mse_liq_density = np.mean((sim_liq_density - expt_liq_density) ** 2)
-        mape_liq_density = (
-            np.mean(
-                np.abs((sim_liq_density - expt_liq_density) / expt_liq_density)
-            )
-            * 100.0
-        )
-        properties = {
-            f"sim_liq_density_{float(temp):.0f}K": float(liq_density)
-            for temp, liq_density in zip(temps, sim_liq_density)
-        }
-        # Vapor density
-        sim_vap_density = values_scaled_to_real(
-            values["sim_vap_density"], molecule.vap_density_bounds
-        )
-        expt_vap_density = values_scaled_to_real(
-            values["expt_vap_density"], molecule.vap_density_bounds
-        )
-        mse_vap_density = np.mean((sim_vap_density - expt_vap_density) ** 2)
-        mape_vap_density = (
-            np.mean(
-                np.abs((sim_vap_density - expt_vap_density) / expt_vap_density)
+    property_names = ["liq_density", "vap_density", "Pvap", "Hvap"]
+    property_bounds = [
+        molecule.liq_density_bounds,
+        molecule.vap_density_bounds,
+        molecule.Pvap_bounds,
+        molecule.Hvap_bounds,
+    ]
+    columns = {}
+    for name, bounds in zip(property_names, property_bounds):
+        columns["sim_" + name] = bounds
+        columns["expt_" + name] = bounds
+    params, temps, properties = _paramset_arrays(df, molecule, columns)
+
+    data = dict(zip(molecule.param_names, params.T))
+    for name in property_names:
+        data.update(
+            _temperature_columns(
+                "sim_" + name, temps, properties["sim_" + name]
             )
-            * 100.0
-        )
-        properties.update(
-            {
-                f"sim_vap_density_{float(temp):.0f}K": float(vap_density)
-                for temp, vap_density in zip(temps, sim_vap_density)
-            }
         )
 
-        # Vapor pressure
-        sim_Pvap = values_scaled_to_real(
-            values["sim_Pvap"], molecule.Pvap_bounds
-        )
-        expt_Pvap = values_scaled_to_real(
-            values["expt_Pvap"], molecule.Pvap_bounds
-        )
-        mse_Pvap = np.mean((sim_Pvap - expt_Pvap) ** 2)
-        mape_Pvap = np.mean(np.abs((sim_Pvap - expt_Pvap) / expt_Pvap)) * 100.0
-        properties.update(
-            {
-                f"sim_Pvap_{float(temp):.0f}K": float(Pvap)
-                for temp, Pvap in zip(temps, sim_Pvap)
-            }
-        )
+    # Critical Point (Law of rectilinear diameters)
+    sim_liq_density = properties["sim_liq_density"]
+    sim_vap_density = properties["sim_vap_density"]
+    slope1, intercept1 = _batched_linregress(
+        temps, (sim_liq_density + sim_vap_density) / 2.0
+    )
+    slope2, intercept2 = _batched_linregress(
+        temps, (sim_liq_density - sim_vap_density) ** (1 / 0.32)
+    )
+    Tc = np.abs(intercept2 / slope2)
+    rhoc = intercept1 + slope1 * Tc
+    data["sim_Tc"] = Tc
+    data["sim_rhoc"] = rhoc
+
+    mse = {}
+    mape = {}
+    for name in property_names:
+        mse[name], mape[name] = _mse_mape(
+            properties["sim_" + name], properties["expt_" + name]
+        )
+    mse["Tc"] = (Tc - molecule.expt_Tc) ** 2
+    mape["Tc"] = np.abs((Tc - molecule.expt_Tc) / molecule.expt_Tc) * 100.0
+    mse["rhoc"] = (rhoc - molecule.expt_rhoc) ** 2
+    mape["rhoc"] = (
+        np.abs((rhoc - molecule.expt_rhoc) / molecule.expt_rhoc) * 100.0
+    )
+    data.update({f"mse_{name}": value for name, value in mse.items()})
+    data.update({f"mape_{name}": value for name, value in mape.items()})
+    new_df = pd.DataFrame(data)
 
-        # Enthalpy of vaporization
-        sim_Hvap = values_scaled_to_real(
-            values["sim_Hvap"], molecule.Hvap_bounds
-        )
-        expt_Hvap = values_scaled_to_real(
-            values["expt_Hvap"], molecule.Hvap_bounds
-        )
-        mse_Hvap = np.mean((sim_Hvap - expt_Hvap) ** 2)
-        mape_Hvap = np.mean(np.abs((sim_Hvap - expt_Hvap) / expt_Hvap)) * 100.0
-        properties.update(
-            {
-                f"sim_Hvap_{float(temp):.0f}K": float(Hvap)
-                for temp, Hvap in zip(temps, sim_Hvap)
-            }
-        )
+    return new_df
 
-        # Critical Point (Law of rectilinear diameters)
-        slope1, intercept1, r_value1, p_value1, std_err1 = linregress(
-            temps.flatten(),
-            ((sim_liq_density + sim_vap_density) / 2.0).flatten(),
-        )
 
-        slope2, intercept2, r_value2, p_value2, std_err2 = linregress(
-            temps.flatten(),
-            ((sim_liq_density - sim_vap_density) ** (1 / 0.32)).flatten(),
-        )
+def _paramset_arrays(df, molecule, columns):
+    """Arrange per simulation results by parameter set and temperature
 
-        Tc = np.abs(intercept2 / slope2)
-        mse_Tc = (Tc - molecule.expt_Tc) ** 2
-        mape_Tc = np.abs((Tc - molecule.expt_Tc) / molecule.expt_Tc) * 100.0
-        properties.update({"sim_Tc": Tc})
+    Parameters
+    ----------
+    df : pandas.Dataframe
+        per simulation results, with scaled values
+    molecule : R32, R125
+        molecule class with bounds/experimental data
+    columns : dict
+        bounds of each column to arrange, keyed by column name
 
-        rhoc = intercept1 + slope1 * Tc
-        mse_rhoc = (rhoc - molecule.expt_rhoc) ** 2
-        mape_rhoc = (
-            np.abs((rhoc - molecule.expt_rhoc) / molecule.expt_rhoc) * 100.0
-        )
-        properties.update({"sim_rhoc": rhoc})
-
-        new_quantities = {
-            **properties,
-            "mse_liq_density": mse_liq_density,
-            "mse_vap_density": mse_vap_density,
-            "mse_Pvap": mse_Pvap,
-            "mse_Hvap": mse_Hvap,
-            "mse_Tc": mse_Tc,
-            "mse_rhoc": mse_rhoc,
-            "mape_liq_density": mape_liq_density,
-            "mape_vap_density": mape_vap_density,
-            "mape_Pvap": mape_Pvap,
-            "mape_Hvap": mape_Hvap,
-            "mape_Tc": mape_Tc,
-            "mape_rhoc": mape_rhoc,
-        }
-
-        new_data.append(list(group) + list(new_quantities.values()))
-
-    columns = list(molecule.param_names) + list(new_quantities.keys())
-    new_df = pd.DataFrame(new_data, columns=columns)
+    Returns
+    -------
+    params : np.ndarray, shape=(n_paramsets, n_params)
+        scaled parameter values of each parameter set, in the (sorted)
+        order of `df.groupby(param_names)`
+    temps : np.ndarray, shape=(n_temps,)
+        sorted temperatures (K), rounded to integers
+    properties : dict
+        real values of each column, shape=(n_paramsets, n_temps), keyed
+        by column name. Temperatures without results are NaN
+    """
+    param_names = list(molecule.param_names)
+    group_ids = (
+        df.groupby(param_names, sort=True).ngroup().to_numpy(dtype=np.float64)
+    )
+    # Like groupby, leave out rows with missing parameter values
+    valid = np.isfinite(group_ids) & (group_ids >= 0)
+    group_ids = group_ids[valid].astype(np.intp)
+    n_paramsets = int(group_ids.max()) + 1 if group_ids.size else 0
+
+    all_temps = np.rint(
+        values_scaled_to_real(
+            df["temperature"].to_numpy()[valid], molecule.temperature_bounds
+        ).reshape(-1)
+    )
+    temps, temp_ids = np.unique(all_temps, return_inverse=True)
+    temp_ids = temp_ids.reshape(-1)
+
+    cells = group_ids * temps.size + temp_ids
+    if np.any(np.bincount(cells, minlength=n_paramsets * temps.size) > 1):
+        raise ValueError(
+            "df must contain at most one row per parameter set and "
+            "temperature"
+        )
+
+    params = np.empty((n_paramsets, len(param_names)))
+    params[group_ids] = df[param_names].to_numpy(dtype=np.float64)[valid]
+
+    properties = {}
+    for name, bounds in columns.items():
+        values = np.full((n_paramsets, temps.size), np.nan)
+        values[group_ids, temp_ids] = values_scaled_to_real(
+            df[name].to_numpy()[valid], bounds
+        ).reshape(-1)
+        properties[name] = values
+
+    return params, temps, properties
+
+
+def _temperature_columns(name, temps, values):
+    """Return one column of values per temperature, e.g., name_241K"""
+    return {
+        f"{name}_{float(temp):.0f}K": values[:, idx]
+        for idx, temp in enumerate(temps)
+    }
+
+
+def _mse_mape(sim, expt):
+    """Return the MSE and MAPE of each row, ignoring missing values"""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        count = np.sum(np.isfinite(sim - expt), axis=1)
+        mse = np.nansum((sim - expt) ** 2, axis=1) / count
+        mape = np.nansum(np.abs((sim - expt) / expt), axis=1) / count * 100.0
+    return mse, mape
+
+
+def _batched_linregress(x, y):
+    """Least squares line through each row of y
+
+    Closed-form equivalent of `scipy.stats.linregress(x, y[i])` for all
+    rows at once. Missing values (NaN) in y are left out of the fit of
+    their row.
 
-    return new_df
+    Parameters
+    ----------
+    x : np.ndarray, shape=(n_points,)
+        independent variable
+    y : np.ndarray, shape=(n_rows, n_points)
+        dependent variable of each row
+
+    Returns
+    -------
+    slope : np.ndarray, shape=(n_rows,)
+    intercept : np.ndarray, shape=(n_rows,)
+    """
+    weights = np.isfinite(y).astype(np.float64)
+    y = np.where(weights > 0.0, y, 0.0)
+    n = weights.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x_mean = weights @ x / n
+        y_mean = y.sum(axis=1) / n
+        # Centered sums are more accurate than the raw moments
+        dx = weights * (x - x_mean[:, np.newaxis])
+        slope = np.sum(dx * y, axis=1) / np.sum(dx * dx, axis=1)
+        intercept = y_mean - slope * x_mean
+    return slope, intercept
@@ -0,0 +1,295 @@
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from .pareto import is_pareto_efficient, pareto_ranks
+
+
+def check_gp_mean(n_train=500, n_samples=100000, rtol=1e-6, seed=0):
+    """Check the mean-only GP screening path against `predict_f`
+
+    A GPR model (as in `fffit.models.run_gpflow_scipy`) is fit to a
+    noisy smooth function of R32 parameters and temperature. The NumPy
+    predictor of `gp_mean_predictor` must match the mean of
+    `gp_model.predict_f`, and the blocked `_calc_gp_mse` must match the
+    previous implementation, which stacked the samples with each
+    temperature and called `predict_f`. Both paths are timed.
+
+    Parameters
+    ----------
+    n_train : int
+        Number of training points
+    n_samples : int
+        Number of random parameter sets screened
+    rtol : float
+        Relative tolerance, with respect to the largest value, of the
+        comparisons
+    seed : int
+        Seed for the training data and samples
+
+    Returns
+    -------
+    timings : pd.DataFrame
+        One row per comparison with the maximum absolute difference and
+        the time (s) of the new and previous paths
+    """
+    import gpflow
+
+    from fffit.models import run_gpflow_scipy
+    from fffit.utils import values_real_to_scaled, values_scaled_to_real
+
+    from .r32 import R32Constants
+    from .id_new_samples import _calc_gp_mse, gp_mean_predictor
+
+    molecule = R32Constants()
+    rng = np.random.default_rng(seed)
+    n_inputs = molecule.n_params + 1
+    x_train = rng.random((n_train, n_inputs))
+    y_train = np.sin(3.0 * x_train) @ rng.random(n_inputs)
+    y_train += 0.01 * rng.standard_normal(n_train)
+    gp_model = run_gpflow_scipy(
+        x_train,
+        y_train,
+        gpflow.kernels.RBF(lengthscales=np.ones(n_inputs)),
+        fmt="simple",
+    )
+    samples = rng.random((n_samples, molecule.n_params))
+    expt_property = molecule.expt_liq_density
+    property_bounds = molecule.liq_density_bounds
+
+    def compare(name, new, previous):
+        start = time.perf_counter()
+        result = new()
+        elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        expected = previous()
+        elapsed_previous = time.perf_counter() - start
+        np.testing.assert_allclose(
+            result, expected, rtol=0.0, atol=rtol * np.max(np.abs(expected))
+        )
+        return {
+            "check": name,
+            "max_abs_diff": np.max(np.abs(result - expected)),
+            "time": elapsed,
+            "time_previous": elapsed_previous,
+        }
+
+    def previous_mse():
+        all_errs = np.empty((n_samples, len(expt_property)))
+        for col_idx, (temp, value) in enumerate(expt_property.items()):
+            scaled_temp = values_real_to_scaled(
+                temp, molecule.temperature_bounds
+            )
+            xx = np.hstack((samples, np.tile(scaled_temp, (n_samples, 1))))
+            means_scaled, vars_scaled = gp_model.predict_f(xx)
+            means = values_scaled_to_real(means_scaled, property_bounds)
+            all_errs[:, col_idx] = (means - value)[:, 0]
+        return np.mean(all_errs ** 2, axis=1)
+
+    xx = np.hstack((samples, rng.random((n_samples, 1))))
+    rows = [
+        compare(
+            "gp_mean_predictor",
+            lambda: gp_mean_predictor(gp_model)(xx),
+            lambda: np.asarray(gp_model.predict_f(xx)[0]),
+        ),
+        compare(
+            "_calc_gp_mse",
+            lambda: _calc_gp_mse(
+                gp_model,
+                samples,
+                expt_property,
+                property_bounds,
+                molecule.temperature_bounds,
+            ),
+            previous_mse,
+        ),
+    ]
+
+    return pd.DataFrame(rows)
+
+
+def check_fit_gp_models(n_train=200, n_procs=2, rtol=1e-5, seed=0):
+    """Check concurrent fitting after TensorFlow has been initialized
+
+    A TensorFlow computation runs first, and `fit_gp_models` is then
+    called twice in this process with `n_procs` workers. Both calls
+    must finish and give the same hyperparameters as fitting in this
+    process (`n_procs=1`).
+
+    Parameters
+    ----------
+    n_train : int
+        Number of training points of each model
+    n_procs : int
+        Number of worker processes
+    rtol : float
+        Relative tolerance of the hyperparameter comparison
+    seed : int
+        Seed for the training data and restarts
+
+    Returns
+    -------
+    timings : pd.DataFrame
+        One row per call with the number of processes, the maximum
+        relative difference from the serial fit, and the time (s)
+    """
+    from .gp_models import _build_gpr, _make_kernel, fit_gp_models
+
+    rng = np.random.default_rng(seed)
+    fits = {}
+    for name in ["a", "b", "c"]:
+        x_train = rng.random((n_train, 3))
+        fits[name] = {
+            "x_train": x_train,
+            "y_train": np.sin(3.0 * x_train) @ rng.random(3)
+            + 0.01 * rng.standard_normal(n_train),
+        }
+
+    # Initialize the TensorFlow runtime in this process
+    x_train = fits["a"]["x_train"]
+    _build_gpr(
+        x_train, fits["a"]["y_train"], _make_kernel("RBF", 3)
+    ).predict_f(x_train)
+
+    def fit(procs):
+        start = time.perf_counter()
+        models = fit_gp_models(
+            fits, n_procs=procs, n_restarts=2, seed=seed, fmt="simple"
+        )
+        elapsed = time.perf_counter() - start
+        params = {
+            name: np.concatenate(
+                [np.ravel(param.numpy()) for param in model.parameters]
+            )
+            for name, model in models.items()
+        }
+        return params, elapsed
+
+    expected, elapsed = fit(1)
+    rows = [{"call": "serial", "n_procs": 1, "max_rel_diff": 0.0}]
+    rows[0]["time"] = elapsed
+    for call in ["first", "second"]:
+        params, elapsed = fit(n_procs)
+        max_rel_diff = 0.0
+        for name in fits:
+            np.testing.assert_allclose(params[name], expected[name], rtol=rtol)
+            max_rel_diff = max(
+                max_rel_diff,
+                np.max(
+                    np.abs(params[name] - expected[name])
+                    / np.abs(expected[name])
+                ),
+            )
+        rows.append(
+            {
+                "call": call,
+                "n_procs": n_procs,
+                "max_rel_diff": max_rel_diff,
+                "time": elapsed,
+            }
+        )
+
+    return pd.DataFrame(rows)
+
+
+def check_pareto(
+    sizes=((8061, 4), (20000, 4), (100000, 6)),
+    n_trials=300,
+    max_reference_points=20000,
+    seed=0,
+):
+    """Check `utils.pareto` against `fffit.pareto` and time both
+
+    Random cost sets, half of them with integer costs so that tied and
+    duplicate points occur, must give the same Pareto mask as
+    `fffit.pareto.is_pareto_efficient`, and each rank of `pareto_ranks`
+    must be the front of the points not in a lower rank. Then both
+    functions are timed on uniform random costs.
+
+    Parameters
+    ----------
+    sizes : iterable of (int, int)
+        Number of points and objectives of each timed cost set
+    n_trials : int
+        Number of random cost sets checked for correctness
+    max_reference_points : int
+        `fffit.pareto.is_pareto_efficient` is only timed (and compared)
+        for cost sets up to this size
+    seed : int
+        Seed for the random costs
+
+    Returns
+    -------
+    timings : pd.DataFrame
+        One row per timed cost set with the number of Pareto efficient
+        points and the time (s) of each function. The fffit time is NaN
+        for sets larger than `max_reference_points`
+    """
+    from fffit.pareto import is_pareto_efficient as reference
+
+    rng = np.random.default_rng(seed)
+    for trial in range(n_trials):
+        n_points = int(rng.integers(1, 300))
+        n_objectives = int(rng.integers(1, 7))
+        if trial % 2:
+            costs = rng.integers(0, 5, (n_points, n_objectives)).astype(float)
+        else:
+            costs = rng.random((n_points, n_objectives))
+        np.testing.assert_array_equal(
+            is_pareto_efficient(costs, batch_size=int(rng.integers(1, 64))),
+            reference(costs.copy()),
+        )
+        ranks = pareto_ranks(costs)
+        remaining = np.arange(n_points)
+        for rank in range(ranks.max() + 1):
+            front = reference(costs[remaining].copy())
+            np.testing.assert_array_equal(
+                np.sort(remaining[front]), np.flatnonzero(ranks == rank)
+            )
+            remaining = remaining[~front]
+
+    rows = []
+    for n_points, n_objectives in sizes:
+        costs = rng.random((n_points, n_objectives))
+        start = time.perf_counter()
+        result = is_pareto_efficient(costs)
+        row = {
+            "n_points": n_points,
+            "n_objectives": n_objectives,
+            "n_pareto": int(np.sum(result)),
+            "time": time.perf_counter() - start,
+            "time_fffit": np.nan,
+        }
+        if n_points <= max_reference_points:
+            start = time.perf_counter()
+            expected = reference(costs.copy())
+            row["time_fffit"] = time.perf_counter() - start
+            np.testing.assert_array_equal(result, expected)
+        rows.append(row)
+
+    return pd.DataFrame(rows)
+
+
+def main(argv):
+    """Run the checks named in argv, or all of them"""
+    checks = {
+        "fit_gp_models": check_fit_gp_models,
+        "gp_mean": check_gp_mean,
+        "pareto": check_pareto,
+    }
+    names = argv or list(checks)
+    for name in names:
+        if name not in checks:
+            raise ValueError(
+                "Invalid check {}. Supported checks are "
+                "{}".format(name, list(checks))
+            )
+    for name in names:
+        print(f"### {name}")
+        print(checks[name]().to_string(index=False))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,138 @@
+import json
+import types
+import hashlib
+import numpy as np
+
+
+class constant:
+    """Read-only property that is computed once per class
+
+    Use in place of `property` for the molecule constants classes. The
+    value is computed on first access, frozen with `read_only`, and
+    shared by all instances of the class, so arrays and dicts are not
+    rebuilt (and units not converted) on every access.
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.name = func.__name__
+        self.__doc__ = func.__doc__
+        self._values = {}
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        cls = type(instance)
+        try:
+            return self._values[cls]
+        except KeyError:
+            value = read_only(self.func(instance))
+            self._values[cls] = value
+            return value
+
+    def __set__(self, instance, value):
+        raise AttributeError(f"Constant '{self.name}' cannot be set")
+
+
+def constants_fingerprint(molecule):
+    """Return a hash of all constants of a molecule constants class
+
+    Parameters
+    ----------
+    molecule : R32Constants, R125Constants
+        An instance of a molecule constants class
+
+    Returns
+    -------
+    fingerprint : str
+        The hash, which changes if any constant changes
+    """
+    cls = type(molecule)
+    values = {}
+    for name in sorted(dir(cls)):
+        if isinstance(getattr(cls, name), constant):
+            value = getattr(molecule, name)
+            if isinstance(value, np.ndarray):
+                value = [value.dtype.str, value.tolist()]
+            elif isinstance(value, types.MappingProxyType):
+                value = [[key, value[key]] for key in value]
+            values[name] = value
+    return hashlib.sha1(
+        json.dumps([cls.__name__, values], sort_keys=True).encode()
+    ).hexdigest()
+
+
+def read_only(value):
+    """Return a read-only version of value
+
+    Arrays are copied to C-contiguous arrays that cannot be written,
+    dicts are wrapped in a read-only mapping, and lists are converted
+    to tuples. Other values are returned as they are.
+    """
+    if isinstance(value, np.ndarray):
+        value = np.array(value, order="C")
+        value.setflags(write=False)
+        return value
+    if isinstance(value, dict):
+        return types.MappingProxyType(dict(value))
+    if isinstance(value, list):
+        return tuple(value)
+    return value
+
+
+def temperature_table(expt_temperatures):
+    """Create a table of the position of each experimental temperature
+
+    Parameters
+    ----------
+    expt_temperatures : array-like of int
+        Temperatures (K) of the experimental data
+
+    Returns
+    -------
+    table : np.ndarray, shape=(max - min + 1,)
+        Position in `expt_temperatures` of the temperature
+        `min(expt_temperatures) + i` at entry i, or -1 if there is no
+        experimental data at that temperature
+    """
+    expt_temperatures = np.asarray(expt_temperatures, dtype=np.int64)
+    t_min = expt_temperatures.min()
+    table = np.full(expt_temperatures.max() - t_min + 1, -1, dtype=np.intp)
+    table[expt_temperatures - t_min] = np.arange(expt_temperatures.size)
+    return table
+
+
+def lookup_temperatures(temperatures, expt_temperatures, table):
+    """Return the position of each temperature in expt_temperatures
+
+    Temperatures are truncated to integers, like the keys of the
+    experimental data.
+
+    Parameters
+    ----------
+    temperatures : array-like
+        Temperatures (K) to look up
+    expt_temperatures : np.ndarray of int
+        Temperatures (K) of the experimental data
+    table : np.ndarray
+        Table from `temperature_table(expt_temperatures)`
+
+    Returns
+    -------
+    index : np.ndarray of int, shape=np.shape(temperatures)
+        Position of each temperature in expt_temperatures
+    """
+    temperatures = np.asarray(temperatures, dtype=np.float64).astype(
+        np.int64
+    )
+    offsets = temperatures - np.min(expt_temperatures)
+    in_table = (offsets >= 0) & (offsets < table.size)
+    index = np.full(temperatures.shape, -1, dtype=np.intp)
+    index[in_table] = table[offsets[in_table]]
+    if np.any(index < 0):
+        missing = np.unique(temperatures[index < 0]).tolist()
+        raise ValueError(f"No experimental data at temperatures {missing} K")
+    return index
@@ -0,0 +1,213 @@
+import numpy as np
+
+from scipy.linalg import cho_factor, cho_solve
+
+from .gp_mean import GPMean, export_gp_mean
+
+
+class RandomFeatureMean:
+    """Posterior mean of a GP approximated with random Fourier features
+
+    The kernel is approximated as k(x, x') ~ phi(x) . phi(x') with
+    phi(x) = sqrt(2 * variance / n_features) * cos(omega (x / l) + phase),
+    so each prediction costs O(n_features) regardless of the number of
+    training points.
+
+    Parameters
+    ----------
+    omega : np.ndarray, shape=(n_features, n_inputs)
+        Frequencies sampled from the spectral density of the kernel
+    phase : np.ndarray, shape=(n_features,)
+        Phases sampled uniformly from [0, 2 pi)
+    weights : np.ndarray, shape=(n_features, n_outputs)
+        Feature weights
+    variance : float
+        Kernel variance
+    lengthscales : np.ndarray, shape=(n_inputs,) or float
+        Kernel lengthscales
+    mean_A : np.ndarray, shape=(n_inputs, n_outputs)
+        Slope of the linear mean function
+    mean_b : np.ndarray, shape=(n_outputs,)
+        Intercept of the linear mean function
+    block_size : int
+        Number of points per block
+    """
+
+    def __init__(
+        self,
+        omega,
+        phase,
+        weights,
+        variance,
+        lengthscales,
+        mean_A,
+        mean_b,
+        block_size=10000,
+    ):
+        lengthscales = np.asarray(lengthscales, dtype=np.float64)
+        # Fold the lengthscales into the frequencies
+        self.omega_t = np.ascontiguousarray(
+            (np.asarray(omega, dtype=np.float64) / lengthscales).T
+        )
+        self.phase = np.asarray(phase, dtype=np.float64)
+        self.scale = np.sqrt(2.0 * float(variance) / self.phase.shape[0])
+        self.mean_A = np.asarray(mean_A, dtype=np.float64).reshape(
+            self.omega_t.shape[0], -1
+        )
+        self.mean_b = np.asarray(mean_b, dtype=np.float64).reshape(-1)
+        self.weights = np.asarray(weights, dtype=np.float64).reshape(
+            self.phase.shape[0], -1
+        )
+        self.block_size = block_size
+
+    def __call__(self, xx):
+        """Return the approximate mean, shape=(n_points, n_outputs)"""
+        xx = np.asarray(xx, dtype=np.float64)
+        means = xx @ self.mean_A + self.mean_b
+        for start in range(0, xx.shape[0], self.block_size):
+            stop = start + self.block_size
+            means[start:stop] += self.features(xx[start:stop]) @ self.weights
+        return means
+
+    def features(self, xx):
+        """Random Fourier features of xx, shape=(n_points, n_features)"""
+        proj = np.asarray(xx, dtype=np.float64) @ self.omega_t
+        proj += self.phase
+        np.cos(proj, out=proj)
+        proj *= self.scale
+        return proj
+
+
+def approximate_gp_mean(
+    gp_model,
+    method="rff",
+    n_features=1000,
+    x_check=None,
+    n_check=10000,
+    seed=None,
+):
+    """Build a low-rank approximation of the posterior mean of a GP
+
+    The approximate model is the posterior mean of a GP with a
+    low-rank kernel fit to the same data and noise as `gp_model`. For
+    "rff", the kernel is replaced with random Fourier features sampled
+    from its spectral density (a Gaussian for RBF and a Student's t
+    with 3 or 5 degrees of freedom for Matern32 or Matern52). For
+    "nystrom", the kernel is projected onto `n_features` landmark points
+    chosen at random from the training inputs (subset of regressors).
+
+    The reported errors are an empirical check at `x_check`, not a
+    bound: the approximation may be worse elsewhere. The errors are
+    smallest at the training inputs, so check at points like the ones
+    that will be screened.
+
+    Parameters
+    ----------
+    gp_model : gpflow.models.GPR or GPMean
+        Trained GP model. A `GPMean` must have been exported with its
+        Cholesky factor
+    method : string
+        "rff" or "nystrom"
+    n_features : int
+        Number of random features or landmark points
+    x_check : np.ndarray, shape=(n_points, n_inputs), optional
+        Points where the approximation error is measured, e.g., a
+        subset of the candidate samples at each temperature. Defaults
+        to `n_check` points drawn uniformly from the bounding box of
+        the training inputs
+    n_check : int
+        Number of random points if `x_check` is None
+    seed : int, optional
+        Seed for the random features, landmark points, and check points
+
+    Returns
+    -------
+    approx_mean : RandomFeatureMean or GPMean
+        Function mapping x, shape=(n_points, n_inputs), to the
+        approximate scaled mean, shape=(n_points, n_outputs)
+    errors : dict
+        "max_abs_err" and "rms_err" between the approximate and exact
+        scaled means at `x_check`
+    """
+    valid_methods = ["rff", "nystrom"]
+    if method not in valid_methods:
+        raise ValueError(
+            "Invalid method {}. Supported methods are "
+            "{}".format(method, valid_methods)
+        )
+
+    if not isinstance(gp_model, GPMean):
+        gp_model = export_gp_mean(gp_model)
+    if gp_model.chol is None:
+        raise ValueError(
+            "The approximation requires a predictor exported with the "
+            "Cholesky factor"
+        )
+
+    # Recover the noise variance of each point (the diagonal of L L^T
+    # is variance + noise) and the residuals y - m(X)
+    chol = gp_model.chol
+    noise = (np.sum(chol ** 2, axis=1) - gp_model.variance)[:, np.newaxis]
+    resid = chol @ (chol.T @ gp_model.alpha)
+    x_train = gp_model.x_train
+    rng = np.random.default_rng(seed)
+
+    if method == "rff":
+        omega = rng.standard_normal((n_features, x_train.shape[1]))
+        if gp_model.kernel_name != "RBF":
+            dof = 3.0 if gp_model.kernel_name == "Matern32" else 5.0
+            omega *= np.sqrt(dof / rng.chisquare(dof, size=(n_features, 1)))
+        phase = rng.uniform(0.0, 2.0 * np.pi, size=n_features)
+        approx_mean = RandomFeatureMean(
+            omega,
+            phase,
+            np.zeros((n_features, gp_model.n_outputs)),
+            gp_model.variance,
+            gp_model.lengthscales,
+            gp_model.mean_A,
+            gp_model.mean_b,
+        )
+        phi = approx_mean.features(x_train)
+        lhs = phi.T @ (phi / noise)
+        lhs[np.diag_indices_from(lhs)] += 1.0
+        approx_mean.weights = cho_solve(
+            cho_factor(lhs, lower=True), phi.T @ (resid / noise)
+        )
+    else:
+        n_landmarks = min(n_features, x_train.shape[0])
+        landmarks = x_train[
+            np.sort(rng.choice(x_train.shape[0], n_landmarks, replace=False))
+        ]
+        landmark_mean = GPMean(
+            gp_model.kernel_name,
+            gp_model.variance,
+            gp_model.lengthscales,
+            landmarks,
+            np.zeros((n_landmarks, gp_model.n_outputs)),
+            gp_model.mean_A,
+            gp_model.mean_b,
+            block_size=gp_model.block_size,
+        )
+        kmn = landmark_mean.kernel(x_train).T
+        kmm = landmark_mean.kernel(landmarks)
+        lhs = kmm + kmn @ (kmn.T / noise)
+        # Jitter for landmarks that are nearly coincident
+        lhs[np.diag_indices_from(lhs)] += 1e-10 * np.trace(lhs) / n_landmarks
+        landmark_mean.alpha = cho_solve(
+            cho_factor(lhs, lower=True), kmn @ (resid / noise)
+        )
+        approx_mean = landmark_mean
+
+    if x_check is None:
+        x_check = rng.uniform(
+            np.min(x_train, axis=0),
+            np.max(x_train, axis=0),
+            size=(n_check, x_train.shape[1]),
+        )
+    diff = approx_mean(x_check) - gp_model(x_check)
+    errors = {
+        "max_abs_err": float(np.max(np.abs(diff))),
+        "rms_err": float(np.sqrt(np.mean(diff ** 2))),
+    }
+
+    return approx_mean, errors
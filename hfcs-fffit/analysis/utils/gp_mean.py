@@ -0,0 +1,357 @@
+import numpy as np
+
+from scipy.linalg import cho_factor, cho_solve, solve_triangular
+
+
+SUPPORTED_KERNELS = ["RBF", "Matern32", "Matern52"]
+
+
+class GPMean:
+    """NumPy evaluation of a trained exact GP model
+
+    The posterior mean is m(x) + K(x, X) alpha, where
+    alpha = (K(X, X) + noise * I)^-1 (y - m(X)) is computed once when
+    the model is exported. The cross-covariance with the training
+    inputs is evaluated in blocks of `block_size` points, so each block
+    is a single matrix product. A model of several outputs that share
+    the kernel (one column of alpha per output) is evaluated with the
+    same cross-covariance for all outputs. No gpflow or TensorFlow
+    import is required to evaluate, save, or load the predictor.
+
+    Parameters
+    ----------
+    kernel_name : string
+        "RBF", "Matern32", or "Matern52"
+    variance : float
+        Kernel variance
+    lengthscales : np.ndarray, shape=(n_inputs,) or float
+        Kernel lengthscales
+    x_train : np.ndarray, shape=(n_train, n_inputs)
+        Training inputs
+    alpha : np.ndarray, shape=(n_train, n_outputs)
+        Weights of the posterior mean
+    mean_A : np.ndarray, shape=(n_inputs, n_outputs)
+        Slope of the linear mean function
+    mean_b : np.ndarray, shape=(n_outputs,)
+        Intercept of the linear mean function
+    chol : np.ndarray, shape=(n_train, n_train), optional
+        Lower Cholesky factor of K(X, X) + noise * I. Only needed for
+        the predictive variance returned by `predict_f`
+    block_size : int
+        Number of points per block
+    """
+
+    def __init__(
+        self,
+        kernel_name,
+        variance,
+        lengthscales,
+        x_train,
+        alpha,
+        mean_A,
+        mean_b,
+        chol=None,
+        block_size=1024,
+    ):
+        if kernel_name not in SUPPORTED_KERNELS:
+            raise ValueError(
+                "Invalid kernel_name {}. Supported kernels are "
+                "{}".format(kernel_name, SUPPORTED_KERNELS)
+            )
+        self.kernel_name = kernel_name
+        self.variance = float(variance)
+        self.lengthscales = np.asarray(lengthscales, dtype=np.float64)
+        self.x_train = np.asarray(x_train, dtype=np.float64)
+        self.alpha = np.asarray(alpha, dtype=np.float64).reshape(
+            self.x_train.shape[0], -1
+        )
+        self.mean_A = np.asarray(mean_A, dtype=np.float64).reshape(
+            self.x_train.shape[1], -1
+        )
+        self.mean_b = np.asarray(mean_b, dtype=np.float64).reshape(-1)
+        if chol is not None:
+            chol = np.asarray(chol, dtype=np.float64)
+        self.chol = chol
+        self.block_size = block_size
+        self._scaled_train = self.x_train / self.lengthscales
+        self._train_sq = np.sum(self._scaled_train ** 2, axis=1)
+
+    @property
+    def n_outputs(self):
+        """Number of outputs of the model"""
+        return self.alpha.shape[1]
+
+    def __call__(self, xx):
+        """Return the posterior mean, shape=(n_points, n_outputs)"""
+        xx = np.asarray(xx, dtype=np.float64)
+        means = xx @ self.mean_A + self.mean_b
+        for start in range(0, xx.shape[0], self.block_size):
+            stop = start + self.block_size
+            means[start:stop] += self.kernel(xx[start:stop]) @ self.alpha
+        return means
+
+    def predict_f(self, xx):
+        """Return the posterior mean and variance like gpflow's predict_f
+
+        Parameters
+        ----------
+        xx : np.ndarray, shape=(n_points, n_inputs)
+            Points at which to evaluate the model
+
+        Returns
+        -------
+        mean : np.ndarray, shape=(n_points, n_outputs)
+            Predicted mean
+        var : np.ndarray, shape=(n_points, n_outputs)
+            Predicted variance of the latent function, which is the
+            same for all outputs
+        """
+        if self.chol is None:
+            raise ValueError(
+                "The predictive variance requires a predictor exported "
+                "with the Cholesky factor"
+            )
+        xx = np.asarray(xx, dtype=np.float64)
+        means = xx @ self.mean_A + self.mean_b
+        vars_ = np.empty((xx.shape[0], self.n_outputs))
+        for start in range(0, xx.shape[0], self.block_size):
+            stop = start + self.block_size
+            kmn = self.kernel(xx[start:stop])
+            means[start:stop] += kmn @ self.alpha
+            v = solve_triangular(self.chol, kmn.T, lower=True)
+            vars_[start:stop] = (self.variance - np.sum(v ** 2, axis=0))[
+                :, np.newaxis
+            ]
+        return means, vars_
+
+    def update(self, x_new, y_new, noise_variance=None):
+        """Add training points with the hyperparameters held fixed
+
+        The Cholesky factor is extended with the rows of the new points
+        and alpha is recomputed by triangular solves, which costs
+        O(n_train^2 * n_new) instead of the O(n_train^3) of a new
+        factorization. The Cholesky factor is therefore required.
+
+        Parameters
+        ----------
+        x_new : np.ndarray, shape=(n_new, n_inputs)
+            New training inputs
+        y_new : np.ndarray, shape=(n_new,) or (n_new, n_outputs)
+            New (scaled) training outputs
+        noise_variance : np.ndarray, shape=(n_new,), optional
+            Total noise variance of the new points. By default, the
+            noise variance of the first training point is recovered
+            from the Cholesky factor, which is correct for a model with
+            a single noise level
+        """
+        if self.chol is None:
+            raise ValueError(
+                "Updates require a predictor exported with the Cholesky "
+                "factor"
+            )
+        x_new = np.asarray(x_new, dtype=np.float64)
+        y_new = np.asarray(y_new, dtype=np.float64).reshape(
+            -1, self.n_outputs
+        )
+        if x_new.shape[0] != y_new.shape[0]:
+            raise ValueError("x_new and y_new must have the same length")
+        if x_new.shape[0] == 0:
+            return
+
+        if noise_variance is None:
+            # The first diagonal element of L L^T is variance + noise
+            noise_variance = self.chol[0, 0] ** 2 - self.variance
+        n_train = self.x_train.shape[0]
+        # Forward-solved residuals L^-1 (y - m(X)) of the current points
+        z_train = self.chol.T @ self.alpha
+
+        # [[L, 0], [L21, L22]] is the factor with the new points appended
+        l21 = solve_triangular(self.chol, self.kernel(x_new).T, lower=True).T
+        scaled_new = x_new / self.lengthscales
+        knn = self._kernel_from_scaled(
+            scaled_new, scaled_new, np.sum(scaled_new ** 2, axis=1)
+        )
+        knn[np.diag_indices_from(knn)] += noise_variance
+        l22 = np.linalg.cholesky(knn - l21 @ l21.T)
+        resid_new = y_new - (x_new @ self.mean_A + self.mean_b)
+        z_new = solve_triangular(l22, resid_new - l21 @ z_train, lower=True)
+
+        chol = np.zeros((n_train + x_new.shape[0],) * 2)
+        chol[:n_train, :n_train] = self.chol
+        chol[n_train:, :n_train] = l21
+        chol[n_train:, n_train:] = l22
+        self.chol = chol
+        self.alpha = solve_triangular(
+            chol, np.vstack((z_train, z_new)), lower=True, trans="T"
+        )
+        self.x_train = np.vstack((self.x_train, x_new))
+        self._scaled_train = np.vstack((self._scaled_train, scaled_new))
+        self._train_sq = np.sum(self._scaled_train ** 2, axis=1)
+
+    def kernel(self, xx):
+        """Cross-covariance between xx and the training inputs"""
+        scaled = np.asarray(xx, dtype=np.float64) / self.lengthscales
+        return self._kernel_from_scaled(
+            scaled, self._scaled_train, self._train_sq
+        )
+
+    def _kernel_from_scaled(self, scaled, scaled_train, train_sq):
+        """Kernel between points already divided by the lengthscales"""
+        r2 = (
+            np.sum(scaled ** 2, axis=1)[:, np.newaxis]
+            + train_sq[np.newaxis, :]
+            - 2.0 * scaled @ scaled_train.T
+        )
+        np.maximum(r2, 0.0, out=r2)
+        if self.kernel_name == "RBF":
+            return self.variance * np.exp(-0.5 * r2)
+        r = np.sqrt(r2)
+        if self.kernel_name == "Matern32":
+            sqrt3_r = np.sqrt(3.0) * r
+            return self.variance * (1.0 + sqrt3_r) * np.exp(-sqrt3_r)
+        sqrt5_r = np.sqrt(5.0) * r
+        return (
+            self.variance * (1.0 + sqrt5_r + 5.0 / 3.0 * r2) * np.exp(-sqrt5_r)
+        )
+
+    def save(self, file_name):
+        """Save the predictor to a ".npz" file"""
+        arrays = {
+            "kernel_name": np.asarray(self.kernel_name),
+            "variance": np.asarray(self.variance),
+            "lengthscales": self.lengthscales,
+            "x_train": self.x_train,
+            "alpha": self.alpha,
+            "mean_A": self.mean_A,
+            "mean_b": self.mean_b,
+        }
+        if self.chol is not None:
+            arrays["chol"] = self.chol
+        np.savez(file_name, **arrays)
+
+
+def load_gp_mean(file_name, block_size=1024):
+    """Load a predictor saved with `GPMean.save`
+
+    Parameters
+    ----------
+    file_name : str
+        Path to the ".npz" file
+    block_size : int
+        Number of points per block
+
+    Returns
+    -------
+    gp_mean : GPMean
+        The predictor
+    """
+    with np.load(file_name) as data:
+        return GPMean(
+            str(data["kernel_name"]),
+            data["variance"],
+            data["lengthscales"],
+            data["x_train"],
+            data["alpha"],
+            data["mean_A"],
+            data["mean_b"],
+            chol=data["chol"] if "chol" in data.files else None,
+            block_size=block_size,
+        )
+
+
+def export_gp_mean(gp_model, file_name=None, block_size=1024):
+    """Convert a trained gpflow GPR model to a NumPy predictor
+
+    Parameters
+    ----------
+    gp_model : gpflow.models.GPR
+        Trained GP model with an RBF, Matern32, or Matern52 kernel and
+        a zero, constant, or linear mean function. The model may have
+        several output columns
+    file_name : str, optional
+        If given, the predictor is also saved to this ".npz" file
+    block_size : int
+        Number of points per block
+
+    Returns
+    -------
+    gp_mean : GPMean
+        The predictor
+    """
+    import gpflow
+
+    if not isinstance(gp_model, gpflow.models.GPR):
+        raise ValueError("Only gpflow.models.GPR models can be exported")
+
+    kernel_names = {
+        gpflow.kernels.RBF: "RBF",
+        gpflow.kernels.Matern32: "Matern32",
+        gpflow.kernels.Matern52: "Matern52",
+    }
+    kernel_name = kernel_names.get(type(gp_model.kernel))
+    if kernel_name is None:
+        raise ValueError(
+            "Unsupported kernel {}. Supported kernels are "
+            "{}".format(type(gp_model.kernel).__name__, SUPPORTED_KERNELS)
+        )
+
+    x_train = np.asarray(gp_model.data[0])
+    n_inputs = x_train.shape[1]
+    n_outputs = np.shape(gp_model.data[1])[1]
+    mean_function = gp_model.mean_function
+    if isinstance(mean_function, gpflow.mean_functions.Linear):
+        mean_A = np.asarray(mean_function.A).reshape(n_inputs, -1)
+        mean_b = np.asarray(mean_function.b).reshape(-1)
+    elif isinstance(mean_function, gpflow.mean_functions.Constant):
+        mean_A = np.zeros((n_inputs, n_outputs))
+        mean_b = np.asarray(mean_function.c).reshape(-1)
+    elif isinstance(mean_function, gpflow.mean_functions.Zero):
+        mean_A = np.zeros((n_inputs, n_outputs))
+        mean_b = np.zeros(n_outputs)
+    else:
+        raise ValueError(
+            "Unsupported mean function {}. Supported mean functions are "
+            "Linear, Constant, and Zero".format(type(mean_function).__name__)
+        )
+
+    alpha, chol = gpr_weights(gp_model)
+    gp_mean = GPMean(
+        kernel_name,
+        np.asarray(gp_model.kernel.variance),
+        np.asarray(gp_model.kernel.lengthscales),
+        x_train,
+        alpha,
+        mean_A,
+        mean_b,
+        chol=chol,
+        block_size=block_size,
+    )
+    if file_name is not None:
+        gp_mean.save(file_name)
+
+    return gp_mean
+
+
+def gpr_weights(gp_model):
+    """Return the posterior mean weights of a gpflow GPR model
+
+    The fixed noise of a `HeteroscedasticGPR` is added to the
+    likelihood variance.
+
+    Returns
+    -------
+    alpha : np.ndarray, shape=(n_train, n_outputs)
+        (K(X, X) + noise * I)^-1 (y - m(X))
+    chol : np.ndarray, shape=(n_train, n_train)
+        Lower Cholesky factor of K(X, X) + noise * I
+    """
+    x_train, y_train = gp_model.data
+    x_train = np.asarray(x_train)
+    kmm = np.array(gp_model.kernel(x_train))
+    kmm[np.diag_indices_from(kmm)] += np.asarray(
+        gp_model.likelihood.variance
+    ) + np.asarray(getattr(gp_model, "fixed_noise_variance", 0.0))
+    err = np.asarray(y_train) - np.asarray(gp_model.mean_function(x_train))
+    chol, lower = cho_factor(kmm, lower=True)
+    alpha = cho_solve((chol, lower), err)
+    return alpha, np.tril(chol)
@@ -0,0 +1,1251 @@
+import os
+import sys
+import pickle
+import hashlib
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+
+from fffit.models import run_gpflow_scipy
+from fffit.utils import shuffle_and_split, values_scaled_to_real
+
+from .gp_mean import export_gp_mean
+
+
+def fit_gp(x_train, y_train, kernel, method="exact", **kwargs):
+    """Fit a GP model with the selected training method
+
+    Parameters
+    ----------
+    x_train : np.ndarray, shape=(n_samples, n_inputs)
+        Training inputs
+    y_train : np.ndarray, shape=(n_samples,)
+        Training outputs
+    kernel : gpflow.kernels.Kernel
+        Kernel of the GP model
+    method : string
+        "exact" fits a GPR model with `fffit.models.run_gpflow_scipy`.
+        "sgpr" and "svgp" fit sparse models with inducing points via
+        `run_gpflow_sparse`
+    **kwargs
+        Passed to `run_gpflow_sparse` for the sparse methods
+
+    Returns
+    -------
+    model : gpflow.models.GPModel
+        The trained model
+    """
+    if method not in _METHODS:
+        raise ValueError(
+            "Invalid method {}. Supported methods are "
+            "{}".format(method, _METHODS)
+        )
+
+    if method == "exact":
+        if kwargs:
+            raise ValueError(
+                "Keyword arguments are only supported for sparse methods"
+            )
+        return run_gpflow_scipy(x_train, y_train, kernel)
+
+    return run_gpflow_sparse(x_train, y_train, kernel, method=method, **kwargs)
+
+
+def run_gpflow_sparse(
+    x_train,
+    y_train,
+    kernel,
+    method="sgpr",
+    n_inducing=500,
+    minibatch_size=None,
+    max_iter=5000,
+    learning_rate=0.01,
+    seed=None,
+    fmt="notebook",
+):
+    """Create and train a sparse GP model with inducing points
+
+    The inducing points are initialized at a random subset of the
+    training inputs and optimized along with the hyperparameters. As in
+    `fffit.models.run_gpflow_scipy`, a linear mean function is used.
+
+    Parameters
+    ----------
+    x_train : np.ndarray, shape=(n_samples, n_inputs)
+        Training inputs
+    y_train : np.ndarray, shape=(n_samples,)
+        Training outputs
+    kernel : gpflow.kernels.Kernel
+        Kernel of the GP model
+    method : string
+        "sgpr" fits a collapsed sparse GP with the scipy optimizer, at
+        O(n_samples * n_inducing^2) cost per iteration. "svgp" fits a
+        stochastic variational GP with Adam, optionally on minibatches
+    n_inducing : int
+        Number of inducing points. Limited to the number of samples
+    minibatch_size : int, optional
+        Minibatch size for "svgp". The full dataset is used if None
+    max_iter : int
+        Number of Adam steps for "svgp"
+    learning_rate : float
+        Adam learning rate for "svgp"
+    seed : int, optional
+        Seed for choosing the initial inducing points and minibatches
+    fmt : string
+        The formatting type for the gpflow print_summary
+
+    Returns
+    -------
+    model : gpflow.models.SGPR or gpflow.models.SVGP
+        The trained model
+    """
+    from gpflow.utilities import print_summary
+
+    valid_methods = ["sgpr", "svgp"]
+    if method not in valid_methods:
+        raise ValueError(
+            "Invalid method {}. Supported methods are "
+            "{}".format(method, valid_methods)
+        )
+
+    x_train = np.asarray(x_train, dtype=np.float64)
+    y_train = np.asarray(y_train, dtype=np.float64).reshape(-1, 1)
+    model = _build_gpr(
+        x_train,
+        y_train,
+        kernel,
+        method=method,
+        n_inducing=n_inducing,
+        seed=seed,
+    )
+    _optimize_gp(
+        model,
+        x_train,
+        y_train,
+        minibatch_size=minibatch_size,
+        max_iter=max_iter,
+        learning_rate=learning_rate,
+        seed=seed,
+    )
+
+    print_summary(model, fmt=fmt)
+
+    return model
+
+
+def run_gpflow_warm(
+    x_train,
+    y_train,
+    kernel,
+    molecule,
+    property_name,
+    store_dir=".gp_hyperparameters",
+    iteration=None,
+    fmt="notebook",
+):
+    """Create and train a GPR model starting from stored hyperparameters
+
+    The model is the same as in `fffit.models.run_gpflow_scipy` (GPR
+    with a linear mean function). If hyperparameters for the same
+    molecule, property, kernel and type of model were saved by a
+    previous fit (the previous iteration, whose training set is a
+    subset of this one, if `iteration` is given), they are used as the
+    initial point of the optimization instead of the values of
+    `kernel`. The optimized hyperparameters are then saved for the next
+    fit.
+
+    Parameters
+    ----------
+    x_train : np.ndarray, shape=(n_samples, n_inputs)
+        Training inputs
+    y_train : np.ndarray, shape=(n_samples,)
+        Training outputs
+    kernel : gpflow.kernels.Kernel
+        Kernel of the GP model
+    molecule : R32Constants, R125Constants or string
+        The molecule (or its name) the model is for
+    property_name : string
+        The property the model is for, e.g., "sim_liq_density"
+    store_dir : str
+        Directory where the hyperparameters are stored. Use the same
+        directory for all iterations
+    iteration : int, optional
+        Iteration of the training data. The hyperparameters are stored
+        for this iteration and the fit starts from those stored for
+        `iteration - 1`. If None, a single untagged file is used
+    fmt : string
+        The formatting type for the gpflow print_summary
+
+    Returns
+    -------
+    model : gpflow.models.GPR
+        The trained model
+    """
+    import gpflow
+    from gpflow.utilities import print_summary
+
+    model = _build_gpr(x_train, y_train, kernel)
+    initial_name, file_name = _hyperparameter_files(
+        store_dir,
+        molecule,
+        property_name,
+        type(kernel).__name__,
+        "exact",
+        iteration,
+    )
+    if os.path.isfile(initial_name):
+        if _assign_hyperparameters(
+            model, _load_hyperparameters(initial_name)
+        ):
+            print(f"Initialized hyperparameters from {initial_name}")
+
+    optimizer = gpflow.optimizers.Scipy()
+    result = optimizer.minimize(model.training_loss, model.trainable_variables)
+    print(f"Hyperparameter optimization took {result.nit} iterations")
+    print_summary(model, fmt=fmt)
+    _save_hyperparameters(model, file_name)
+
+    return model
+
+
+def fit_gp_models(
+    fits,
+    molecule=None,
+    store_dir=None,
+    iteration=None,
+    n_procs=None,
+    threads_per_fit=1,
+    n_restarts=1,
+    seed=None,
+    return_restarts=False,
+    registry_dir=None,
+    fmt="notebook",
+):
+    """Fit independent GPR models concurrently in worker processes
+
+    Each model is the same as in `fffit.models.run_gpflow_scipy` (GPR
+    with a linear mean function and unit initial lengthscales). The
+    fits run in new worker processes (not forks, so this is safe after
+    other TensorFlow computations), each limited to `threads_per_fit`
+    threads, so the wall time is close to that of the slowest fit.
+    Only the optimized hyperparameters are sent back; the models are
+    rebuilt in this process.
+
+    With `n_restarts` > 1, each model is optimized from several initial
+    points and the fit with the lowest training loss (negative log
+    marginal likelihood, or negative ELBO of sparse models) is kept.
+    The first restart starts from the default (or stored)
+    hyperparameters and the others from random kernel variances,
+    lengthscales, and noise variances drawn log-uniformly. All restarts
+    of all models share the worker processes.
+
+    Parameters
+    ----------
+    fits : dict
+        One dict per model, keyed by name (e.g., the property name),
+        with keys "x_train", "y_train", and optionally "kernel" ("RBF",
+        "Matern32", or "Matern52"; default "RBF"). A "y_train" with
+        several columns (see `split_multioutput`) gives a multi-output
+        model. With the key "noise_variance", the known noise variance
+        of each training point (see `split_with_noise`), a
+        `HeteroscedasticGPR` model is fit. With the key "method"
+        ("sgpr" or "svgp"; default "exact"), a sparse model with
+        "n_inducing" (default 500) inducing points is fit, as in
+        `run_gpflow_sparse`
+    molecule : R32Constants, R125Constants or string, optional
+        The molecule the models are for. Required with `store_dir`
+    store_dir : str, optional
+        If given, warm-start each fit from the hyperparameters stored
+        under its name, kernel, and type of model (exact, heteroscedastic,
+        or sparse method), and store the optimized values, as in
+        `run_gpflow_warm`
+    iteration : int, optional
+        Iteration of the training data, see `run_gpflow_warm`
+    n_procs : int, optional
+        Number of worker processes. Defaults to the number of fits,
+        limited to the number of CPUs
+    threads_per_fit : int
+        Number of TensorFlow threads used by each fit
+    n_restarts : int
+        Number of optimizations per model
+    seed : int, optional
+        Seed for the random initial points of the restarts
+    return_restarts : bool
+        Also return the results of every restart
+    registry_dir : str, optional
+        If given, models found in this registry of trained models (see
+        `utils.model_registry`) are loaded instead of fit, and the
+        fitted models are added to it. A model is only loaded if it
+        was fit from the same data, settings, and stored (warm-start)
+        hyperparameters. Requires `molecule`
+    fmt : string
+        The formatting type for the gpflow print_summary
+
+    Returns
+    -------
+    models : dict
+        The trained gpflow.models.GPR (or SGPR, SVGP) models keyed like
+        `fits`
+    restarts : pd.DataFrame
+        Only if `return_restarts`. One row per model and restart,
+        indexed by ("name", "restart"), with the final training loss
+        ("loss"), the number of optimizer iterations ("n_iter"), and
+        whether the restart was kept ("best"). The loss is infinite for
+        restarts that failed. Models loaded from the registry have no
+        rows
+    """
+    from gpflow.utilities import print_summary
+
+    uses_files = store_dir is not None or registry_dir is not None
+    if uses_files and molecule is None:
+        raise ValueError(
+            "molecule must be specified with store_dir or registry_dir"
+        )
+    if n_restarts < 1:
+        raise ValueError("n_restarts must be a positive integer")
+    for name, fit in fits.items():
+        for key in ["x_train", "y_train"]:
+            if key not in fit:
+                raise ValueError(f"Fit '{name}' must contain the key '{key}'")
+        if fit.get("noise_variance") is not None and (
+            np.size(fit["y_train"]) != np.shape(fit["x_train"])[0]
+        ):
+            raise ValueError(
+                f"Fit '{name}': noise_variance requires a single output"
+            )
+        kernel_name = fit.get("kernel", "RBF")
+        if kernel_name not in _KERNEL_NAMES:
+            raise ValueError(
+                "Invalid kernel {}. Supported kernels are "
+                "{}".format(kernel_name, _KERNEL_NAMES)
+            )
+        method = fit.get("method", "exact")
+        if method not in _METHODS:
+            raise ValueError(
+                "Invalid method {}. Supported methods are "
+                "{}".format(method, _METHODS)
+            )
+        if method != "exact" and fit.get("noise_variance") is not None:
+            raise ValueError(
+                f"Fit '{name}': noise_variance requires the method 'exact'"
+            )
+
+    # Warm start from the hyperparameters stored by the last iteration
+    file_names = {}
+    initials = {}
+    for name, fit in fits.items():
+        initials[name] = None
+        if store_dir is not None:
+            initial_name, file_names[name] = _hyperparameter_files(
+                store_dir,
+                molecule,
+                name,
+                fit.get("kernel", "RBF"),
+                _model_type(fit),
+                iteration,
+            )
+            if os.path.isfile(initial_name):
+                initials[name] = _load_hyperparameters(initial_name)
+
+    registered = {}
+    if registry_dir is not None:
+        from .model_registry import load_registered_params, model_metadata
+        from .prediction_cache import array_fingerprint
+
+        for name, fit in fits.items():
+            options = {"n_restarts": n_restarts}
+            if fit.get("method", "exact") != "exact":
+                options["method"] = fit["method"]
+                options["n_inducing"] = int(fit.get("n_inducing", 500))
+            if fit.get("noise_variance") is not None:
+                options["noise_hash"] = array_fingerprint(
+                    np.asarray(fit["noise_variance"], dtype=np.float64)
+                )
+            # The optimum found can depend on the starting point
+            if initials[name] is not None:
+                options["initial_hash"] = hashlib.sha1(
+                    "".join(
+                        param_name + array_fingerprint(value)
+                        for param_name, value in sorted(
+                            initials[name].items()
+                        )
+                    ).encode()
+                ).hexdigest()
+            metadata = model_metadata(
+                fit["x_train"],
+                fit["y_train"],
+                fit.get("kernel", "RBF"),
+                molecule,
+                name,
+                seed=seed,
+                **options,
+            )
+            registered[name] = (
+                metadata,
+                load_registered_params(metadata, registry_dir),
+            )
+
+    names = [
+        name
+        for name in fits
+        if name not in registered or registered[name][1] is None
+    ]
+    args = [
+        (
+            fits[name]["x_train"],
+            fits[name]["y_train"],
+            fits[name].get("kernel", "RBF"),
+            initials[name],
+        )
+        for name in names
+    ]
+
+    # The first restart of each model is not randomized
+    restart_seeds = np.random.default_rng(seed).integers(
+        2 ** 32, size=(len(names), n_restarts)
+    )
+    tasks = [
+        arg
+        + (
+            int(restart_seeds[i, j]) if j > 0 else None,
+            fits[names[i]].get("noise_variance"),
+            fits[names[i]].get("method", "exact"),
+            fits[names[i]].get("n_inducing", 500),
+            int(restart_seeds[i, j]),
+        )
+        for i, arg in enumerate(args)
+        for j in range(n_restarts)
+    ]
+
+    if n_procs is None:
+        n_procs = min(len(tasks), os.cpu_count())
+    if n_procs > 1 and len(tasks) > 1:
+        results = _map_fit_tasks(tasks, n_procs, threads_per_fit)
+    else:
+        results = [_fit_gpr(*task) for task in tasks]
+
+    fitted = {}
+    rows = []
+    for i, (name, (x_train, y_train, kernel_name, initial)) in enumerate(
+        zip(names, args)
+    ):
+        fit_results = results[i * n_restarts : (i + 1) * n_restarts]
+        losses = np.array([loss for params, n_iter, loss in fit_results])
+        best = int(np.argmin(losses))
+        if not np.isfinite(losses[best]):
+            raise ValueError(f"All optimizations of '{name}' failed")
+        for restart, (params, n_iter, loss) in enumerate(fit_results):
+            rows.append(
+                {
+                    "name": name,
+                    "restart": restart,
+                    "loss": loss,
+                    "n_iter": n_iter,
+                    "best": restart == best,
+                }
+            )
+
+        params, n_iter, loss = fit_results[best]
+        model = _build_gpr(
+            x_train,
+            y_train,
+            _make_kernel(kernel_name, x_train.shape[1]),
+            fits[name].get("noise_variance"),
+            method=fits[name].get("method", "exact"),
+            n_inducing=fits[name].get("n_inducing", 500),
+        )
+        _assign_hyperparameters(model, params)
+        print(f"Hyperparameter optimization of {name}: {n_iter} iterations")
+        if n_restarts > 1:
+            finite = losses[np.isfinite(losses)]
+            print(
+                f"Best of {n_restarts} restarts (restart {best}): loss "
+                f"{loss:.4f}, spread {np.max(finite) - np.min(finite):.4f}, "
+                f"{n_restarts - finite.shape[0]} failed"
+            )
+        print_summary(model, fmt=fmt)
+        if store_dir is not None:
+            _save_hyperparameters(model, file_names[name])
+        if registry_dir is not None:
+            from .model_registry import register_gpr
+
+            register_gpr(model, registered[name][0], registry_dir)
+        fitted[name] = model
+
+    models = {}
+    for name, fit in fits.items():
+        if name in fitted:
+            models[name] = fitted[name]
+            continue
+        model = _build_gpr(
+            fit["x_train"],
+            fit["y_train"],
+            _make_kernel(fit.get("kernel", "RBF"), fit["x_train"].shape[1]),
+            fit.get("noise_variance"),
+            method=fit.get("method", "exact"),
+            n_inducing=fit.get("n_inducing", 500),
+        )
+        _assign_hyperparameters(model, registered[name][1])
+        print(f"Loaded {name} from {registry_dir}")
+        print_summary(model, fmt=fmt)
+        # Keep the warm start of the next iteration
+        if store_dir is not None:
+            _save_hyperparameters(model, file_names[name])
+        models[name] = model
+
+    if return_restarts:
+        restarts = pd.DataFrame(
+            rows, columns=["name", "restart", "loss", "n_iter", "best"]
+        )
+        return models, restarts.set_index(["name", "restart"])
+    return models
+
+
+class IncrementalGP:
+    """Exact GP model that is updated as new training points arrive
+
+    New points (e.g., from simulations that just finished) are added to
+    the NumPy predictor with `GPMean.update`, keeping the
+    hyperparameters fixed, so predictions are refreshed without a new
+    factorization of the full covariance. Optionally, once
+    `reoptimize_every` points have been added, the hyperparameters are
+    re-optimized on all the data, starting from their current values.
+
+    Parameters
+    ----------
+    gp_model : gpflow.models.GPR
+        Trained GP model with an RBF, Matern32, or Matern52 kernel and
+        a linear mean function, e.g., from `fffit.models.run_gpflow_scipy`
+        or a `HeteroscedasticGPR`
+    reoptimize_every : int, optional
+        Number of added points after which the hyperparameters are
+        re-optimized. Never re-optimize if None
+    fmt : string
+        The formatting type for the gpflow print_summary
+
+    Attributes
+    ----------
+    predictor : GPMean
+        NumPy predictor with all training points. Can be passed to the
+        screening functions in `utils.id_new_samples`
+    x_train : np.ndarray, shape=(n_train, n_inputs)
+        All training inputs
+    y_train : np.ndarray, shape=(n_train, n_outputs)
+        All training outputs
+    noise_variance : np.ndarray, shape=(n_train,) or None
+        Known noise variance of the training points of a
+        `HeteroscedasticGPR`
+    n_added : int
+        Number of points added since the last optimization
+    """
+
+    def __init__(self, gp_model, reoptimize_every=None, fmt="notebook"):
+        from gpflow.utilities import parameter_dict
+
+        if reoptimize_every is not None and reoptimize_every < 1:
+            raise ValueError("reoptimize_every must be a positive integer")
+        self.predictor = export_gp_mean(gp_model)
+        self.x_train = np.asarray(gp_model.data[0], dtype=np.float64)
+        self.y_train = np.asarray(gp_model.data[1], dtype=np.float64)
+        self.params = {
+            name: np.asarray(param.numpy())
+            for name, param in parameter_dict(gp_model).items()
+        }
+        self.noise_variance = getattr(gp_model, "fixed_noise_variance", None)
+        self.reoptimize_every = reoptimize_every
+        self.fmt = fmt
+        self.n_added = 0
+
+    @property
+    def model(self):
+        """gpflow.models.GPR with all training points"""
+        model = _build_gpr(
+            self.x_train,
+            self.y_train,
+            _make_kernel(self.predictor.kernel_name, self.x_train.shape[1]),
+            self.noise_variance,
+        )
+        _assign_hyperparameters(model, self.params)
+        return model
+
+    def add_data(self, x_new, y_new, noise_variance=None):
+        """Add training points
+
+        Parameters
+        ----------
+        x_new : np.ndarray, shape=(n_new, n_inputs)
+            New training inputs
+        y_new : np.ndarray, shape=(n_new,) or (n_new, n_outputs)
+            New (scaled) training outputs
+        noise_variance : np.ndarray, shape=(n_new,), optional
+            Known noise variance of the new points. Required for a
+            `HeteroscedasticGPR`
+
+        Returns
+        -------
+        reoptimized : bool
+            Whether the hyperparameters were re-optimized
+        """
+        x_new = np.asarray(x_new, dtype=np.float64)
+        y_new = np.asarray(y_new, dtype=np.float64).reshape(
+            -1, self.y_train.shape[1]
+        )
+        if x_new.shape[0] != y_new.shape[0]:
+            raise ValueError("x_new and y_new must have the same length")
+        if (noise_variance is None) != (self.noise_variance is None):
+            raise ValueError(
+                "noise_variance must be given if and only if the model is "
+                "heteroscedastic"
+            )
+        self.x_train = np.vstack((self.x_train, x_new))
+        self.y_train = np.vstack((self.y_train, y_new))
+        if noise_variance is not None:
+            noise_variance = np.asarray(noise_variance, dtype=np.float64)
+            self.noise_variance = np.concatenate(
+                (self.noise_variance, noise_variance.reshape(-1))
+            )
+        self.n_added += x_new.shape[0]
+
+        if (
+            self.reoptimize_every is not None
+            and self.n_added >= self.reoptimize_every
+        ):
+            self.reoptimize()
+            return True
+        if noise_variance is not None:
+            noise_variance = (
+                self.params[".likelihood.variance"] + noise_variance
+            )
+        self.predictor.update(x_new, y_new, noise_variance)
+        return False
+
+    def reoptimize(self):
+        """Re-optimize the hyperparameters on all training points"""
+        from gpflow.utilities import print_summary
+
+        params, n_iter, loss = _fit_gpr(
+            self.x_train,
+            self.y_train,
+            self.predictor.kernel_name,
+            initial=self.params,
+            noise_variance=self.noise_variance,
+        )
+        if params is None:
+            raise ValueError("Hyperparameter optimization failed")
+        self.params = params
+        model = self.model
+        print(f"Hyperparameter optimization took {n_iter} iterations")
+        print_summary(model, fmt=self.fmt)
+        self.predictor = export_gp_mean(
+            model, block_size=self.predictor.block_size
+        )
+        self.n_added = 0
+
+    def predict_f(self, xx):
+        """Return the posterior mean and variance like gpflow's predict_f"""
+        return self.predictor.predict_f(xx)
+
+
+def run_gpflow_heteroscedastic(
+    x_train, y_train, noise_variance, kernel, fmt="notebook"
+):
+    """Create and train a GPR model with known per-point noise
+
+    Same as `fffit.models.run_gpflow_scipy` (linear mean function,
+    scipy optimizer), but the model is a `HeteroscedasticGPR`.
+
+    Parameters
+    ----------
+    x_train : np.ndarray, shape=(n_samples, n_inputs)
+        Training inputs
+    y_train : np.ndarray, shape=(n_samples,)
+        Training outputs
+    noise_variance : np.ndarray, shape=(n_samples,)
+        Known noise variance of each training point, e.g., from
+        `split_with_noise`
+    kernel : gpflow.kernels.Kernel
+        Kernel of the GP model
+    fmt : string
+        The formatting type for the gpflow print_summary
+
+    Returns
+    -------
+    model : HeteroscedasticGPR
+        The trained model
+    """
+    import gpflow
+    from gpflow.utilities import print_summary
+
+    model = _build_gpr(
+        np.asarray(x_train, dtype=np.float64),
+        np.asarray(y_train, dtype=np.float64),
+        kernel,
+        noise_variance,
+    )
+    optimizer = gpflow.optimizers.Scipy()
+    optimizer.minimize(model.training_loss, model.trainable_variables)
+    print_summary(model, fmt=fmt)
+
+    return model
+
+
+def split_with_noise(
+    df, param_names, property_name, fraction_train=0.8, shuffle_seed=None
+):
+    """Create train/test sets with the noise variance of each point
+
+    The property and its uncertainty, the column
+    "{property_name}_unc" of a dataframe from `prepare_df_vle` or
+    `prepare_df_density`, are split like `fffit.utils.shuffle_and_split`.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Prepared data with uncertainties
+    param_names : list of string
+        Input columns, e.g., the parameters and "temperature"
+    property_name : string
+        Output column, e.g., "sim_vap_density"
+    fraction_train : float
+        Fraction of the rows in the training set
+    shuffle_seed : int, optional
+        Seed for shuffling the rows
+
+    Returns
+    -------
+    x_train : np.ndarray, shape=(n_train, n_inputs)
+    y_train : np.ndarray, shape=(n_train,)
+    noise_train : np.ndarray, shape=(n_train,)
+        Squared uncertainty of the training outputs
+    x_test : np.ndarray, shape=(n_test, n_inputs)
+    y_test : np.ndarray, shape=(n_test,)
+    noise_test : np.ndarray, shape=(n_test,)
+        Squared uncertainty of the test outputs
+    """
+    unc_name = property_name + "_unc"
+    if unc_name not in df.columns:
+        raise ValueError(f"df must contain column '{unc_name}'")
+    x_train, y_unc_train, x_test, y_unc_test = split_multioutput(
+        df,
+        param_names,
+        [property_name, unc_name],
+        fraction_train=fraction_train,
+        shuffle_seed=shuffle_seed,
+    )
+    return (
+        x_train,
+        y_unc_train[:, 0],
+        y_unc_train[:, 1] ** 2,
+        x_test,
+        y_unc_test[:, 0],
+        y_unc_test[:, 1] ** 2,
+    )
+
+
+def split_multioutput(
+    df, param_names, property_names, fraction_train=0.8, shuffle_seed=None
+):
+    """Create the train/test sets of a multi-output model
+
+    Each property is split with `fffit.utils.shuffle_and_split`, which
+    shuffles the rows of `df` identically for every property, so the
+    inputs are the same and the outputs are stacked as columns.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Prepared data, e.g., from `prepare_df_vle`
+    param_names : list of string
+        Input columns, e.g., the parameters and "temperature"
+    property_names : list of string
+        Output columns, e.g., ["sim_liq_density", "sim_vap_density",
+        "sim_Pvap", "sim_Hvap"]
+    fraction_train : float
+        Fraction of the rows in the training set
+    shuffle_seed : int, optional
+        Seed for shuffling the rows. If None, a random seed is drawn
+        and used for every property
+
+    Returns
+    -------
+    x_train : np.ndarray, shape=(n_train, n_inputs)
+    y_train : np.ndarray, shape=(n_train, n_outputs)
+    x_test : np.ndarray, shape=(n_test, n_inputs)
+    y_test : np.ndarray, shape=(n_test, n_outputs)
+    """
+    if shuffle_seed is None:
+        shuffle_seed = np.random.randint(2 ** 31)
+    y_trains = []
+    y_tests = []
+    for property_name in property_names:
+        x_train, y_train, x_test, y_test = shuffle_and_split(
+            df,
+            param_names,
+            property_name,
+            fraction_train=fraction_train,
+            shuffle_seed=shuffle_seed,
+        )
+        y_trains.append(np.asarray(y_train).reshape(-1))
+        y_tests.append(np.asarray(y_test).reshape(-1))
+
+    return x_train, np.column_stack(y_trains), x_test, np.column_stack(y_tests)
+
+
+def compare_gp_models(models, x_data, y_data, property_bounds, reference=None):
+    """Tabulate the accuracy of GP models in physical units
+
+    Parameters
+    ----------
+    models : dict
+        GP models keyed by name
+    x_data : np.ndarray, shape=(n_samples, n_inputs)
+        Inputs, e.g., a test set from `fffit.utils.shuffle_and_split`
+    y_data : np.ndarray, shape=(n_samples,)
+        Scaled outputs corresponding to `x_data`
+    property_bounds : np.ndarray
+        Bounds used to convert the scaled values to physical units
+    reference : string, optional
+        Name of the model (e.g., an exact GP) that the others are
+        compared against
+
+    Returns
+    -------
+    errors : pd.DataFrame
+        One row per model with the MSE, mean absolute error, and
+        maximum absolute error with respect to `y_data`. If `reference`
+        is given, also the MSE and maximum absolute difference between
+        each model and the reference model predictions
+    """
+    if reference is not None and reference not in models:
+        raise ValueError(f"reference model '{reference}' not in models")
+
+    y_real = values_scaled_to_real(
+        np.asarray(y_data).reshape(-1, 1), property_bounds
+    ).flatten()
+    predictions = {}
+    for name, model in models.items():
+        mean, var = model.predict_f(x_data)
+        predictions[name] = values_scaled_to_real(
+            np.asarray(mean).reshape(-1, 1), property_bounds
+        ).flatten()
+
+    rows = []
+    for name, pred in predictions.items():
+        err = pred - y_real
+        row = {
+            "model": name,
+            "mse": np.mean(err ** 2),
+            "mae": np.mean(np.abs(err)),
+            "max_abs_err": np.max(np.abs(err)),
+        }
+        if reference is not None:
+            diff = pred - predictions[reference]
+            row["mse_vs_reference"] = np.mean(diff ** 2)
+            row["max_abs_diff_vs_reference"] = np.max(np.abs(diff))
+        rows.append(row)
+
+    return pd.DataFrame(rows).set_index("model")
+
+
+_KERNEL_NAMES = ["RBF", "Matern32", "Matern52"]
+_METHODS = ["exact", "sgpr", "svgp"]
+
+
+def _make_kernel(kernel_name, n_inputs):
+    """Create a kernel with unit variance and lengthscales"""
+    import gpflow
+
+    kernel_class = getattr(gpflow.kernels, kernel_name)
+    return kernel_class(lengthscales=np.ones(n_inputs))
+
+
+def _build_gpr(
+    x_train,
+    y_train,
+    kernel,
+    noise_variance=None,
+    method="exact",
+    n_inducing=500,
+    seed=None,
+):
+    """Create a GPR model as in fffit.models.run_gpflow_scipy
+
+    A y_train with several columns gives a model of several outputs
+    that share the kernel, with one linear mean per output. With
+    noise_variance, a HeteroscedasticGPR model is created. With the
+    method "sgpr" or "svgp", a sparse model is created whose inducing
+    points are a random subset (drawn with seed) of n_inducing training
+    inputs.
+    """
+    import gpflow
+
+    y_train = y_train.reshape(x_train.shape[0], -1)
+    n_outputs = y_train.shape[1]
+    mean_function = gpflow.mean_functions.Linear(
+        A=np.zeros((x_train.shape[1], n_outputs)), b=np.zeros(n_outputs)
+    )
+    if method != "exact":
+        if noise_variance is not None:
+            raise ValueError(
+                "noise_variance is only supported for exact models"
+            )
+        rng = np.random.default_rng(seed)
+        n_samples = x_train.shape[0]
+        inducing_idx = rng.choice(
+            n_samples, size=min(n_inducing, n_samples), replace=False
+        )
+        inducing_points = x_train[np.sort(inducing_idx)].copy()
+        if method == "sgpr":
+            return gpflow.models.SGPR(
+                data=(x_train, y_train),
+                kernel=kernel,
+                inducing_variable=inducing_points,
+                mean_function=mean_function,
+            )
+        return gpflow.models.SVGP(
+            kernel=kernel,
+            likelihood=gpflow.likelihoods.Gaussian(),
+            inducing_variable=inducing_points,
+            mean_function=mean_function,
+            num_latent_gps=n_outputs,
+            num_data=n_samples,
+        )
+    if noise_variance is not None:
+        from .hetero_gp import HeteroscedasticGPR
+
+        return HeteroscedasticGPR(
+            data=(x_train, y_train),
+            kernel=kernel,
+            noise_variance=noise_variance,
+            mean_function=mean_function,
+        )
+    return gpflow.models.GPR(
+        data=(x_train, y_train),
+        kernel=kernel,
+        mean_function=mean_function,
+    )
+
+
+def _optimize_gp(
+    model,
+    x_train,
+    y_train,
+    minibatch_size=None,
+    max_iter=5000,
+    learning_rate=0.01,
+    seed=None,
+):
+    """Optimize the parameters of a model from _build_gpr
+
+    SVGP models are trained with Adam, optionally on minibatches, and
+    all other models with the scipy optimizer.
+
+    Returns
+    -------
+    n_iter : int
+        Number of optimizer iterations
+    """
+    import gpflow
+    import tensorflow as tf
+
+    if not isinstance(model, gpflow.models.SVGP):
+        optimizer = gpflow.optimizers.Scipy()
+        result = optimizer.minimize(
+            model.training_loss, model.trainable_variables
+        )
+        return int(result.nit)
+
+    y_train = y_train.reshape(x_train.shape[0], -1)
+    n_samples = x_train.shape[0]
+    if minibatch_size is None or minibatch_size >= n_samples:
+        training_loss = model.training_loss_closure(
+            (x_train, y_train), compile=True
+        )
+    else:
+        dataset = (
+            tf.data.Dataset.from_tensor_slices((x_train, y_train))
+            .repeat()
+            .shuffle(n_samples, seed=seed)
+            .batch(minibatch_size)
+        )
+        training_loss = model.training_loss_closure(
+            iter(dataset), compile=True
+        )
+    optimizer = tf.optimizers.Adam(learning_rate)
+    for step in range(max_iter):
+        optimizer.minimize(training_loss, model.trainable_variables)
+    return max_iter
+
+
+def _training_loss(model, x_train, y_train):
+    """Return the training loss of a model from _build_gpr"""
+    import gpflow
+
+    if isinstance(model, gpflow.models.SVGP):
+        y_train = y_train.reshape(x_train.shape[0], -1)
+        return float(model.training_loss((x_train, y_train)).numpy())
+    return float(model.training_loss().numpy())
+
+
+def _fit_gpr(
+    x_train,
+    y_train,
+    kernel_name,
+    initial=None,
+    seed=None,
+    noise_variance=None,
+    method="exact",
+    n_inducing=500,
+    inducing_seed=None,
+):
+    """Fit a GPR model and return its hyperparameters
+
+    If `seed` is given, the optimization starts from random kernel
+    variance, lengthscales, and noise variance instead of `initial`.
+    With `noise_variance`, a HeteroscedasticGPR model is fit. With the
+    method "sgpr" or "svgp", a sparse model with `n_inducing` inducing
+    points chosen with `inducing_seed` is fit, and the optimized
+    inducing points are part of the returned parameters.
+
+    Returns
+    -------
+    params : dict
+        Optimized parameter values keyed by parameter path. None if the
+        optimization failed
+    n_iter : int
+        Number of optimizer iterations
+    loss : float
+        Final training loss (negative log marginal likelihood, or
+        negative ELBO for sparse models). Infinite if the optimization
+        failed
+    """
+    import tensorflow as tf
+    from gpflow.utilities import parameter_dict
+
+    model = _build_gpr(
+        x_train,
+        y_train,
+        _make_kernel(kernel_name, x_train.shape[1]),
+        noise_variance,
+        method=method,
+        n_inducing=n_inducing,
+        seed=inducing_seed,
+    )
+    if seed is not None:
+        rng = np.random.default_rng(seed)
+        model.kernel.lengthscales.assign(
+            10.0 ** rng.uniform(-1.0, 1.0, size=x_train.shape[1])
+        )
+        model.kernel.variance.assign(10.0 ** rng.uniform(-1.0, 1.0))
+        model.likelihood.variance.assign(10.0 ** rng.uniform(-5.0, -1.0))
+    elif initial is not None:
+        _assign_hyperparameters(model, initial)
+    try:
+        n_iter = _optimize_gp(model, x_train, y_train, seed=inducing_seed)
+    except tf.errors.InvalidArgumentError:
+        # Cholesky decomposition failed from a poor initial point
+        return None, 0, np.inf
+    loss = _training_loss(model, x_train, y_train)
+    if not np.isfinite(loss):
+        return None, n_iter, np.inf
+    params = {
+        name: np.asarray(param.numpy())
+        for name, param in parameter_dict(model).items()
+    }
+    return params, n_iter, loss
+
+
+# Read by the OpenMP/BLAS runtimes and TensorFlow when they are loaded
+_THREAD_VARIABLES = [
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "TF_NUM_INTRAOP_THREADS",
+    "TF_NUM_INTEROP_THREADS",
+]
+
+# Run by each worker of _map_fit_tasks with the task and result files
+_WORKER_CODE = """
+import sys
+import pickle
+import importlib
+
+with open(sys.argv[1], "rb") as f:
+    path, module_name, n_threads, tasks = pickle.load(f)
+sys.path[:] = path
+module = importlib.import_module(module_name)
+module._init_fit_worker(n_threads)
+results = [module._fit_gpr(*task) for task in tasks]
+with open(sys.argv[2], "wb") as f:
+    pickle.dump(results, f)
+"""
+
+
+def _map_fit_tasks(tasks, n_procs, threads_per_fit):
+    """Run _fit_gpr for each task in n_procs new Python processes
+
+    The workers are new interpreters, not forks, so they never inherit
+    an initialized TensorFlow runtime, and the thread limits are in
+    their environment before TensorFlow or OpenMP are loaded. They do
+    not import the main script, which need not be safe to import. The
+    largest fits are assigned first, each to the least loaded worker.
+    """
+    costs = np.array([float(np.shape(task[0])[0]) ** 3 for task in tasks])
+    n_workers = min(n_procs, len(tasks))
+    loads = np.zeros(n_workers)
+    assigned = [[] for worker in range(n_workers)]
+    for i in np.argsort(-costs, kind="stable"):
+        worker = int(np.argmin(loads))
+        assigned[worker].append(int(i))
+        loads[worker] += costs[i]
+
+    env = dict(os.environ)
+    for name in _THREAD_VARIABLES:
+        env[name] = str(threads_per_fit)
+    results = [None] * len(tasks)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        workers = []
+        try:
+            for worker, indices in enumerate(assigned):
+                task_name = os.path.join(tmp_dir, f"tasks-{worker}.pkl")
+                result_name = os.path.join(tmp_dir, f"results-{worker}.pkl")
+                with open(task_name, "wb") as f:
+                    pickle.dump(
+                        (
+                            list(sys.path),
+                            __name__,
+                            threads_per_fit,
+                            [tasks[i] for i in indices],
+                        ),
+                        f,
+                    )
+                process = subprocess.Popen(
+                    [
+                        sys.executable,
+                        "-c",
+                        _WORKER_CODE,
+                        task_name,
+                        result_name,
+                    ],
+                    env=env,
+                )
+                workers.append((process, indices, result_name))
+            for process, indices, result_name in workers:
+                if process.wait() != 0:
+                    raise RuntimeError(
+                        "GP fitting worker failed with exit code "
+                        f"{process.returncode}"
+                    )
+                with open(result_name, "rb") as f:
+                    for i, result in zip(indices, pickle.load(f)):
+                        results[i] = result
+        finally:
+            for process, indices, result_name in workers:
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+
+    return results
+
+
+def _init_fit_worker(n_threads):
+    """Limit the number of threads used by a new fitting process"""
+    import tensorflow as tf
+
+    tf.config.threading.set_intra_op_parallelism_threads(n_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(n_threads)
+
+
+def _model_type(fit):
+    """Return the type of model of a fit of fit_gp_models
+
+    Returns
+    -------
+    model_type : string
+        "hetero" for a fit with noise_variance, otherwise the method
+        ("exact", "sgpr", or "svgp")
+    """
+    if fit.get("noise_variance") is not None:
+        return "hetero"
+    return fit.get("method", "exact")
+
+
+def _hyperparameter_files(
+    store_dir, molecule, property_name, kernel_name, model_type, iteration
+):
+    """Return the files of the stored hyperparameters for a model
+
+    Models with a different likelihood or approximation never share a
+    file. With an iteration, the hyperparameters are stored per
+    iteration and read from the previous one.
+
+    Returns
+    -------
+    initial_name : str
+        File with the hyperparameters the fit starts from
+    file_name : str
+        File where the optimized hyperparameters are stored
+    """
+    base_name = os.path.join(
+        store_dir,
+        "-".join(
+            [_molecule_name(molecule), property_name, kernel_name, model_type]
+        ),
+    )
+    if iteration is None:
+        return base_name + ".npz", base_name + ".npz"
+    return (
+        f"{base_name}-iter{iteration - 1}.npz",
+        f"{base_name}-iter{iteration}.npz",
+    )
+
+
+def _load_hyperparameters(file_name):
+    """Load stored hyperparameters as a dict of arrays"""
+    with np.load(file_name) as stored:
+        return {name: stored[name] for name in stored.files}
+
+
+def _assign_hyperparameters(model, params):
+    """Assign params to model if they describe the same model
+
+    Returns
+    -------
+    assigned : bool
+        Whether the parameters were assigned
+    """
+    from gpflow.utilities import multiple_assign, parameter_dict
+
+    current = parameter_dict(model)
+    if params.keys() != current.keys() or any(
+        np.shape(params[name]) != tuple(current[name].shape)
+        for name in params
+    ):
+        return False
+    multiple_assign(model, params)
+    return True
+
+
+def _save_hyperparameters(model, file_name):
+    """Save the parameter values of model"""
+    from gpflow.utilities import parameter_dict
+
+    os.makedirs(os.path.dirname(file_name) or ".", exist_ok=True)
+    tmp_name = file_name + ".tmp"
+    with open(tmp_name, "wb") as f:
+        np.savez(
+            f,
+            **{
+                name: np.asarray(param.numpy())
+                for name, param in parameter_dict(model).items()
+            },
+        )
+    os.replace(tmp_name, file_name)
+
+
+def _molecule_name(molecule):
+    """Return a name for a molecule constants class instance"""
+    if isinstance(molecule, str):
+        return molecule
+    return type(molecule).__name__.replace("Constants", "")
@@ -0,0 +1,76 @@
+import gpflow
+import numpy as np
+import tensorflow as tf
+
+from gpflow.conditionals.util import base_conditional
+from gpflow.logdensities import multivariate_normal
+
+
+class HeteroscedasticGPR(gpflow.models.GPR):
+    """GPR model with a known noise variance for each training point
+
+    The noise variance of training point i is the (trainable) variance
+    of the Gaussian likelihood plus the fixed `noise_variance[i]`, e.g.,
+    the squared block-average uncertainty of the simulation result. The
+    likelihood variance absorbs noise that is not captured by the
+    uncertainties. Noisy points, e.g., vapor densities and vapor
+    pressures near the critical point, then have less influence on the
+    fit than precise ones.
+
+    Parameters
+    ----------
+    data : tuple
+        Training inputs, shape=(n_samples, n_inputs), and outputs,
+        shape=(n_samples, n_outputs)
+    kernel : gpflow.kernels.Kernel
+        Kernel of the GP model
+    noise_variance : np.ndarray, shape=(n_samples,)
+        Known noise variance of each training point
+    mean_function : gpflow.mean_functions.MeanFunction, optional
+        Mean function of the GP model
+    """
+
+    def __init__(self, data, kernel, noise_variance, mean_function=None):
+        super().__init__(data, kernel, mean_function=mean_function)
+        noise_variance = np.asarray(noise_variance, dtype=np.float64)
+        if noise_variance.shape != (np.shape(data[0])[0],):
+            raise ValueError(
+                "noise_variance must have one entry per training point"
+            )
+        if np.any(noise_variance < 0.0) or not np.all(
+            np.isfinite(noise_variance)
+        ):
+            raise ValueError("noise_variance must be finite and non-negative")
+        self.fixed_noise_variance = noise_variance
+
+    def _noisy_covariance(self, x):
+        """Covariance of the training outputs"""
+        k = self.kernel(x)
+        return tf.linalg.set_diag(
+            k,
+            tf.linalg.diag_part(k)
+            + self.likelihood.variance
+            + self.fixed_noise_variance,
+        )
+
+    def log_marginal_likelihood(self):
+        x, y = self.data
+        chol = tf.linalg.cholesky(self._noisy_covariance(x))
+        return tf.reduce_sum(
+            multivariate_normal(y, self.mean_function(x), chol)
+        )
+
+    def predict_f(self, xnew, full_cov=False, full_output_cov=False):
+        x, y = self.data
+        err = y - self.mean_function(x)
+        kmn = self.kernel(x, xnew)
+        knn = self.kernel(xnew, full_cov=full_cov)
+        f_mean, f_var = base_conditional(
+            kmn,
+            self._noisy_covariance(x),
+            knn,
+            err,
+            full_cov=full_cov,
+            white=False,
+        )
+        return f_mean + self.mean_function(xnew), f_var
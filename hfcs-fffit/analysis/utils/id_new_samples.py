@@ -1,18 +1,29 @@
+import functools
+import multiprocessing
 import numpy as np
 import pandas as pd
+from multiprocessing import shared_memory
+from scipy.spatial import cKDTree
 
 from fffit.utils import values_real_to_scaled, values_scaled_to_real
 
+from .gp_approx import RandomFeatureMean
+from .gp_mean import GPMean, export_gp_mean, gpr_weights
+
 
 def prepare_df_density(df_csv, molecule, liquid_density_threshold):
     """Prepare a pandas dataframe for fitting a GP model to density data
 
     Performs the following actions:
        - Renames "density" to "md_density"
+       - Renames "density_unc" to "md_density_unc", if present
        - Adds "expt_density"
        - Adds "is_liquid"
        - Converts all values from physical values to scaled values
 
+    The uncertainties are scaled by the width of the property bounds,
+    so they are in the same units as the scaled property.
+
     Parameters
     ----------
     df_csv : pd.DataFrame
@@ -41,32 +52,28 @@ def prepare_df_density(df_csv, molecule, liquid_density_threshold):
                 f"df_csv must contain a column for parameter: '{param}'"
             )
 
-    # Add expt density and is_liquid
-    df_all = df_csv.rename(columns={"density": "md_density"})
-    df_all["expt_density"] = df_all["temperature"].apply(
-        lambda temp: molecule.expt_liq_density[int(temp)]
-    )
-    df_all["is_liquid"] = df_all["md_density"].apply(
-        lambda x: x > liquid_density_threshold
-    )
-
-    # Scale all values
-    scaled_param_values = values_real_to_scaled(
-        df_all[list(molecule.param_names)], molecule.param_bounds
-    )
-    scaled_temperature = values_real_to_scaled(
-        df_all["temperature"], molecule.temperature_bounds
+    # Look up expt density and scale all values in one pass
+    md_density = df_csv["density"].to_numpy(dtype=np.float64)
+    (expt_density,) = _expt_reference_columns(
+        molecule, df_csv["temperature"], [molecule.expt_liq_density]
     )
-    scaled_md_density = values_real_to_scaled(
-        df_all["md_density"], molecule.liq_density_bounds
-    )
-    scaled_expt_density = values_real_to_scaled(
-        df_all["expt_density"], molecule.liq_density_bounds
+    scales = _param_temperature_scales(molecule)
+    scales["md_density"] = molecule.liq_density_bounds
+    scales["expt_density"] = molecule.liq_density_bounds
+    if "density_unc" in df_csv.columns:
+        scales["md_density_unc"] = _uncertainty_bounds(
+            molecule.liq_density_bounds
+        )
+    df_all = _prepared_frame(
+        df_csv,
+        rename={"density": "md_density", "density_unc": "md_density_unc"},
+        drop=[],
+        scales=scales,
+        added={
+            "expt_density": expt_density,
+            "is_liquid": md_density > liquid_density_threshold,
+        },
     )
-    df_all[list(molecule.param_names)] = scaled_param_values
-    df_all["temperature"] = scaled_temperature
-    df_all["md_density"] = scaled_md_density
-    df_all["expt_density"] = scaled_expt_density
 
     # Split out vapor and liquid samples
     df_liquid = df_all[df_all["is_liquid"] == True]
@@ -83,6 +90,9 @@ def prepare_df_vle(df_csv, molecule):
        - Renames "vap_density" to "sim_vap_density"
        - Renames "Pvap" to "sim_Pvap"
        - Removes "liq_enthalpy" and "vap_enthalpy" and adds "sim_Hvap"
+       - Renames the uncertainties "{property}_unc" to
+         "sim_{property}_unc", if present, and removes those of the
+         enthalpies
        - Adds "expt_liq_density"
        - Adds "expt_vap_density"
        - Adds "expt_Pvap"
@@ -90,6 +100,9 @@ def prepare_df_vle(df_csv, molecule):
        - Adds "is_liquid"
        - Converts all values from physical values to scaled values
 
+    The uncertainties are scaled by the width of the property bounds,
+    so they are in the same units as the scaled properties.
+
     Parameters
     ----------
     df_csv : pd.DataFrame
@@ -124,78 +137,57 @@ def prepare_df_vle(df_csv, molecule):
                 f"df_csv must contain a column for parameter: '{param}'"
             )
 
-    # Rename properties to MD, calculate Hvap, add expt properties
-    df_all = df_csv.rename(columns={"liq_density": "sim_liq_density"})
-    df_all = df_all.rename(columns={"vap_density": "sim_vap_density"})
-    df_all = df_all.rename(columns={"Pvap": "sim_Pvap"})
-    df_all = df_all.rename(columns={"Hvap": "sim_Hvap"})
-    df_all.drop(columns="vap_enthalpy", inplace=True)
-    df_all.drop(columns="liq_enthalpy", inplace=True)
-
-    # Convert Hvap to kJ/kg
-    df_all["sim_Hvap"] = (
-        df_all["sim_Hvap"] / molecule.molecular_weight * 1000.0
-    )
-
-    df_all["expt_liq_density"] = df_all["temperature"].apply(
-        lambda temp: molecule.expt_liq_density[int(temp)]
-    )
-    df_all["expt_vap_density"] = df_all["temperature"].apply(
-        lambda temp: molecule.expt_vap_density[int(temp)]
-    )
-    df_all["expt_Pvap"] = df_all["temperature"].apply(
-        lambda temp: molecule.expt_Pvap[int(temp)]
-    )
-    df_all["expt_Hvap"] = df_all["temperature"].apply(
-        lambda temp: molecule.expt_Hvap[int(temp)]
-    )
-
-    # Scale all values
-    scaled_param_values = values_real_to_scaled(
-        df_all[list(molecule.param_names)], molecule.param_bounds
-    )
-    scaled_temperature = values_real_to_scaled(
-        df_all["temperature"], molecule.temperature_bounds
-    )
-    scaled_sim_liq_density = values_real_to_scaled(
-        df_all["sim_liq_density"], molecule.liq_density_bounds
-    )
-    scaled_sim_vap_density = values_real_to_scaled(
-        df_all["sim_vap_density"], molecule.vap_density_bounds
-    )
-    scaled_sim_Pvap = values_real_to_scaled(
-        df_all["sim_Pvap"], molecule.Pvap_bounds
-    )
-    scaled_sim_Hvap = values_real_to_scaled(
-        df_all["sim_Hvap"], molecule.Hvap_bounds
+    # Look up the expt properties, convert Hvap to kJ/kg, and scale all
+    # values in one pass
+    expt_properties = _expt_reference_columns(
+        molecule,
+        df_csv["temperature"],
+        [
+            molecule.expt_liq_density,
+            molecule.expt_vap_density,
+            molecule.expt_Pvap,
+            molecule.expt_Hvap,
+        ],
     )
-    scaled_expt_liq_density = values_real_to_scaled(
-        df_all["expt_liq_density"], molecule.liq_density_bounds
+    rename = {"Hvap": "sim_Hvap"}
+    added = {"sim_Hvap": _hvap_kj_per_kg(df_csv["Hvap"], molecule)}
+    scales = _param_temperature_scales(molecule)
+    for name, bounds, expt_property in zip(
+        ["liq_density", "vap_density", "Pvap", "Hvap"],
+        [
+            molecule.liq_density_bounds,
+            molecule.vap_density_bounds,
+            molecule.Pvap_bounds,
+            molecule.Hvap_bounds,
+        ],
+        expt_properties,
+    ):
+        rename[name] = "sim_" + name
+        scales["sim_" + name] = bounds
+        added["expt_" + name] = expt_property
+        scales["expt_" + name] = bounds
+        if name + "_unc" in df_csv.columns:
+            rename[name + "_unc"] = "sim_" + name + "_unc"
+            scales["sim_" + name + "_unc"] = _uncertainty_bounds(bounds)
+    if "sim_Hvap_unc" in scales:
+        added["sim_Hvap_unc"] = _hvap_kj_per_kg(df_csv["Hvap_unc"], molecule)
+    df_all = _prepared_frame(
+        df_csv,
+        rename=rename,
+        drop=[
+            "liq_enthalpy",
+            "vap_enthalpy",
+            "liq_enthalpy_unc",
+            "vap_enthalpy_unc",
+        ],
+        scales=scales,
+        added=added,
     )
-    scaled_expt_vap_density = values_real_to_scaled(
-        df_all["expt_vap_density"], molecule.vap_density_bounds
-    )
-    scaled_expt_Pvap = values_real_to_scaled(
-        df_all["expt_Pvap"], molecule.Pvap_bounds
-    )
-    scaled_expt_Hvap = values_real_to_scaled(
-        df_all["expt_Hvap"], molecule.Hvap_bounds
-    )
-    df_all[list(molecule.param_names)] = scaled_param_values
-    df_all["temperature"] = scaled_temperature
-    df_all["sim_liq_density"] = scaled_sim_liq_density
-    df_all["sim_vap_density"] = scaled_sim_vap_density
-    df_all["sim_Pvap"] = scaled_sim_Pvap
-    df_all["sim_Hvap"] = scaled_sim_Hvap
-    df_all["expt_liq_density"] = scaled_expt_liq_density
-    df_all["expt_vap_density"] = scaled_expt_vap_density
-    df_all["expt_Pvap"] = scaled_expt_Pvap
-    df_all["expt_Hvap"] = scaled_expt_Hvap
 
     return df_all
 
 
-def classify_samples(samples, classifier):
+def classify_samples(samples, classifier, n_procs=1, return_proba=False):
     """Evaulate the classifer and return predicted liquid and vapor samples
 
     Parameters
@@ -204,6 +196,12 @@ def classify_samples(samples, classifier):
         Samples to rank
     classifier : sklearn.svm.SVC
         Classifier to distinguish between liquid and vapor
+    n_procs : int
+        Number of worker processes used to evaluate the classifier
+    return_proba : bool
+        Also return the probability that each sample is liquid. The
+        classifier must implement ``predict_proba``, e.g., a classifier
+        from `calibrate_classifier`
 
     Returns
     -------
@@ -211,17 +209,14 @@ def classify_samples(samples, classifier):
         Samples classified as liquid
     vapor_samples : np.ndarray, shape=(n_liquid, n_params)
         Samples classified as liquid
+    liquid_proba : np.ndarray, shape=(n_samples,)
+        Probability that each of `samples` is liquid. Only returned if
+        `return_proba` is True
 
     """
 
-    # Classification performed at the highest temperature
-    # Append highest temperature (1.0) to LH samples
-    samples_temperature = np.hstack(
-        (samples, np.tile(1.0, (samples.shape[0], 1)))
-    )
-
     # Apply clasifier
-    pred = classifier.predict(samples_temperature)
+    pred = _classify(samples, classifier, n_procs=n_procs)
 
     # Separate LH samples into predicted liquid and predicted vapor
     liquid_samples = samples[np.where(pred == 1)]
@@ -230,16 +225,58 @@ def classify_samples(samples, classifier):
     print("Shape of the predicted liquid samples:", liquid_samples.shape)
     print("Shape of the predicted vapor samples:", vapor_samples.shape)
 
+    if return_proba:
+        liquid_proba = _classify(
+            samples, classifier, n_procs=n_procs, method="predict_proba"
+        )
+        return liquid_samples, vapor_samples, liquid_proba
+
     return liquid_samples, vapor_samples
 
 
-def rank_samples(samples, gp_model, molecule, property_name, property_offset=0.0):
+def calibrate_classifier(classifier, x_calib, y_calib, method="sigmoid"):
+    """Calibrate the liquid probabilities of a trained classifier
+
+    Parameters
+    ----------
+    classifier : sklearn.svm.SVC
+        Trained classifier to distinguish between liquid and vapor
+    x_calib : np.ndarray, shape=(n_calib, n_params + 1)
+        Held-out inputs (e.g., the classifier test set) with the scaled
+        temperature as the last column
+    y_calib : np.ndarray, shape=(n_calib,)
+        Held-out labels, 1 for liquid and 0 for vapor
+    method : string
+        "sigmoid" (Platt scaling) or "isotonic"
+
+    Returns
+    -------
+    calibrated : sklearn.calibration.CalibratedClassifierCV
+        Classifier with ``predict`` and ``predict_proba``
+    """
+    from sklearn.calibration import CalibratedClassifierCV
+
+    calibrated = CalibratedClassifierCV(classifier, method=method, cv="prefit")
+    calibrated.fit(x_calib, y_calib)
+
+    return calibrated
+
+
+def rank_samples(
+    samples,
+    gp_model,
+    molecule,
+    property_name,
+    property_offset=0.0,
+    n_procs=1,
+    sort=True,
+):
     """Evalulate the GP model for a samples and return ranked results
     from lowest to highest MSE with experiment across the temperature range
 
     Parameters
     ----------
-    samples : np.ndarray, shape=(n_samples, n_params)
+    samples : np.ndarray or pd.DataFrame, shape=(n_samples, n_params)
         Samples to rank
     gp_model : gpflow.model
         GP model to predict the property_name of each sample
@@ -251,13 +288,983 @@ def rank_samples(samples, gp_model, molecule, property_name, property_offset=0.0
     property_offset : float
         Adjust the value predicted by the gp model by this amount.
         Quantity specified in physical units
+    n_procs : int
+        Number of worker processes used to evaluate the GP model
+    sort : bool
+        Sort the samples by MSE. Otherwise the samples are returned in
+        the order they were provided
+
+    Returns
+    -------
+    ranked_samples : pd.DataFrame
+        Samples sorted by MSE, with the index of `samples` if it is a
+        DataFrame and the position in `samples` otherwise
+    """
+
+    expt_property, property_bounds = _property_reference(
+        molecule, property_name
+    )
+
+    # Apply GP model and calculate mean squared errors (MSE) between
+    # GP model predictions and experimental data for all parameter samples
+    mse = _calc_gp_mse(
+        gp_model,
+        samples,
+        expt_property,
+        property_bounds,
+        molecule.temperature_bounds,
+        property_offset,
+        n_procs=n_procs,
+    )
+    # Make pandas dataframes, rank, and return
+    samples_mse = np.hstack((samples, mse.reshape(-1, 1)))
+    samples_mse = pd.DataFrame(
+        samples_mse,
+        columns=list(molecule.param_names) + ["mse"],
+        index=getattr(samples, "index", None),
+    )
+    if not sort:
+        return samples_mse
+    ranked_samples = samples_mse.sort_values("mse")
+
+    return ranked_samples
+
+
+def calc_sample_mses(
+    samples, gp_models, molecule, property_offsets=None, n_procs=1
+):
+    """Evaluate the MSE of each sample for several GP models at once
+
+    Parameters
+    ----------
+    samples : np.ndarray or pd.DataFrame, shape=(n_samples, n_params)
+        Samples to evaluate
+    gp_models : dict
+        GP models keyed by property name, e.g., {"sim_liq_density":
+        model, ...}. Valid property names are as in `rank_samples`. A
+        multi-output model is keyed by the tuple of the property names
+        of its outputs, e.g., {("sim_liq_density", "sim_vap_density",
+        "sim_Pvap", "sim_Hvap"): model}, and all its outputs are
+        evaluated with one cross-covariance computation per block
+    molecule : R32Constants, R125Constants
+        An instance of a molecule constants class
+    property_offsets : dict, optional
+        Offset in physical units added to the predictions of the model
+        for each property name. Defaults to 0.0
+    n_procs : int
+        Number of worker processes used to evaluate the GP models
+
+    Returns
+    -------
+    samples_mse : pd.DataFrame
+        The samples, in the order they were provided and with the index
+        of `samples` if it is a DataFrame, followed by one column
+        "mse_{property}" per property (e.g., "mse_liq_density")
+    """
+    if property_offsets is None:
+        property_offsets = {}
+
+    mses = []
+    columns = []
+    for key, gp_model in gp_models.items():
+        property_names = [key] if isinstance(key, str) else list(key)
+        references = [
+            _property_reference(molecule, property_name)
+            for property_name in property_names
+        ]
+        all_errs = _calc_multi_gp_errors(
+            gp_mean_predictor(gp_model),
+            samples,
+            [expt_property for expt_property, bounds in references],
+            [bounds for expt_property, bounds in references],
+            molecule.temperature_bounds,
+            [
+                property_offsets.get(property_name, 0.0)
+                for property_name in property_names
+            ],
+            n_procs=n_procs,
+        )
+        mses.append(np.mean(all_errs ** 2, axis=2))
+        columns += [
+            "mse_" + property_name.replace("sim_", "")
+            for property_name in property_names
+        ]
+
+    samples_mse = pd.DataFrame(
+        np.hstack([samples] + mses),
+        columns=list(molecule.param_names) + columns,
+        index=getattr(samples, "index", None),
+    )
+
+    return samples_mse
+
+
+def iter_sample_chunks(samples, chunk_size=100000):
+    """Yield blocks of candidate samples without loading them all at once
+
+    Parameters
+    ----------
+    samples : str or np.ndarray, shape=(n_samples, n_params)
+        Path to a comma-separated file of samples (e.g., the Latin
+        hypercube "LHS_5e5x10.csv"), a ".npy" file of samples, or an
+        array of samples (e.g., from `utils.samples.load_samples`)
+    chunk_size : int
+        Maximum number of samples per block
+
+    Yields
+    ------
+    chunk : np.ndarray, shape=(n_chunk, n_params)
+        The next block of samples
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be a positive integer")
+
+    if isinstance(samples, str) and samples.endswith(".npy"):
+        samples = np.load(samples, mmap_mode="r")
+
+    if isinstance(samples, str):
+        reader = pd.read_csv(
+            samples, header=None, dtype=np.float64, chunksize=chunk_size
+        )
+        for chunk in reader:
+            yield chunk.values
+    else:
+        samples = np.asarray(samples)
+        for start in range(0, samples.shape[0], chunk_size):
+            yield samples[start : start + chunk_size]
+
+
+def classify_sample_chunks(
+    sample_chunks, classifier, phase="liquid", n_procs=1, min_proba=None
+):
+    """Evaluate the classifier on each block and keep samples of one phase
+
+    Parameters
+    ----------
+    sample_chunks : iterable of np.ndarray, shape=(n_chunk, n_params)
+        Blocks of samples, e.g., from `iter_sample_chunks`
+    classifier : sklearn.svm.SVC
+        Classifier to distinguish between liquid and vapor
+    phase : string
+        Which predicted phase to keep. Valid options are "liquid"
+        and "vapor"
+    n_procs : int
+        Number of worker processes used to evaluate the classifier
+    min_proba : float, optional
+        If given, keep the samples whose probability of being `phase`
+        is at least `min_proba` instead of those classified as `phase`.
+        A small value only discards samples that are clearly of the
+        other phase. The classifier must implement ``predict_proba``,
+        e.g., a classifier from `calibrate_classifier`
+
+    Yields
+    ------
+    chunk : np.ndarray, shape=(n_phase, n_params)
+        Samples from the block classified as `phase`
+    """
+    valid_phases = ["liquid", "vapor"]
+    if phase not in valid_phases:
+        raise ValueError(
+            "Invalid phase {}. Supported phases are "
+            "{}".format(phase, valid_phases)
+        )
+    label = 1 if phase == "liquid" else 0
+
+    for chunk in sample_chunks:
+        if min_proba is not None:
+            liquid_proba = _classify(
+                chunk, classifier, n_procs=n_procs, method="predict_proba"
+            )
+            if label == 0:
+                liquid_proba = 1.0 - liquid_proba
+            yield chunk[liquid_proba >= min_proba]
+            continue
+        pred = _classify(chunk, classifier, n_procs=n_procs)
+        yield chunk[np.where(pred == label)]
+
+
+def screen_samples(
+    sample_chunks,
+    gp_model,
+    molecule,
+    property_name,
+    property_offset=0.0,
+    max_mse=None,
+    n_best=None,
+    n_procs=1,
+    approx_model=None,
+    approx_tol=None,
+    approx_safety=2.0,
+):
+    """Rank a stream of samples while holding only the survivors in memory
+
+    Each block of samples is evaluated with the GP model and only the
+    samples with MSE below `max_mse` and/or among the `n_best` lowest
+    MSE seen so far are retained. Peak memory is therefore set by the
+    block size and the number of survivors rather than the total number
+    of samples.
+
+    If an `approx_model` is given (see `utils.gp_approx`), each block is
+    first screened with the approximate model and only the samples
+    that could still be retained, given that the approximate and exact
+    predictions differ by at most `approx_safety * approx_tol`, are
+    re-scored with `gp_model`. Samples are only guaranteed to be kept
+    if that holds for every prediction, which `approx_tol` (an
+    empirical estimate) cannot ensure, so the screen may drop samples
+    that the exact model alone would keep.
+
+    Parameters
+    ----------
+    sample_chunks : iterable of np.ndarray, shape=(n_chunk, n_params)
+        Blocks of samples, e.g., from `iter_sample_chunks`
+    gp_model : gpflow.model
+        GP model to predict the property_name of each sample
+    molecule : R32Constants, R125Constants
+        An instance of a molecule constants class
+    property_name : string
+        The name of the property of interest. Valid options are
+        "sim_liq_density", "sim_vap_density", "sim_Pvap", "sim_Hvap"
+    property_offset : float
+        Adjust the value predicted by the gp model by this amount.
+        Quantity specified in physical units
+    max_mse : float, optional
+        Keep all samples with MSE below this value
+    n_best : int, optional
+        Keep the `n_best` samples with the lowest MSE. If both `max_mse`
+        and `n_best` are specified, samples meeting either criterion
+        are kept
+    n_procs : int
+        Number of worker processes used to evaluate the GP model
+    approx_model : callable, optional
+        Approximate scaled mean predictor for a first-pass screen, e.g.,
+        from `utils.gp_approx.approximate_gp_mean`
+    approx_tol : float, optional
+        Estimated maximum difference between the approximate and exact
+        predictions, in physical units. Required with `approx_model`.
+        Use the scaled "max_abs_err" reported by `approximate_gp_mean`,
+        measured at points like the samples (not the training points),
+        times the width of the property bounds
+    approx_safety : float
+        Factor applied to `approx_tol` to allow for larger errors at
+        samples where the approximation was not checked
 
     Returns
     -------
     ranked_samples : pd.DataFrame
-        Samples sorted by MSE
+        Retained samples sorted by MSE, indexed by their position in
+        the stream of samples
     """
+    screen = _SampleScreen(
+        gp_model,
+        molecule,
+        property_name,
+        property_offset,
+        max_mse,
+        n_best,
+        n_procs,
+        approx_model,
+        approx_tol,
+        approx_safety,
+    )
+    for chunk in sample_chunks:
+        screen.add(chunk)
+
+    return screen.ranked()
+
+
+def screen_phase_samples(
+    sample_chunks,
+    classifier,
+    gp_model,
+    molecule,
+    property_name,
+    property_offset=0.0,
+    max_mse=None,
+    n_best=None,
+    n_procs=1,
+    approx_model=None,
+    approx_tol=None,
+    approx_safety=2.0,
+):
+    """Classify a stream of samples and rank the liquid and vapor samples
+
+    Each block of samples is classified once and the samples of each
+    predicted phase are screened as in `screen_samples`. This gives
+    the same result as calling `screen_samples` on the output of
+    `classify_sample_chunks` for each phase, but the classifier is
+    only evaluated once per sample.
+
+    Parameters
+    ----------
+    sample_chunks : iterable of np.ndarray, shape=(n_chunk, n_params)
+        Blocks of samples, e.g., from `iter_sample_chunks`
+    classifier : sklearn.svm.SVC
+        Classifier to distinguish between liquid and vapor
+    gp_model, molecule, property_name, property_offset, max_mse, n_best,
+    n_procs, approx_model, approx_tol, approx_safety
+        As in `screen_samples`. `n_procs` is also used to evaluate the
+        classifier
+
+    Returns
+    -------
+    ranked_liquid_samples : pd.DataFrame
+        Retained liquid samples sorted by MSE, indexed by their position
+        in the stream of samples classified as liquid
+    ranked_vapor_samples : pd.DataFrame
+        Retained vapor samples sorted by MSE, indexed by their position
+        in the stream of samples classified as vapor
+    """
+    liquid_screen, vapor_screen = [
+        _SampleScreen(
+            gp_model,
+            molecule,
+            property_name,
+            property_offset,
+            max_mse,
+            n_best,
+            n_procs,
+            approx_model,
+            approx_tol,
+            approx_safety,
+        )
+        for phase in ["liquid", "vapor"]
+    ]
+    for chunk in sample_chunks:
+        pred = _classify(chunk, classifier, n_procs=n_procs)
+        liquid_screen.add(chunk[np.where(pred == 1)])
+        vapor_screen.add(chunk[np.where(pred == 0)])
+
+    return liquid_screen.ranked(), vapor_screen.ranked()
+
+
+def cascade_screen_samples(sample_chunks, stages, molecule, n_pilot=1000):
+    """Screen samples against several GP models with early rejection
+
+    The squared error of each sample is accumulated one temperature at
+    a time. As soon as the partial sum for a stage with a `max_mse`
+    exceeds `max_mse` times the number of temperatures, the sample can
+    no longer meet the threshold and it is not evaluated any further.
+    Stages with a `max_mse` are evaluated in the order given, followed
+    by the stages without one, which are evaluated at all temperatures
+    for the surviving samples. Within each stage, temperatures are
+    evaluated in order of decreasing squared error on a pilot set of
+    samples (i.e., most selective first).
+
+    Parameters
+    ----------
+    sample_chunks : iterable of np.ndarray, shape=(n_chunk, n_params)
+        Blocks of samples, e.g., from `iter_sample_chunks`
+    stages : list of dict
+        One dict per GP model with keys "name", "gp_model",
+        "property_name", and optionally "property_offset" (default 0.0)
+        and "max_mse" (default None). The "property_name" and
+        "property_offset" are as in `rank_samples`. List the most
+        selective stage first. For a multi-output model, "name" and
+        "property_name" are lists with one entry per output (and
+        "property_offset" may be one); such stages are evaluated at
+        all temperatures and cannot have a "max_mse"
+    molecule : R32Constants, R125Constants
+        An instance of a molecule constants class
+    n_pilot : int
+        Number of samples from the first block used to order the
+        temperatures of each stage
+
+    Returns
+    -------
+    samples_mse : pd.DataFrame
+        Samples that meet every `max_mse`, in the order they were
+        provided and indexed by their position in the stream of
+        samples, with one column "mse_{name}" per stage output
+    """
+    for stage in stages:
+        for key in ["name", "gp_model", "property_name"]:
+            if key not in stage:
+                raise ValueError(f"Each stage must contain the key '{key}'")
+        if not isinstance(stage["property_name"], str):
+            if isinstance(stage["name"], str) or len(stage["name"]) != len(
+                stage["property_name"]
+            ):
+                raise ValueError(
+                    "A multi-output stage must have one name per property"
+                )
+            if stage.get("max_mse") is not None:
+                raise ValueError(
+                    "max_mse is not supported for multi-output stages"
+                )
+    names = [name for stage in stages for name in _stage_names(stage)]
+    if len(set(names)) != len(names):
+        raise ValueError("Each stage must have a unique name")
+
+    # Thresholded stages first, preserving the order otherwise
+    stages = sorted(stages, key=lambda stage: stage.get("max_mse") is None)
+    stage_data = []
+    for stage in stages:
+        if isinstance(stage["property_name"], str):
+            property_names = [stage["property_name"]]
+        else:
+            property_names = list(stage["property_name"])
+        references = [
+            _property_reference(molecule, property_name)
+            for property_name in property_names
+        ]
+        property_offsets = stage.get("property_offset", 0.0)
+        if np.ndim(property_offsets) == 0:
+            property_offsets = [property_offsets] * len(property_names)
+        stage_data.append(
+            {
+                "names": _stage_names(stage),
+                "predict_mean": gp_mean_predictor(stage["gp_model"]),
+                "expt_properties": [
+                    expt_property for expt_property, bounds in references
+                ],
+                "property_bounds": [
+                    bounds for expt_property, bounds in references
+                ],
+                "property_offsets": list(property_offsets),
+                "max_mse": stage.get("max_mse"),
+                "temp_order": None,
+            }
+        )
+
+    n_columns = len(names)
+    kept_samples = [np.empty((0, molecule.n_params))]
+    kept_mses = [np.empty((0, n_columns))]
+    kept_idx = [np.empty(0, dtype=np.int64)]
+    n_seen = 0
+    for chunk in sample_chunks:
+        n_seen += chunk.shape[0]
+        if chunk.shape[0] == 0:
+            continue
+        alive = np.arange(chunk.shape[0])
+        mses = np.empty((chunk.shape[0], n_columns))
+        column = 0
+        for stage in stage_data:
+            n_outputs = len(stage["names"])
+            if stage["max_mse"] is None:
+                errs = _calc_multi_gp_errors(
+                    stage["predict_mean"],
+                    chunk[alive],
+                    stage["expt_properties"],
+                    stage["property_bounds"],
+                    molecule.temperature_bounds,
+                    stage["property_offsets"],
+                )
+                mses[alive, column : column + n_outputs] = np.mean(
+                    errs ** 2, axis=2
+                )
+                column += n_outputs
+                continue
+
+            if stage["temp_order"] is None:
+                stage["temp_order"] = _order_temperatures(
+                    stage, chunk[alive[:n_pilot]], molecule
+                )
+            expt_property = stage["expt_properties"][0]
+            n_temps = len(expt_property)
+            limit = stage["max_mse"] * n_temps
+            partial = np.zeros(alive.shape[0])
+            for temp in stage["temp_order"]:
+                if alive.shape[0] == 0:
+                    break
+                errs = _calc_gp_errors(
+                    stage["predict_mean"],
+                    chunk[alive],
+                    {temp: expt_property[temp]},
+                    stage["property_bounds"][0],
+                    molecule.temperature_bounds,
+                    stage["property_offsets"][0],
+                )
+                partial += errs[:, 0] ** 2
+                survivors = partial < limit
+                alive = alive[survivors]
+                partial = partial[survivors]
+            mses[alive, column] = partial / n_temps
+            column += 1
+
+        kept_samples.append(chunk[alive])
+        kept_mses.append(mses[alive])
+        kept_idx.append(alive + n_seen - chunk.shape[0])
+
+    # Restore the order in which the stages were given
+    sorted_names = [name for stage in stage_data for name in stage["names"]]
+    stage_order = [sorted_names.index(name) for name in names]
+    samples_mse = pd.DataFrame(
+        np.hstack(
+            (np.vstack(kept_samples), np.vstack(kept_mses)[:, stage_order])
+        ),
+        columns=list(molecule.param_names) + ["mse_" + name for name in names],
+        index=np.concatenate(kept_idx),
+    )
+
+    return samples_mse
+
+
+def select_spaced_points(
+    points, forced_points, param_names, distance, seed=None
+):
+    """Select points from a set that are well spaced in parameter space
+
+    Candidates are visited in a random order and each one that is not
+    within an L1 `distance` of an already selected candidate is
+    selected. This is the same procedure as repeatedly selecting a
+    random remaining point and discarding its neighbors, but a single
+    random permutation is drawn and the neighbors are found either
+    with vectorized distances to the remaining points (when each
+    selection discards many points) or with a KD-tree (when the
+    neighborhoods are small and many points are selected). The forced
+    points are always kept; they do not exclude their neighbors.
+
+    Parameters
+    ----------
+    points : pd.DataFrame
+        Candidate points, e.g., the Pareto efficient points
+    forced_points : pd.DataFrame
+        Points that are always selected, e.g., the best point for each
+        objective. Any of these in `points` are not selected twice
+    param_names : list-like
+        Columns with the parameter values
+    distance : float
+        Selected candidates are at least this L1 distance apart
+    seed : int, optional
+        Seed for the random order of the candidates
 
+    Returns
+    -------
+    new_points : pd.DataFrame
+        The forced points followed by the selected candidates
+    """
+    candidates = points.drop(index=forced_points.index, errors="ignore")
+    coords = np.ascontiguousarray(
+        candidates[list(param_names)].values, dtype=np.float64
+    )
+    n_points = coords.shape[0]
+    order = np.random.default_rng(seed).permutation(n_points)
+
+    # Estimate the fraction of points in a neighborhood from a fixed
+    # subset so that the random stream does not depend on it
+    pilot = coords[:: max(1, n_points // 256)]
+    n_pilot = pilot.shape[0]
+    if n_pilot > 1:
+        n_pairs = np.sum(
+            np.sum(np.abs(pilot[:, np.newaxis, :] - pilot[np.newaxis]), axis=2)
+            < distance
+        )
+        # Exclude each point's distance to itself
+        neighbor_fraction = (n_pairs - n_pilot) / (n_pilot * (n_pilot - 1))
+    else:
+        neighbor_fraction = 1.0
+
+    selected = []
+    if neighbor_fraction * n_points >= 256:
+        # Few, large neighborhoods: filter the remaining points directly
+        remaining = order
+        remaining_coords = coords[order]
+        while remaining.shape[0] > 0:
+            selected.append(remaining[0])
+            keep = (
+                np.sum(np.abs(remaining_coords - remaining_coords[0]), axis=1)
+                >= distance
+            )
+            keep[0] = False
+            remaining = remaining[keep]
+            remaining_coords = remaining_coords[keep]
+    else:
+        tree = cKDTree(coords)
+        available = np.ones(n_points, dtype=bool)
+        for idx in order:
+            if not available[idx]:
+                continue
+            selected.append(idx)
+            available[idx] = False
+            neighbors = np.asarray(
+                tree.query_ball_point(coords[idx], distance, p=1.0), dtype=int
+            )
+            # The tree query also returns points at exactly distance
+            l1_norm = np.sum(np.abs(coords[neighbors] - coords[idx]), axis=1)
+            available[neighbors[l1_norm < distance]] = False
+
+    return pd.concat([forced_points, candidates.iloc[selected]])
+
+
+def gp_mean_predictor(gp_model):
+    """Return a function that evaluates only the GP posterior mean
+
+    For exact GP regression models the weight vector
+    alpha = (K + noise * I)^-1 (y - m(X)) is computed once, so that each
+    prediction is a single cross-covariance evaluation and a
+    matrix-vector product. The predictive variance is never computed.
+    Models with an RBF, Matern32, or Matern52 kernel and a zero,
+    constant, or linear mean function are evaluated entirely in NumPy
+    (see `utils.gp_mean.export_gp_mean`). Other models fall back to
+    ``predict_f``.
+
+    Parameters
+    ----------
+    gp_model : gpflow.model or GPMean
+        Trained GP model, or a predictor loaded with
+        `utils.gp_mean.load_gp_mean`
+
+    Returns
+    -------
+    predict_mean : callable
+        Function mapping x, shape=(n_points, n_inputs), to the scaled
+        predicted mean, shape=(n_points, n_outputs)
+    """
+    if isinstance(gp_model, GPMean):
+        return gp_model
+
+    import gpflow
+
+    if not isinstance(gp_model, gpflow.models.GPR):
+
+        def predict_mean(xx):
+            means, vars_ = gp_model.predict_f(xx)
+            return np.asarray(means)
+
+        return predict_mean
+
+    try:
+        return export_gp_mean(gp_model)
+    except ValueError:
+        pass
+
+    x_train = np.asarray(gp_model.data[0])
+    alpha, chol = gpr_weights(gp_model)
+
+    def predict_mean(xx):
+        kmn = np.asarray(gp_model.kernel(xx, x_train))
+        return kmn @ alpha + np.asarray(gp_model.mean_function(xx))
+
+    return predict_mean
+
+
+def _uncertainty_bounds(bounds):
+    """Return bounds that scale uncertainties like the values in bounds
+
+    Uncertainties are scaled by the width of the bounds only.
+    """
+    return np.array([0.0, bounds[1] - bounds[0]])
+
+
+def _hvap_kj_per_kg(hvap, molecule):
+    """Convert Hvap from kJ/mol to kJ/kg
+
+    The division comes first, as in the previous implementation, so
+    that the values (and the hashes of training data) are bit for bit
+    unchanged.
+    """
+    return hvap.to_numpy(dtype=np.float64) / molecule.molecular_weight * 1000.0
+
+
+def _param_temperature_scales(molecule):
+    """Return the bounds of the parameters and temperature by column"""
+    scales = dict(zip(molecule.param_names, molecule.param_bounds))
+    scales["temperature"] = molecule.temperature_bounds
+    return scales
+
+
+def _expt_reference_columns(molecule, temperatures, expt_properties):
+    """Return the experimental value of each property at each temperature
+
+    Parameters
+    ----------
+    molecule : R32Constants, R125Constants
+        An instance of a molecule constants class
+    temperatures : array-like, shape=(n_rows,)
+        Temperatures (K) of the rows
+    expt_properties : list of dict
+        Experimental data keyed by temperature, e.g.,
+        `molecule.expt_liq_density`
+
+    Returns
+    -------
+    values : np.ndarray, shape=(n_properties, n_rows)
+        The experimental values
+    """
+    table = np.array(
+        [
+            [expt_property[temp] for temp in molecule.expt_temperatures]
+            for expt_property in expt_properties
+        ],
+        dtype=np.float64,
+    )
+    index = molecule.temperature_index(temperatures)
+    return np.take(table, index, axis=1)
+
+
+def _prepared_frame(df_csv, rename, drop, scales, added):
+    """Build a prepared dataframe without intermediate copies
+
+    Parameters
+    ----------
+    df_csv : pd.DataFrame
+        The dataframe as loaded from a CSV file with the signac results
+    rename : dict
+        New names of columns of df_csv
+    drop : list of string
+        Columns of df_csv to leave out. Missing columns are ignored
+    scales : dict
+        Bounds keyed by (new) column name. These columns are scaled
+        like `values_real_to_scaled` in a single array operation
+    added : dict
+        Values of new columns, or of columns replacing the ones in
+        df_csv, keyed by name. New columns are appended in order
+
+    Returns
+    -------
+    df_all : pd.DataFrame
+        The prepared dataframe, with the index of df_csv
+    """
+    drop = set(drop)
+    source = {
+        rename.get(column, column): column
+        for column in df_csv.columns
+        if column not in drop
+    }
+    columns = list(source) + [name for name in added if name not in source]
+
+    # Scale all columns with one broadcast operation
+    scaled_names = [name for name in columns if name in scales]
+    # The widths are computed in the precision of the bounds, as in
+    # values_real_to_scaled
+    lower = np.array(
+        [scales[name][0] for name in scaled_names], dtype=np.float64
+    )
+    width = np.array(
+        [scales[name][1] - scales[name][0] for name in scaled_names],
+        dtype=np.float64,
+    )
+    values = np.empty((df_csv.shape[0], len(scaled_names)), order="F")
+    for idx, name in enumerate(scaled_names):
+        if name in added:
+            values[:, idx] = added[name]
+        else:
+            values[:, idx] = df_csv[source[name]].to_numpy(dtype=np.float64)
+    values -= lower
+    values /= width
+    scaled = dict(zip(scaled_names, values.T))
+
+    data = {}
+    for name in columns:
+        if name in scaled:
+            data[name] = scaled[name]
+        elif name in added:
+            data[name] = added[name]
+        else:
+            # Copy so that the result does not share memory with df_csv
+            data[name] = df_csv[source[name]].to_numpy(copy=True)
+    # Keep the column arrays as they are instead of stacking them again
+    return pd.DataFrame(
+        data, index=df_csv.index, columns=columns, copy=False
+    )
+
+
+def _stage_names(stage):
+    """Return the names of the outputs of a screening stage"""
+    if isinstance(stage["property_name"], str):
+        return [stage["name"]]
+    return list(stage["name"])
+
+
+class _SampleScreen:
+    """Survivors of a GP screen that is fed one block of samples at a time
+
+    See `screen_samples` for the parameters.
+    """
+
+    def __init__(
+        self,
+        gp_model,
+        molecule,
+        property_name,
+        property_offset,
+        max_mse,
+        n_best,
+        n_procs,
+        approx_model,
+        approx_tol,
+        approx_safety,
+    ):
+        if max_mse is None and n_best is None:
+            raise ValueError(
+                "At least one of max_mse or n_best must be specified"
+            )
+        if n_best is not None and n_best < 1:
+            raise ValueError("n_best must be a positive integer")
+        if approx_model is not None and approx_tol is None:
+            raise ValueError("approx_tol must be specified with approx_model")
+        if approx_safety < 1.0:
+            raise ValueError("approx_safety must be at least 1")
+
+        self.expt_property, self.property_bounds = _property_reference(
+            molecule, property_name
+        )
+        self.predict_mean = gp_mean_predictor(gp_model)
+        self.molecule = molecule
+        self.property_offset = property_offset
+        self.max_mse = max_mse
+        self.n_best = n_best
+        self.n_procs = n_procs
+        self.approx_model = approx_model
+        self.approx_tol = approx_tol
+        self.approx_safety = approx_safety
+
+        self.kept_samples = np.empty((0, molecule.n_params))
+        self.kept_mse = np.empty(0)
+        self.kept_idx = np.empty(0, dtype=np.int64)
+        self.n_seen = 0
+
+    def add(self, chunk):
+        """Screen the next block of samples"""
+        chunk_idx = np.arange(self.n_seen, self.n_seen + chunk.shape[0])
+        self.n_seen += chunk.shape[0]
+        if self.approx_model is not None:
+            errs = _calc_gp_errors(
+                self.approx_model,
+                chunk,
+                self.expt_property,
+                self.property_bounds,
+                self.molecule.temperature_bounds,
+                self.property_offset,
+                n_procs=self.n_procs,
+            )
+            candidates = _approx_candidates(
+                errs,
+                self.max_mse,
+                self.n_best,
+                self.approx_safety * self.approx_tol,
+            )
+            chunk = chunk[candidates]
+            chunk_idx = chunk_idx[candidates]
+        if chunk.shape[0] == 0:
+            return
+        errs = _calc_gp_errors(
+            self.predict_mean,
+            chunk,
+            self.expt_property,
+            self.property_bounds,
+            self.molecule.temperature_bounds,
+            self.property_offset,
+            n_procs=self.n_procs,
+        )
+        mse = np.mean(errs ** 2, axis=1)
+        # Only samples that survive within the block can survive overall
+        keep = _select_survivors(mse, self.max_mse, self.n_best)
+        kept_samples = np.vstack((self.kept_samples, chunk[keep]))
+        kept_mse = np.concatenate((self.kept_mse, mse[keep]))
+        kept_idx = np.concatenate((self.kept_idx, chunk_idx[keep]))
+        keep = _select_survivors(kept_mse, self.max_mse, self.n_best)
+        self.kept_samples = kept_samples[keep]
+        self.kept_mse = kept_mse[keep]
+        self.kept_idx = kept_idx[keep]
+
+    def ranked(self):
+        """Return the retained samples sorted by MSE"""
+        samples_mse = np.hstack(
+            (self.kept_samples, self.kept_mse.reshape(-1, 1))
+        )
+        samples_mse = pd.DataFrame(
+            samples_mse,
+            columns=list(self.molecule.param_names) + ["mse"],
+            index=self.kept_idx,
+        )
+        return samples_mse.sort_values("mse")
+
+
+def _select_survivors(mse, max_mse=None, n_best=None):
+    """Return a mask of the MSEs below max_mse or among the n_best lowest"""
+    keep = np.zeros(mse.shape[0], dtype=bool)
+    if max_mse is not None:
+        keep |= mse < max_mse
+    if n_best is not None:
+        if mse.shape[0] <= n_best:
+            keep[:] = True
+        else:
+            keep[np.argpartition(mse, n_best - 1)[:n_best]] = True
+    return keep
+
+
+def _approx_candidates(errs, max_mse, n_best, approx_tol):
+    """Return a mask of the samples that may survive exact re-scoring
+
+    If each prediction is within approx_tol of the exact value, the
+    root mean squared error is too (triangle inequality), so a sample
+    can only meet max_mse, or be among the n_best of the block, if its
+    approximate RMSE is within approx_tol (respectively 2 * approx_tol)
+    of the cutoff.
+    """
+    rmse = np.sqrt(np.mean(errs ** 2, axis=1))
+    keep = np.zeros(rmse.shape[0], dtype=bool)
+    if max_mse is not None:
+        keep |= rmse < np.sqrt(max_mse) + approx_tol
+    if n_best is not None:
+        if rmse.shape[0] <= n_best:
+            keep[:] = True
+        else:
+            cutoff = np.partition(rmse, n_best - 1)[n_best - 1]
+            keep |= rmse <= cutoff + 2.0 * approx_tol
+    return keep
+
+
+def _order_temperatures(stage, samples, molecule):
+    """Order temperatures by decreasing mean squared error for samples"""
+    temps = list(stage["expt_properties"][0].keys())
+    if samples.shape[0] == 0:
+        return temps
+    errs = _calc_gp_errors(
+        stage["predict_mean"],
+        samples,
+        stage["expt_properties"][0],
+        stage["property_bounds"][0],
+        molecule.temperature_bounds,
+        stage["property_offsets"][0],
+    )
+    order = np.argsort(-np.mean(errs ** 2, axis=0), kind="stable")
+    return [temps[idx] for idx in order]
+
+
+def _classify(
+    samples, classifier, n_procs=1, method="predict", block_size=10000
+):
+    """Evaluate the classifier at the highest temperature
+
+    With method="predict_proba", the probability of the liquid class
+    is returned. The samples are evaluated in blocks to bound memory.
+    """
+    if n_procs > 1:
+        return _map_sample_blocks(
+            functools.partial(
+                _classify,
+                classifier=classifier,
+                method=method,
+                block_size=block_size,
+            ),
+            samples,
+            n_procs,
+            block_size,
+        )
+    if method == "predict_proba":
+        liquid_column = list(classifier.classes_).index(1)
+    results = []
+    for start in range(0, samples.shape[0], block_size):
+        block = samples[start : start + block_size]
+        # Append highest temperature (1.0) to LH samples
+        samples_temperature = np.hstack(
+            (block, np.tile(1.0, (block.shape[0], 1)))
+        )
+        if method == "predict_proba":
+            results.append(
+                classifier.predict_proba(samples_temperature)[:, liquid_column]
+            )
+        else:
+            results.append(classifier.predict(samples_temperature))
+    if not results:
+        return np.empty(0)
+    return np.concatenate(results)
+
+
+def _property_reference(molecule, property_name):
+    """Return the experimental data and bounds for property_name"""
     valid_property_names = [
         "sim_liq_density",
         "sim_vap_density",
@@ -271,7 +1278,6 @@ def rank_samples(samples, gp_model, molecule, property_name, property_offset=0.0
             "{}".format(property_name, valid_property_names)
         )
 
-    temperature_bounds = molecule.temperature_bounds
     if property_name == "sim_liq_density":
         expt_property = molecule.expt_liq_density
         property_bounds = molecule.liq_density_bounds
@@ -285,36 +1291,224 @@ def rank_samples(samples, gp_model, molecule, property_name, property_offset=0.0
         expt_property = molecule.expt_Hvap
         property_bounds = molecule.Hvap_bounds
 
-    # Apply GP model and calculate mean squared errors (MSE) between
-    # GP model predictions and experimental data for all parameter samples
-    mse = _calc_gp_mse(
-        gp_model, samples, expt_property, property_bounds, temperature_bounds, property_offset
-    )
-    # Make pandas dataframes, rank, and return
-    samples_mse = np.hstack((samples, mse.reshape(-1, 1)))
-    samples_mse = pd.DataFrame(
-        samples_mse, columns=list(molecule.param_names) + ["mse"]
-    )
-    ranked_samples = samples_mse.sort_values("mse")
-
-    return ranked_samples
+    return expt_property, property_bounds
 
 
 def _calc_gp_mse(
-    gp_model, samples, expt_property, property_bounds, temperature_bounds, property_offset=0.0
+    gp_model,
+    samples,
+    expt_property,
+    property_bounds,
+    temperature_bounds,
+    property_offset=0.0,
+    block_size=10000,
+    n_procs=1,
 ):
     """Calculate the MSE between the GP model and experiment for samples"""
 
-    all_errs = np.empty(shape=(samples.shape[0], len(expt_property.keys())))
-    col_idx = 0
-    for (temp, density) in expt_property.items():
-        scaled_temp = values_real_to_scaled(temp, temperature_bounds)
-        xx = np.hstack((samples, np.tile(scaled_temp, (samples.shape[0], 1))))
-        means_scaled, vars_scaled = gp_model.predict_f(xx)
-        means = values_scaled_to_real(means_scaled, property_bounds)
-        means = means + property_offset
-        err = means - density
-        all_errs[:, col_idx] = err[:, 0]
-        col_idx += 1
+    all_errs = _calc_gp_errors(
+        gp_mean_predictor(gp_model),
+        samples,
+        expt_property,
+        property_bounds,
+        temperature_bounds,
+        property_offset,
+        block_size,
+        n_procs,
+    )
 
     return np.mean(all_errs ** 2, axis=1)
+
+
+def _calc_gp_errors(
+    predict_mean,
+    samples,
+    expt_property,
+    property_bounds,
+    temperature_bounds,
+    property_offset=0.0,
+    block_size=10000,
+    n_procs=1,
+):
+    """Calculate the error between the GP model and experiment for samples
+
+    Returns
+    -------
+    all_errs : np.ndarray, shape=(n_samples, n_temps)
+        GP prediction minus experiment in physical units
+    """
+    return _calc_multi_gp_errors(
+        predict_mean,
+        samples,
+        [expt_property],
+        [property_bounds],
+        temperature_bounds,
+        [property_offset],
+        block_size,
+        n_procs,
+    )[:, 0]
+
+
+def _calc_multi_gp_errors(
+    predict_mean,
+    samples,
+    expt_properties,
+    property_bounds,
+    temperature_bounds,
+    property_offsets,
+    block_size=10000,
+    n_procs=1,
+):
+    """Calculate the errors of each output of a GP model for samples
+
+    All temperatures for a block of samples are evaluated with a single
+    call to `predict_mean` (see `gp_mean_predictor`), which returns one
+    column per output, so a multi-output model computes a single
+    cross-covariance for all its properties. The model input buffer is
+    allocated once and reused for every block. With `n_procs` > 1, the
+    blocks are divided among worker processes and the result is
+    identical to the serial evaluation.
+
+    Parameters
+    ----------
+    expt_properties, property_bounds, property_offsets : list
+        Experimental data, bounds, and offset of each output. The
+        experimental data must be at the same temperatures
+
+    Returns
+    -------
+    all_errs : np.ndarray, shape=(n_samples, n_outputs, n_temps)
+        GP prediction minus experiment in physical units
+    """
+    if n_procs > 1:
+        if not isinstance(predict_mean, (GPMean, RandomFeatureMean)):
+            raise ValueError(
+                "Parallel evaluation requires an exact GP model with an "
+                "RBF, Matern32, or Matern52 kernel, or an approximation "
+                "of one"
+            )
+        return _map_sample_blocks(
+            functools.partial(
+                _calc_multi_gp_errors,
+                predict_mean,
+                expt_properties=expt_properties,
+                property_bounds=property_bounds,
+                temperature_bounds=temperature_bounds,
+                property_offsets=property_offsets,
+                block_size=block_size,
+            ),
+            samples,
+            n_procs,
+            block_size,
+        )
+
+    temps = list(expt_properties[0].keys())
+    for expt_property in expt_properties[1:]:
+        if list(expt_property.keys()) != temps:
+            raise ValueError(
+                "The experimental data of all outputs must be at the same "
+                "temperatures"
+            )
+    samples = np.asarray(samples)
+    n_samples, n_params = samples.shape
+    n_temps = len(temps)
+    n_outputs = len(expt_properties)
+    expt_values = np.asarray(
+        [list(expt_property.values()) for expt_property in expt_properties]
+    )
+    scaled_temps = np.asarray(
+        [
+            np.asarray(values_real_to_scaled(temp, temperature_bounds)).item()
+            for temp in temps
+        ]
+    )
+
+    # Each sample occupies n_temps consecutive rows of the buffer;
+    # the temperature column never changes between blocks
+    block_size = max(1, min(block_size, n_samples))
+    xx = np.empty((block_size, n_temps, n_params + 1))
+    xx[:, :, n_params] = scaled_temps
+
+    all_errs = np.empty(shape=(n_samples, n_outputs, n_temps))
+    for start in range(0, n_samples, block_size):
+        stop = min(start + block_size, n_samples)
+        n_block = stop - start
+        xx[:n_block, :, :n_params] = samples[start:stop, np.newaxis, :]
+        means_scaled = np.reshape(
+            predict_mean(
+                xx[:n_block].reshape(n_block * n_temps, n_params + 1)
+            ),
+            (n_block * n_temps, -1),
+        )
+        if means_scaled.shape[1] != n_outputs:
+            raise ValueError(
+                "The GP model predicts {} outputs but {} properties were "
+                "given".format(means_scaled.shape[1], n_outputs)
+            )
+        for output in range(n_outputs):
+            means = values_scaled_to_real(
+                means_scaled[:, output].reshape(-1, 1),
+                property_bounds[output],
+            )
+            all_errs[start:stop, output] = (
+                np.reshape(means, (n_block, n_temps))
+                + property_offsets[output]
+                - expt_values[output]
+            )
+
+    return all_errs
+
+
+def _map_sample_blocks(func, samples, n_procs, block_size=10000):
+    """Evaluate func on disjoint blocks of samples in worker processes
+
+    The samples are copied into shared memory once and each worker
+    attaches to it, so the samples are never pickled. Workers are
+    forked so that func, and any models it uses, are inherited rather
+    than pickled. The results are concatenated in block order.
+    """
+    samples = np.ascontiguousarray(samples, dtype=np.float64)
+    n_samples = samples.shape[0]
+    if n_samples == 0:
+        return func(samples)
+    blocks = [
+        (start, min(start + block_size, n_samples))
+        for start in range(0, n_samples, block_size)
+    ]
+
+    shm = shared_memory.SharedMemory(create=True, size=samples.nbytes)
+    try:
+        shared = np.ndarray(samples.shape, dtype=np.float64, buffer=shm.buf)
+        shared[:] = samples
+        del shared
+        context = multiprocessing.get_context("fork")
+        with context.Pool(
+            min(n_procs, len(blocks)),
+            initializer=_init_worker,
+            initargs=(shm.name, samples.shape, func),
+        ) as pool:
+            results = pool.map(_eval_block, blocks)
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return np.concatenate(results)
+
+
+_worker_state = {}
+
+
+def _init_worker(shm_name, shape, func):
+    """Attach a worker process to the shared samples"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker_state["shm"] = shm
+    _worker_state["samples"] = np.ndarray(
+        shape, dtype=np.float64, buffer=shm.buf
+    )
+    _worker_state["func"] = func
+
+
+def _eval_block(block):
+    """Evaluate the worker function on one block of the shared samples"""
+    start, stop = block
+    return _worker_state["func"](_worker_state["samples"][start:stop])
@@ -0,0 +1,248 @@
+import os
+import json
+import hashlib
+import datetime
+import numpy as np
+
+from fffit.models import run_gpflow_scipy
+
+from .gp_models import (
+    _assign_hyperparameters,
+    _build_gpr,
+    _load_hyperparameters,
+    _molecule_name,
+    _save_hyperparameters,
+)
+from .prediction_cache import array_fingerprint
+
+
+def load_or_fit_gpr(
+    x_train,
+    y_train,
+    kernel,
+    molecule,
+    property_name,
+    seed=None,
+    registry_dir=".gp_registry",
+    fmt="notebook",
+):
+    """Load a trained GPR model from the registry or fit and register it
+
+    Drop-in replacement for `fffit.models.run_gpflow_scipy`. The model
+    is looked up by its metadata (see `model_metadata`), so a model
+    trained by any script on the same data, with the same kernel, for
+    the same molecule and property is reused instead of re-optimized.
+
+    Parameters
+    ----------
+    x_train : np.ndarray, shape=(n_samples, n_inputs)
+        Training inputs
+    y_train : np.ndarray, shape=(n_samples,)
+        Training outputs
+    kernel : gpflow.kernels.Kernel
+        Kernel of the GP model
+    molecule : R32Constants, R125Constants or string
+        The molecule (or its name) the model is for
+    property_name : string
+        The property the model is for, e.g., "sim_liq_density"
+    seed : int, optional
+        Seed used to shuffle and split the training data. Only recorded
+        in the metadata
+    registry_dir : str
+        Directory of the registry. Use the same directory for all
+        scripts
+    fmt : string
+        The formatting type for the gpflow print_summary
+
+    Returns
+    -------
+    model : gpflow.models.GPR
+        The trained model
+    """
+    from gpflow.utilities import parameter_dict, print_summary
+
+    # The initial kernel parameters can change the optimum
+    kernel_init = {
+        name: np.asarray(param.numpy()).tolist()
+        for name, param in sorted(parameter_dict(kernel).items())
+    }
+    metadata = model_metadata(
+        x_train,
+        y_train,
+        type(kernel).__name__,
+        molecule,
+        property_name,
+        seed=seed,
+        kernel_init=kernel_init,
+    )
+    model = load_registered_gpr(
+        metadata, x_train, y_train, kernel, registry_dir
+    )
+    if model is not None:
+        print_summary(model, fmt=fmt)
+        return model
+
+    model = run_gpflow_scipy(x_train, y_train, kernel, fmt=fmt)
+    register_gpr(model, metadata, registry_dir)
+    return model
+
+
+def model_metadata(
+    x_train,
+    y_train,
+    kernel_name,
+    molecule,
+    property_name,
+    seed=None,
+    **options,
+):
+    """Describe a GPR model for the registry
+
+    Parameters
+    ----------
+    x_train : np.ndarray, shape=(n_samples, n_inputs)
+        Training inputs
+    y_train : np.ndarray, shape=(n_samples,)
+        Training outputs
+    kernel_name : string
+        Name of the kernel class, e.g., "RBF"
+    molecule : R32Constants, R125Constants or string
+        The molecule (or its name) the model is for
+    property_name : string
+        The property the model is for, e.g., "sim_liq_density"
+    seed : int, optional
+        Seed used for the training data or the fit
+    **options
+        Other JSON serializable settings of the fit
+
+    Returns
+    -------
+    metadata : dict
+        The metadata, including the training data hash ("data_hash")
+        and a key identifying the model ("key")
+    """
+    x_train = np.asarray(x_train, dtype=np.float64)
+    y_train = np.asarray(y_train, dtype=np.float64).reshape(
+        x_train.shape[0], -1
+    )
+    data_hash = hashlib.sha1(
+        (array_fingerprint(x_train) + array_fingerprint(y_train)).encode()
+    ).hexdigest()
+    metadata = {
+        "molecule": _molecule_name(molecule),
+        "property": property_name,
+        "kernel": kernel_name,
+        "seed": None if seed is None else int(seed),
+        "data_hash": data_hash,
+        "n_train": int(x_train.shape[0]),
+        "options": options,
+    }
+    metadata["key"] = hashlib.sha1(
+        json.dumps(metadata, sort_keys=True).encode()
+    ).hexdigest()
+    return metadata
+
+
+def load_registered_gpr(metadata, x_train, y_train, kernel, registry_dir):
+    """Rebuild a registered GPR model
+
+    Parameters
+    ----------
+    metadata : dict
+        Metadata from `model_metadata`
+    x_train : np.ndarray, shape=(n_samples, n_inputs)
+        Training inputs
+    y_train : np.ndarray, shape=(n_samples,)
+        Training outputs
+    kernel : gpflow.kernels.Kernel
+        Kernel of the GP model. Its parameters are overwritten
+    registry_dir : str
+        Directory of the registry
+
+    Returns
+    -------
+    model : gpflow.models.GPR or None
+        The trained model, or None if it is not in the registry
+    """
+    params = load_registered_params(metadata, registry_dir)
+    if params is None:
+        return None
+
+    model = _build_gpr(
+        np.asarray(x_train, dtype=np.float64),
+        np.asarray(y_train, dtype=np.float64),
+        kernel,
+    )
+    if not _assign_hyperparameters(model, params):
+        return None
+    print(f"Loaded model from {_registry_files(registry_dir, metadata)[0]}")
+    return model
+
+
+def load_registered_params(metadata, registry_dir):
+    """Load the parameter values of a registered model
+
+    Only NumPy is used, so models are looked up without TensorFlow.
+
+    Parameters
+    ----------
+    metadata : dict
+        Metadata from `model_metadata`
+    registry_dir : str
+        Directory of the registry
+
+    Returns
+    -------
+    params : dict or None
+        Parameter values keyed by parameter path, or None if the model
+        is not in the registry
+    """
+    params_name, metadata_name = _registry_files(registry_dir, metadata)
+    if not (os.path.isfile(params_name) and os.path.isfile(metadata_name)):
+        return None
+    try:
+        with open(metadata_name) as f:
+            stored = json.load(f)
+        params = _load_hyperparameters(params_name)
+    except (OSError, ValueError):
+        return None
+    if stored.get("key") != metadata["key"]:
+        return None
+    return params
+
+
+def register_gpr(model, metadata, registry_dir):
+    """Save a trained GPR model and its metadata to the registry
+
+    Parameters
+    ----------
+    model : gpflow.models.GPR
+        The trained model
+    metadata : dict
+        Metadata from `model_metadata`
+    registry_dir : str
+        Directory of the registry
+    """
+    params_name, metadata_name = _registry_files(registry_dir, metadata)
+    _save_hyperparameters(model, params_name)
+    metadata = dict(
+        metadata, created=datetime.datetime.now().isoformat(timespec="seconds")
+    )
+    tmp_name = metadata_name + ".tmp"
+    with open(tmp_name, "w") as f:
+        json.dump(metadata, f, indent=2, sort_keys=True)
+    os.replace(tmp_name, metadata_name)
+
+
+def _registry_files(registry_dir, metadata):
+    """Return the parameter and metadata files of a registered model"""
+    base_name = os.path.join(
+        registry_dir,
+        "{}-{}-{}-{}".format(
+            metadata["molecule"],
+            metadata["property"],
+            metadata["kernel"],
+            metadata["key"][:16],
+        ),
+    )
+    return base_name + ".npz", base_name + ".json"
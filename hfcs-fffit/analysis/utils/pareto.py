@@ -0,0 +1,150 @@
+import numpy as np
+
+
+def find_pareto_set(data, pareto_fun=None):
+    """Split data into Pareto efficient and dominated points
+
+    Same interface as `fffit.pareto.find_pareto_set`.
+
+    Parameters
+    ----------
+    data : np.ndarray, shape=(n_points, n_objectives)
+        Costs to be minimized
+    pareto_fun : callable, optional
+        Function returning a boolean mask of the Pareto efficient
+        points. Defaults to `is_pareto_efficient`
+
+    Returns
+    -------
+    result : np.ndarray, shape=(n_points,)
+        True for the Pareto efficient points
+    pareto_points : np.ndarray
+        The Pareto efficient points
+    dominated_points : np.ndarray
+        The dominated points
+    """
+    if pareto_fun is None:
+        pareto_fun = is_pareto_efficient
+    result = pareto_fun(data)
+    pareto_points = data[result]
+    dominated_points = data[~result]
+    return result, pareto_points, dominated_points
+
+
+def is_pareto_efficient(costs, batch_size=16):
+    """Return a mask of the Pareto efficient points
+
+    The points are sorted by the sum of their costs, so that a point
+    can only be dominated by points that precede it and the first
+    remaining point is always efficient. The next `batch_size`
+    remaining points are taken as a batch, those not dominated within
+    the batch are added to the front, and every later point dominated
+    by them is discarded with vectorized comparisons. Points with a
+    low sum of costs tend to dominate many others, so the set of
+    remaining points shrinks quickly.
+
+    The result is identical to `fffit.pareto.is_pareto_efficient`: a
+    point is dominated if another point is no worse in every
+    objective, and of identical points only the first is efficient.
+
+    Parameters
+    ----------
+    costs : np.ndarray, shape=(n_points, n_objectives)
+        Costs to be minimized
+    batch_size : int
+        Number of candidate front points compared at a time
+
+    Returns
+    -------
+    is_efficient : np.ndarray, shape=(n_points,)
+        True for the Pareto efficient points
+    """
+    return pareto_ranks(costs, max_rank=1, batch_size=batch_size) == 0
+
+
+def pareto_ranks(costs, max_rank=None, batch_size=16):
+    """Return the non-dominated rank of each point
+
+    Rank 0 is the Pareto front, rank 1 is the front of the points that
+    remain once rank 0 is removed, and so on. Each front is found as in
+    `is_pareto_efficient`.
+
+    Parameters
+    ----------
+    costs : np.ndarray, shape=(n_points, n_objectives)
+        Costs to be minimized
+    max_rank : int, optional
+        Only identify the first `max_rank` fronts. The remaining points
+        are assigned rank `max_rank`
+    batch_size : int
+        Number of candidate front points compared at a time
+
+    Returns
+    -------
+    ranks : np.ndarray, shape=(n_points,)
+        Non-dominated rank of each point
+    """
+    costs = np.asarray(costs, dtype=np.float64)
+    if costs.ndim != 2:
+        raise ValueError("costs must be a 2-D array")
+    if np.isnan(costs).any():
+        raise ValueError("costs must not contain NaN")
+    if max_rank is not None and max_rank < 1:
+        raise ValueError("max_rank must be a positive integer")
+
+    n_points = costs.shape[0]
+    # If a dominates b, sum(a) <= sum(b), with ties broken first
+    # lexicographically and then by the original order (stable sort)
+    order = np.lexsort(np.vstack((costs.T[::-1], np.sum(costs, axis=1))))
+    sorted_costs = costs[order]
+
+    ranks = np.empty(n_points, dtype=np.int64)
+    remaining = np.arange(n_points)
+    rank = 0
+    while remaining.shape[0] > 0:
+        if max_rank is not None and rank == max_rank:
+            ranks[order[remaining]] = max_rank
+            break
+        on_front = _sorted_front(sorted_costs[remaining], batch_size)
+        ranks[order[remaining[on_front]]] = rank
+        remaining = remaining[~on_front]
+        rank += 1
+
+    return ranks
+
+
+def _sorted_front(costs, batch_size, chunk_size=65536):
+    """Return a mask of the front of sorted costs
+
+    In the sorted order, point i can only be dominated by a point
+    j < i, and it is dominated exactly when costs[j] <= costs[i] in
+    every objective (for identical points, the first one is kept).
+    """
+    on_front = np.zeros(costs.shape[0], dtype=bool)
+    remaining = np.arange(costs.shape[0])
+    while remaining.shape[0] > 0:
+        # No point in the batch is dominated by an earlier batch, and
+        # within the batch only earlier points dominate later ones
+        batch = remaining[:batch_size]
+        batch_costs = costs[batch]
+        dominates = np.all(
+            batch_costs[:, np.newaxis, :] <= batch_costs[np.newaxis], axis=2
+        )
+        front = batch[~np.any(np.triu(dominates, k=1), axis=0)]
+        on_front[front] = True
+
+        front_costs = costs[front]
+        rest = remaining[batch_size:]
+        keep = np.empty(rest.shape[0], dtype=bool)
+        for start in range(0, rest.shape[0], chunk_size):
+            rest_costs = costs[rest[start : start + chunk_size]]
+            keep[start : start + chunk_size] = ~np.any(
+                np.all(
+                    front_costs[:, np.newaxis, :] <= rest_costs[np.newaxis],
+                    axis=2,
+                ),
+                axis=0,
+            )
+        remaining = rest[keep]
+
+    return on_front
@@ -0,0 +1,186 @@
+import os
+import hashlib
+import numpy as np
+
+from .gp_mean import GPMean
+
+
+def cached_predict_f(
+    gp_model, xx, cache_dir=".prediction_cache", max_size_mb=1024.0
+):
+    """Evaluate `gp_model.predict_f`, reusing results saved on disk
+
+    Predictions are stored under a key built from a fingerprint of the
+    trained model (its parameter values and training data) and a
+    fingerprint of the input points, so a cached result is only reused
+    when both are unchanged. Entries are evicted least recently used
+    first once the cache exceeds `max_size_mb`.
+
+    Parameters
+    ----------
+    gp_model : gpflow.model
+        Trained GP model
+    xx : np.ndarray, shape=(n_points, n_inputs)
+        Points at which to evaluate the model
+    cache_dir : str
+        Directory where predictions are stored
+    max_size_mb : float
+        Maximum total size of the cache in MB
+
+    Returns
+    -------
+    mean : np.ndarray, shape=(n_points, 1)
+        Predicted mean
+    var : np.ndarray, shape=(n_points, 1)
+        Predicted variance
+    """
+    xx = np.ascontiguousarray(xx, dtype=np.float64)
+    key = model_fingerprint(gp_model) + "-" + array_fingerprint(xx)
+    file_name = os.path.join(cache_dir, key + ".npz")
+
+    if os.path.isfile(file_name):
+        try:
+            with np.load(file_name) as cached:
+                mean, var = cached["mean"], cached["var"]
+        except (OSError, ValueError, KeyError):
+            os.remove(file_name)
+        else:
+            # Mark as recently used
+            os.utime(file_name)
+            return mean, var
+
+    mean, var = gp_model.predict_f(xx)
+    mean = np.asarray(mean)
+    var = np.asarray(var)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_name = file_name + ".tmp"
+    with open(tmp_name, "wb") as f:
+        np.savez(f, mean=mean, var=var)
+    os.replace(tmp_name, file_name)
+    _evict(cache_dir, max_size_mb)
+
+    return mean, var
+
+
+class CachedModel:
+    """Wrap a GP model so that `predict_f` goes through the prediction cache
+
+    The wrapper can be passed anywhere a model is only used for
+    prediction, e.g., the `fffit.plot` functions.
+
+    Parameters
+    ----------
+    gp_model : gpflow.model
+        Trained GP model
+    cache_dir : str
+        Directory where predictions are stored
+    max_size_mb : float
+        Maximum total size of the cache in MB
+    """
+
+    def __init__(
+        self, gp_model, cache_dir=".prediction_cache", max_size_mb=1024.0
+    ):
+        self.gp_model = gp_model
+        self.cache_dir = cache_dir
+        self.max_size_mb = max_size_mb
+
+    def predict_f(self, xx):
+        return cached_predict_f(
+            self.gp_model, xx, self.cache_dir, self.max_size_mb
+        )
+
+    def __getattr__(self, name):
+        # Only called for attributes not defined on the wrapper
+        if name == "gp_model":
+            raise AttributeError(name)
+        return getattr(self.gp_model, name)
+
+
+def model_fingerprint(gp_model):
+    """Return a hash of the model type, kernel and mean function classes,
+    parameter values and training data"""
+    sha = hashlib.sha1()
+    sha.update(type(gp_model).__name__.encode())
+    if isinstance(gp_model, GPMean):
+        sha.update(gp_model.kernel_name.encode())
+        for array in [
+            gp_model.variance,
+            gp_model.lengthscales,
+            gp_model.x_train,
+            gp_model.alpha,
+            gp_model.mean_A,
+            gp_model.mean_b,
+        ]:
+            sha.update(array_fingerprint(array).encode())
+        return sha.hexdigest()
+
+    from gpflow.utilities import parameter_dict
+
+    # RBF and Matern kernels (or mean functions) can have the same
+    # parameters, so the classes are part of the fingerprint
+    kernel = getattr(gp_model, "kernel", None)
+    if kernel is not None:
+        sha.update(_kernel_classes(kernel).encode())
+    mean_function = getattr(gp_model, "mean_function", None)
+    if mean_function is not None:
+        sha.update(type(mean_function).__name__.encode())
+    for name, param in sorted(parameter_dict(gp_model).items()):
+        sha.update(name.encode())
+        sha.update(np.ascontiguousarray(param.numpy()).tobytes())
+    data = getattr(gp_model, "data", None)
+    if isinstance(data, tuple):
+        for array in data:
+            sha.update(array_fingerprint(array).encode())
+    noise_variance = getattr(gp_model, "fixed_noise_variance", None)
+    if noise_variance is not None:
+        sha.update(array_fingerprint(noise_variance).encode())
+    return sha.hexdigest()
+
+
+def array_fingerprint(array):
+    """Return a hash of the shape, type and contents of an array"""
+    array = np.ascontiguousarray(array)
+    sha = hashlib.sha1()
+    sha.update(str((array.shape, array.dtype.str)).encode())
+    sha.update(array.tobytes())
+    return sha.hexdigest()
+
+
+def _kernel_classes(kernel):
+    """Describe the classes of a kernel and any kernels it combines
+
+    E.g., "Sum(SquaredExponential,Matern52)" for the sum of an RBF and
+    a Matern52 kernel.
+    """
+    name = type(kernel).__name__
+    if hasattr(kernel, "kernels"):
+        children = list(kernel.kernels)
+    elif hasattr(kernel, "kernel"):
+        # Multi-output kernels sharing a single kernel
+        children = [kernel.kernel]
+    else:
+        return name
+    return "{}({})".format(
+        name, ",".join(_kernel_classes(child) for child in children)
+    )
+
+
+def _evict(cache_dir, max_size_mb):
+    """Remove least recently used entries until the cache fits"""
+    entries = []
+    for file_name in os.listdir(cache_dir):
+        if not file_name.endswith(".npz"):
+            continue
+        path = os.path.join(cache_dir, file_name)
+        stat = os.stat(path)
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total_size = sum(entry[1] for entry in entries)
+    max_size = max_size_mb * 1024 ** 2
+    for mtime, size, path in sorted(entries):
+        if total_size <= max_size:
+            break
+        os.remove(path)
+        total_size -= size
@@ -0,0 +1,184 @@
+import os
+import glob
+import json
+import hashlib
+import pandas as pd
+
+from .constants import constants_fingerprint
+from .id_new_samples import prepare_df_density, prepare_df_vle
+from .results_store import (
+    load_frame,
+    load_results,
+    results_partition,
+    save_frame,
+    source_fingerprint,
+)
+
+# Change when prepare_df_vle or prepare_df_density change their output
+PREPARED_VERSION = 2
+
+
+def load_prepared_vle(
+    molecule,
+    iterations,
+    store_dir="results",
+    csv_dir=None,
+    cache_dir=".prepared_cache",
+):
+    """Load VLE results of several iterations prepared for the GP models
+
+    Equivalent to `prepare_df_vle` of the concatenated results of all
+    iterations, but each iteration is prepared once and cached. Only
+    iterations that are new, or whose results or molecule constants
+    changed, are read and prepared again.
+
+    Parameters
+    ----------
+    molecule : R32Constants, R125Constants
+        An instance of a molecule constants class
+    iterations : iterable of int
+        The iteration numbers, e.g., range(1, iternum + 1)
+    store_dir : str
+        Directory of the results store, see `load_results`
+    csv_dir : str, optional
+        Directory of the "*-results.csv" files, see `load_results`
+    cache_dir : str
+        Directory where the prepared iterations are stored
+
+    Returns
+    -------
+    df_all : pd.DataFrame
+        The dataframe with scaled parameters and MD/expt. properties
+    """
+    return _load_prepared(
+        molecule,
+        "vle",
+        iterations,
+        lambda df: prepare_df_vle(df, molecule),
+        {},
+        store_dir,
+        csv_dir,
+        cache_dir,
+    )
+
+
+def load_prepared_density(
+    molecule,
+    iterations,
+    liquid_density_threshold,
+    store_dir="results",
+    csv_dir=None,
+    cache_dir=".prepared_cache",
+):
+    """Load density results of several iterations prepared for the GP models
+
+    Equivalent to `prepare_df_density` of the concatenated results of
+    all iterations, but each iteration is prepared once and cached. See
+    `load_prepared_vle`.
+
+    Parameters
+    ----------
+    molecule : R32Constants, R125Constants
+        An instance of a molecule constants class
+    iterations : iterable of int
+        The iteration numbers, e.g., range(1, iternum + 1)
+    liquid_density_threshold : float
+        Density threshold (kg/m^3) for distinguishing liquid and vapor
+    store_dir : str
+        Directory of the results store, see `load_results`
+    csv_dir : str, optional
+        Directory of the "*-results.csv" files, see `load_results`
+    cache_dir : str
+        Directory where the prepared iterations are stored
+
+    Returns
+    -------
+    df_all : pd.DataFrame
+        The dataframe with scaled parameters, temperature, density, and
+        is_liquid
+    df_liquid : pd.DataFrame
+        `df_all` where `is_liquid` is True
+    df_vapor : pd.DataFrame
+        `df_all` where `is_liquid` is False
+    """
+
+    def prepare(df_csv):
+        df_all, df_liquid, df_vapor = prepare_df_density(
+            df_csv, molecule, liquid_density_threshold
+        )
+        return df_all
+
+    df_all = _load_prepared(
+        molecule,
+        "density",
+        iterations,
+        prepare,
+        {"liquid_density_threshold": float(liquid_density_threshold)},
+        store_dir,
+        csv_dir,
+        cache_dir,
+    )
+    df_liquid = df_all[df_all["is_liquid"] == True]
+    df_vapor = df_all[df_all["is_liquid"] == False]
+
+    return df_all, df_liquid, df_vapor
+
+
+def _load_prepared(
+    molecule,
+    workflow,
+    iterations,
+    prepare,
+    options,
+    store_dir,
+    csv_dir,
+    cache_dir,
+):
+    """Load or prepare each iteration and concatenate them"""
+    molecule_hash = constants_fingerprint(molecule)
+    frames = []
+    for iternum in iterations:
+        key = hashlib.sha1(
+            json.dumps(
+                {
+                    "version": PREPARED_VERSION,
+                    "source": source_fingerprint(
+                        molecule, workflow, iternum, store_dir, csv_dir
+                    ),
+                    "molecule": molecule_hash,
+                    "options": options,
+                },
+                sort_keys=True,
+            ).encode()
+        ).hexdigest()
+        base_name = os.path.basename(
+            results_partition(store_dir, molecule, workflow, iternum)
+        )
+        file_name = os.path.join(cache_dir, f"{base_name}-{key[:16]}.npz")
+
+        df = None
+        if os.path.isfile(file_name):
+            try:
+                df = load_frame(file_name)
+            except (OSError, ValueError, KeyError):
+                os.remove(file_name)
+        if df is None:
+            df = prepare(
+                load_results(
+                    molecule,
+                    workflow,
+                    [iternum],
+                    store_dir=store_dir,
+                    csv_dir=csv_dir,
+                )
+            )
+            os.makedirs(cache_dir, exist_ok=True)
+            # Remove the outdated versions of this iteration
+            for old_name in glob.glob(
+                os.path.join(cache_dir, f"{base_name}-*.npz")
+            ):
+                os.remove(old_name)
+            save_frame(df, file_name)
+        frames.append(df)
+
+    return pd.concat(frames)
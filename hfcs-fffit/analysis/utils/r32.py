@@ -1,8 +1,17 @@
 import numpy as np
 import unyt as u
 
+from .constants import constant, lookup_temperatures, temperature_table
+
 class R32Constants:
-    """Experimental data and other constants for R32"""
+    """Experimental data and other constants for R32
+
+    The constants are computed once and shared by all instances. Arrays
+    and dicts are read-only.
+    """
+
+    __slots__ = ()
+
     def __init__(self):
         assert (
             self.expt_liq_density.keys()
@@ -11,27 +20,27 @@ class R32Constants:
             == self.expt_Hvap.keys()
         )
 
-    @property
+    @constant
     def molecular_weight(self):
         """Molecular weight of the molecule in g/mol"""
         return 52.024
 
-    @property
+    @constant
     def expt_Tc(self):
         """Critical temperature in K"""
         return 351.35
 
-    @property
+    @constant
     def expt_rhoc(self):
         """Critical density in kg/m^3"""
         return 429.756
 
-    @property
+    @constant
     def n_params(self):
         """Number of adjustable parameters"""
         return len(self.param_names)
 
-    @property
+    @constant
     def param_names(self):
         """Adjustable parameter names"""
 
@@ -46,7 +55,7 @@ class R32Constants:
 
         return param_names
 
-    @property
+    @constant
     def param_bounds(self):
         """Bounds on sigma and epsilon in units of nm and kJ/mol"""
 
@@ -74,7 +83,7 @@ class R32Constants:
 
         return bounds
 
-    @property
+    @constant
     def expt_liq_density(self):
         """Dictionary with experimental liquid density
 
@@ -92,7 +101,7 @@ class R32Constants:
 
         return expt_liq_density
 
-    @property
+    @constant
     def expt_vap_density(self):
         """Dictionary with experimental vapor density
 
@@ -110,7 +119,7 @@ class R32Constants:
 
         return expt_vap_density
 
-    @property
+    @constant
     def expt_Pvap(self):
         """Dictionary with experimental vapor pressure
 
@@ -128,7 +137,7 @@ class R32Constants:
 
         return expt_Pvap
 
-    @property
+    @constant
     def expt_Hvap(self):
         """Dictionary with experimental enthalpy of vaporization
 
@@ -146,7 +155,32 @@ class R32Constants:
 
         return expt_Hvap
 
-    @property
+    @constant
+    def expt_temperatures(self):
+        """Temperatures of the experimental data in units of K"""
+
+        return np.asarray(list(self.expt_liq_density.keys()), dtype=np.int64)
+
+    @constant
+    def temperature_table(self):
+        """Position in `expt_temperatures` by offset from the lowest one
+
+        See `utils.constants.temperature_table`
+        """
+
+        return temperature_table(self.expt_temperatures)
+
+    def temperature_index(self, temperatures):
+        """Position of each temperature (K) in `expt_temperatures`
+
+        Raises a ValueError for temperatures without experimental data
+        """
+
+        return lookup_temperatures(
+            temperatures, self.expt_temperatures, self.temperature_table
+        )
+
+    @constant
     def temperature_bounds(self):
         """Bounds on temperature in units of K"""
 
@@ -155,7 +189,7 @@ class R32Constants:
         bounds = np.asarray([lower_bound, upper_bound], dtype=np.float32)
         return bounds
 
-    @property
+    @constant
     def liq_density_bounds(self):
         """Bounds on liquid density in units of kg/m^3"""
 
@@ -164,7 +198,7 @@ class R32Constants:
         bounds = np.asarray([lower_bound, upper_bound], dtype=np.float32)
         return bounds
 
-    @property
+    @constant
     def vap_density_bounds(self):
         """Bounds on vapor density in units of kg/m^3"""
 
@@ -173,7 +207,7 @@ class R32Constants:
         bounds = np.asarray([lower_bound, upper_bound], dtype=np.float32)
         return bounds
 
-    @property
+    @constant
     def Pvap_bounds(self):
         """Bounds on vapor pressure in units of bar"""
 
@@ -182,7 +216,7 @@ class R32Constants:
         bounds = np.asarray([lower_bound, upper_bound], dtype=np.float32)
         return bounds
 
-    @property
+    @constant
     def Hvap_bounds(self):
         """Bounds on enthaply of vaporization in units of kJ/kg"""
 
@@ -0,0 +1,448 @@
+import os
+import glob
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+
+
+INDEX_KEY = "__index__"
+SCHEMA_KEY = "__schema__"
+
+
+def append_results(
+    df,
+    molecule,
+    workflow,
+    iternum,
+    store_dir="results",
+    skip_existing=True,
+):
+    """Append simulation results to the columnar results store
+
+    The store has one partition (directory) per molecule, workflow and
+    iteration, e.g., "results/r32-vle-iter3". Each append writes a new
+    chunk with one typed array per column. Existing chunks are never
+    modified.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Results as written by the extract scripts, with the parameters,
+        "temperature", and the properties
+    molecule : R32Constants, R125Constants or string
+        The molecule (or its name) the results are for
+    workflow : string
+        "vle" or "density"
+    iternum : int
+        The iteration number
+    store_dir : str
+        Directory of the store
+    skip_existing : bool
+        Leave out rows whose parameters and temperature are already in
+        the partition, so the extract step can be rerun as more jobs
+        finish. A molecule name must then be "R32" or "R125"
+
+    Returns
+    -------
+    n_appended : int
+        Number of rows written
+    """
+    partition = results_partition(store_dir, molecule, workflow, iternum)
+    schema = _read_schema(partition)
+    columns = [str(column) for column in df.columns]
+    if schema is None:
+        schema = {
+            "columns": columns,
+            "index": df.index.name,
+            "dtypes": {
+                column: _column_array(df[column]).dtype.kind
+                for column in df.columns
+            },
+        }
+    elif columns != schema["columns"]:
+        raise ValueError(
+            f"Columns of df do not match the partition {partition}: "
+            f"{schema['columns']}"
+        )
+
+    if skip_existing and _chunk_files(partition):
+        key_columns = _key_columns(molecule)
+        existing = load_partition(partition, columns=key_columns)
+        is_new = ~pd.MultiIndex.from_frame(df[key_columns]).isin(
+            pd.MultiIndex.from_frame(existing[key_columns])
+        )
+        df = df[is_new]
+    if df.shape[0] == 0:
+        return 0
+
+    arrays = {INDEX_KEY: _column_array(df.index.to_series())}
+    for column in df.columns:
+        array = _column_array(df[column])
+        kind = schema["dtypes"][str(column)]
+        if array.dtype.kind != kind:
+            if kind == "f" and array.dtype.kind in "iub":
+                array = array.astype(np.float64)
+            else:
+                raise ValueError(
+                    f"Column '{column}' has type {array.dtype} instead of "
+                    f"kind '{kind}'"
+                )
+        arrays[str(column)] = array
+
+    os.makedirs(partition, exist_ok=True)
+    _write_schema(partition, schema)
+    chunk_name = os.path.join(
+        partition, f"chunk-{len(_chunk_files(partition)):05d}.npz"
+    )
+    _save_arrays(chunk_name, arrays)
+
+    return df.shape[0]
+
+
+def load_results(
+    molecule,
+    workflow,
+    iterations,
+    columns=None,
+    store_dir="results",
+    csv_dir=None,
+):
+    """Load simulation results of several iterations in one read
+
+    Replaces reading and concatenating the "*-results.csv" files. Only
+    the requested columns are read from the chunks.
+
+    Parameters
+    ----------
+    molecule : R32Constants, R125Constants or string
+        The molecule (or its name) the results are for
+    workflow : string
+        "vle" or "density"
+    iterations : iterable of int
+        The iteration numbers, e.g., range(1, iternum + 1)
+    columns : list of string, optional
+        Columns to load. Defaults to all columns
+    store_dir : str
+        Directory of the store
+    csv_dir : str, optional
+        Directory of the "*-results.csv" files. A missing partition,
+        or one older than its CSV file, is (re)created from the CSV
+        file the first time it is loaded
+
+    Returns
+    -------
+    df : pd.DataFrame
+        The results of all iterations, in iteration order, with the
+        same index as the CSV files
+    """
+    partitions = []
+    for iternum in iterations:
+        partition = results_partition(store_dir, molecule, workflow, iternum)
+        if csv_dir is not None:
+            csv_name = os.path.join(
+                csv_dir,
+                f"{os.path.basename(partition)}-results.csv",
+            )
+            if _is_stale(partition, csv_name):
+                convert_results_csv(
+                    csv_name, molecule, workflow, iternum, store_dir
+                )
+        partitions.append(partition)
+
+    return _load_chunks(
+        [name for part in partitions for name in _chunk_files(part)],
+        partitions,
+        columns,
+    )
+
+
+def load_partition(partition, columns=None):
+    """Load the results of a single partition
+
+    Parameters
+    ----------
+    partition : str
+        Directory of the partition, see `results_partition`
+    columns : list of string, optional
+        Columns to load. Defaults to all columns
+
+    Returns
+    -------
+    df : pd.DataFrame
+        The results in the partition
+    """
+    return _load_chunks(_chunk_files(partition), [partition], columns)
+
+
+def convert_results_csv(csv_name, molecule, workflow, iternum, store_dir):
+    """Create the partition of an iteration from its results CSV file
+
+    An existing partition of the iteration is replaced.
+
+    Parameters
+    ----------
+    csv_name : str
+        Path of the "*-results.csv" file
+    molecule : R32Constants, R125Constants or string
+        The molecule (or its name) the results are for
+    workflow : string
+        "vle" or "density"
+    iternum : int
+        The iteration number
+    store_dir : str
+        Directory of the store
+    """
+    df = read_results_csv(csv_name)
+    partition = results_partition(store_dir, molecule, workflow, iternum)
+    for file_name in _chunk_files(partition) + [
+        os.path.join(partition, "schema.json")
+    ]:
+        if os.path.isfile(file_name):
+            os.remove(file_name)
+    append_results(
+        df, molecule, workflow, iternum, store_dir, skip_existing=False
+    )
+
+
+def save_frame(df, file_name):
+    """Save a dataframe as typed columns in an npz file
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The dataframe. Column names must be strings
+    file_name : str
+        Path of the npz file
+    """
+    arrays = {INDEX_KEY: _column_array(df.index.to_series())}
+    for column in df.columns:
+        arrays[str(column)] = _column_array(df[column])
+    # The column order and index name are kept in a JSON string
+    arrays[SCHEMA_KEY] = np.array(
+        json.dumps({"columns": list(arrays)[1:], "index": df.index.name})
+    )
+    _save_arrays(file_name, arrays)
+
+
+def load_frame(file_name, columns=None):
+    """Load a dataframe saved with `save_frame`
+
+    Parameters
+    ----------
+    file_name : str
+        Path of the npz file
+    columns : list of string, optional
+        Columns to load. Defaults to all columns
+
+    Returns
+    -------
+    df : pd.DataFrame
+        The dataframe
+    """
+    with np.load(file_name, allow_pickle=False) as arrays:
+        schema = json.loads(str(arrays[SCHEMA_KEY]))
+        if columns is None:
+            columns = schema["columns"]
+        missing = [col for col in columns if col not in schema["columns"]]
+        if missing:
+            raise ValueError(f"Columns {missing} are not in {file_name}")
+        index = pd.Index(arrays[INDEX_KEY], name=schema["index"])
+        data = {column: arrays[column] for column in columns}
+    return pd.DataFrame(data, index=index, columns=columns, copy=False)
+
+
+def source_fingerprint(
+    molecule, workflow, iternum, store_dir="results", csv_dir=None
+):
+    """Return a hash of the source of the results of an iteration
+
+    The source is the results CSV file if `csv_dir` is given, and the
+    partition of the store otherwise. Only the file contents are read.
+
+    Parameters
+    ----------
+    molecule : R32Constants, R125Constants or string
+        The molecule (or its name) the results are for
+    workflow : string
+        "vle" or "density"
+    iternum : int
+        The iteration number
+    store_dir : str
+        Directory of the store
+    csv_dir : str, optional
+        Directory of the "*-results.csv" files
+
+    Returns
+    -------
+    fingerprint : str
+        The hash
+    """
+    partition = results_partition(store_dir, molecule, workflow, iternum)
+    if csv_dir is not None:
+        file_names = [
+            os.path.join(
+                csv_dir, f"{os.path.basename(partition)}-results.csv"
+            )
+        ]
+    else:
+        file_names = _chunk_files(partition)
+        if not file_names:
+            raise ValueError(f"No results found in {partition}")
+    sha = hashlib.sha1()
+    for file_name in file_names:
+        sha.update(os.path.basename(file_name).encode())
+        with open(file_name, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha.update(block)
+    return sha.hexdigest()
+
+
+def read_results_csv(csv_name):
+    """Read a "*-results.csv" file without rounding the floats
+
+    Parameters
+    ----------
+    csv_name : str
+        Path of the CSV file
+
+    Returns
+    -------
+    df : pd.DataFrame
+        The results
+    """
+    return pd.read_csv(csv_name, index_col=0, float_precision="round_trip")
+
+
+def results_partition(store_dir, molecule, workflow, iternum):
+    """Return the directory of the partition of an iteration
+
+    Partitions are named like the CSV files, e.g., "r32-vle-iter3".
+    """
+    if workflow not in ("vle", "density"):
+        raise ValueError(
+            f"Invalid workflow {workflow}. Supported workflows are "
+            "'vle' and 'density'"
+        )
+    if isinstance(molecule, str):
+        molecule_name = molecule.lower()
+    else:
+        molecule_name = type(molecule).__name__.replace("Constants", "")
+        molecule_name = molecule_name.lower()
+    return os.path.join(
+        store_dir, f"{molecule_name}-{workflow}-iter{int(iternum)}"
+    )
+
+
+def _load_chunks(chunk_names, partitions, columns):
+    """Concatenate the columns of the chunks of several partitions
+
+    Columns missing from a partition, e.g., the uncertainties in older
+    iterations, are filled with NaN, as in `pd.concat`.
+    """
+    schemas = {}
+    for partition in partitions:
+        schema = _read_schema(partition)
+        if schema is not None:
+            schemas[os.path.normpath(partition)] = schema
+    if not schemas:
+        raise ValueError(f"No results found in {partitions}")
+    all_columns = []
+    for schema in schemas.values():
+        all_columns += [
+            column for column in schema["columns"] if column not in all_columns
+        ]
+    if columns is None:
+        columns = all_columns
+    missing = [column for column in columns if column not in all_columns]
+    if missing:
+        raise ValueError(f"Columns {missing} are not in the results")
+
+    parts = {column: [] for column in [INDEX_KEY] + list(columns)}
+    for chunk_name in chunk_names:
+        stored = schemas[os.path.dirname(os.path.normpath(chunk_name))]
+        # Members of an npz file are only read when accessed
+        with np.load(chunk_name, allow_pickle=False) as chunk:
+            n_rows = chunk[INDEX_KEY].shape[0]
+            for column in parts:
+                if column == INDEX_KEY or column in stored["columns"]:
+                    parts[column].append(chunk[column])
+                else:
+                    parts[column].append(np.full(n_rows, np.nan))
+
+    index = pd.Index(
+        np.concatenate(parts.pop(INDEX_KEY)),
+        name=next(iter(schemas.values()))["index"],
+    )
+    data = {column: np.concatenate(arrays) for column, arrays in parts.items()}
+    return pd.DataFrame(data, index=index, columns=columns, copy=False)
+
+
+def _save_arrays(file_name, arrays):
+    """Write arrays to an npz file through a temporary file
+
+    Readers never see a partially written file.
+    """
+    directory, base_name = os.path.split(file_name)
+    tmp_name = os.path.join(directory, ".tmp-" + base_name)
+    with open(tmp_name, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_name, file_name)
+
+
+def _column_array(values):
+    """Return a typed array of a column; strings as a unicode array"""
+    array = values.to_numpy()
+    if array.dtype.kind == "O":
+        array = array.astype(str)
+    return array
+
+
+def _key_columns(molecule):
+    """Columns that identify a simulation: parameters and temperature"""
+    if isinstance(molecule, str):
+        from .r32 import R32Constants
+        from .r125 import R125Constants
+
+        molecules = {"r32": R32Constants, "r125": R125Constants}
+        if molecule.lower() not in molecules:
+            raise ValueError(
+                f"Invalid molecule {molecule}. Pass a molecule constants "
+                "class instance, or one of 'R32' and 'R125', to skip "
+                "existing results"
+            )
+        molecule = molecules[molecule.lower()]()
+    return list(molecule.param_names) + ["temperature"]
+
+
+def _chunk_files(partition):
+    """Return the chunk files of a partition in the order written"""
+    return sorted(glob.glob(os.path.join(partition, "chunk-[0-9]*.npz")))
+
+
+def _is_stale(partition, csv_name):
+    """Whether the partition is missing or older than its CSV file"""
+    schema_name = os.path.join(partition, "schema.json")
+    if not os.path.isfile(schema_name) or not _chunk_files(partition):
+        return True
+    return os.path.isfile(csv_name) and os.path.getmtime(
+        csv_name
+    ) > os.path.getmtime(schema_name)
+
+
+def _read_schema(partition):
+    """Return the schema of a partition, or None if it does not exist"""
+    schema_name = os.path.join(partition, "schema.json")
+    if not os.path.isfile(schema_name):
+        return None
+    with open(schema_name) as f:
+        return json.load(f)
+
+
+def _write_schema(partition, schema):
+    """Write the schema of a partition"""
+    schema_name = os.path.join(partition, "schema.json")
+    tmp_name = schema_name + ".tmp"
+    with open(tmp_name, "w") as f:
+        json.dump(schema, f, indent=2)
+    os.replace(tmp_name, schema_name)
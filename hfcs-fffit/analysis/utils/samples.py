@@ -0,0 +1,170 @@
+import os
+import warnings
+import numpy as np
+import pandas as pd
+
+from scipy.stats import qmc
+
+
+def load_samples(file_name, chunk_size=100000):
+    """Load candidate samples as a read-only memory-mapped array
+
+    A ".npy" file is memory-mapped directly. For a comma-separated file
+    (e.g., "LHS_5e5x10.csv") a binary copy with the same name and the
+    ".npy" extension is created the first time it is loaded (or when
+    the text file is newer) and memory-mapped thereafter.
+
+    Parameters
+    ----------
+    file_name : str
+        Path to a ".npy" or comma-separated file of samples
+    chunk_size : int
+        Number of rows parsed at a time when converting a text file
+
+    Returns
+    -------
+    samples : np.memmap, shape=(n_samples, n_params)
+        The candidate samples
+    """
+    root, ext = os.path.splitext(file_name)
+    if ext == ".npy":
+        return np.load(file_name, mmap_mode="r")
+
+    npy_name = root + ".npy"
+    if not os.path.isfile(npy_name) or os.path.getmtime(
+        npy_name
+    ) < os.path.getmtime(file_name):
+        convert_samples_to_npy(file_name, npy_name, chunk_size=chunk_size)
+
+    return np.load(npy_name, mmap_mode="r")
+
+
+def convert_samples_to_npy(csv_name, npy_name, chunk_size=100000):
+    """Convert a comma-separated file of samples to a binary ".npy" file
+
+    The text file is parsed in chunks and written directly into the
+    output file, so the full set of samples is never held in memory.
+
+    Parameters
+    ----------
+    csv_name : str
+        Path to the comma-separated file of samples
+    npy_name : str
+        Path of the ".npy" file to create
+    chunk_size : int
+        Number of rows parsed at a time
+    """
+    n_samples = 0
+    n_params = None
+    for chunk in _read_csv_chunks(csv_name, chunk_size):
+        n_samples += chunk.shape[0]
+        n_params = chunk.shape[1]
+    if n_params is None:
+        raise ValueError(f"No samples found in {csv_name}")
+
+    save_samples(
+        npy_name, _read_csv_chunks(csv_name, chunk_size), n_samples, n_params
+    )
+
+
+def save_samples(npy_name, sample_chunks, n_samples, n_params):
+    """Write blocks of samples to a binary ".npy" file
+
+    Parameters
+    ----------
+    npy_name : str
+        Path of the ".npy" file to create
+    sample_chunks : iterable of np.ndarray, shape=(n_chunk, n_params)
+        Blocks of samples, e.g., from `iter_generated_samples`
+    n_samples : int
+        Total number of samples in `sample_chunks`
+    n_params : int
+        Number of parameters per sample
+    """
+    # Write to a temporary file so an interrupted conversion
+    # never leaves a truncated file behind
+    tmp_name = npy_name + ".tmp"
+    out = np.lib.format.open_memmap(
+        tmp_name, mode="w+", dtype=np.float64, shape=(n_samples, n_params)
+    )
+    start = 0
+    for chunk in sample_chunks:
+        out[start : start + chunk.shape[0]] = chunk
+        start += chunk.shape[0]
+    out.flush()
+    del out
+    if start != n_samples:
+        os.remove(tmp_name)
+        raise ValueError(
+            f"Expected {n_samples} samples but sample_chunks "
+            f"contained {start}"
+        )
+    os.replace(tmp_name, npy_name)
+
+
+def iter_generated_samples(
+    n_samples, n_params, seed, method="lhs", chunk_size=100000
+):
+    """Regenerate a space-filling design from a seed, one block at a time
+
+    The same `seed`, `method`, and `chunk_size` always yield the same
+    samples, so only these values need to be stored rather than the
+    samples themselves.
+
+    Parameters
+    ----------
+    n_samples : int
+        Total number of samples
+    n_params : int
+        Number of parameters per sample
+    seed : int
+        Seed for the design
+    method : string
+        "lhs" for a Latin hypercube or "sobol" for a scrambled Sobol
+        sequence. For "lhs", each block is an independent Latin
+        hypercube with `chunk_size` samples. For "sobol", the blocks
+        are consecutive segments of a single sequence
+    chunk_size : int
+        Maximum number of samples per block
+
+    Yields
+    ------
+    chunk : np.ndarray, shape=(n_chunk, n_params)
+        The next block of samples, scaled between 0 and 1
+    """
+    valid_methods = ["lhs", "sobol"]
+    if method not in valid_methods:
+        raise ValueError(
+            "Invalid method {}. Supported methods are "
+            "{}".format(method, valid_methods)
+        )
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be a positive integer")
+
+    if method == "sobol":
+        sampler = qmc.Sobol(n_params, scramble=True, seed=seed)
+        for start in range(0, n_samples, chunk_size):
+            # Blocks need not be powers of two for screening purposes
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", UserWarning)
+                chunk = sampler.random(min(chunk_size, n_samples - start))
+            yield chunk
+    else:
+        n_chunks = -(-n_samples // chunk_size)
+        chunk_seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+        for chunk_seed, start in zip(
+            chunk_seeds, range(0, n_samples, chunk_size)
+        ):
+            sampler = qmc.LatinHypercube(
+                n_params, seed=np.random.default_rng(chunk_seed)
+            )
+            yield sampler.random(min(chunk_size, n_samples - start))
+
+
+def _read_csv_chunks(csv_name, chunk_size):
+    """Yield blocks of a comma-separated file of samples"""
+    reader = pd.read_csv(
+        csv_name, header=None, dtype=np.float64, chunksize=chunk_size
+    )
+    for chunk in reader:
+        yield chunk.values